@@ -0,0 +1,9 @@
+"""
+Бенчмарки горячих путей бронирования на синтетических данных масштаба продакшена.
+
+- seed.py — генерация данных (команда seed_scale)
+- suite.py — замеры и сравнение с сохраненным baseline (команда run_benchmarks)
+- connections.py — стоимость подключения к БД (команда run_connection_benchmark)
+- loadtest.py — нагрузочный тест по HTTP со сценариями из scenarios/
+- compare_servers.py — тот же сценарий против gunicorn в режимах WSGI и ASGI
+"""
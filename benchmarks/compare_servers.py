@@ -0,0 +1,186 @@
+"""
+Сравнение WSGI и ASGI при одинаковом числе воркеров gunicorn.
+
+Для каждого режима (SERVER_MODE, см. config/gunicorn.conf.py) скрипт поднимает
+gunicorn на локальном порту с текущими настройками Django, прогоняет один и тот же
+сценарий нагрузочного теста (loadtest.py) и останавливает сервер. В конце
+печатается таблица по шагам сценария: rps, p50/p95 и доля ошибок в каждом режиме.
+
+Запускайте из корня проекта на тестовой базе (например после seed_scale);
+для режима asgi нужен установленный uvicorn.
+
+Использование:
+    python -m benchmarks.compare_servers benchmarks/scenarios/slow_report_mix.json \\
+        --workers 3 --username admin --password admin
+    python -m benchmarks.compare_servers benchmarks/scenarios/calendar_polling.json \\
+        --workers 2 --users 50 --duration 30 --output compare.json
+"""
+import argparse
+import asyncio
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from benchmarks import loadtest
+
+MODES = ('wsgi', 'asgi')
+
+
+def start_server(mode, workers, port, log_file):
+    env = dict(os.environ, SERVER_MODE=mode)
+    # Переопределение из окружения исказило бы сравнение
+    env.pop('ASYNC_VIEWS_ENABLED', None)
+    return subprocess.Popen(
+        [
+            sys.executable, '-m', 'gunicorn',
+            '--config', 'config/gunicorn.conf.py',
+            '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers),
+            '--timeout', '120',
+        ],
+        env=env,
+        stdout=log_file,
+        stderr=subprocess.STDOUT,
+    )
+
+
+def wait_for_port(process, port, timeout):
+    """Ждет, пока сервер начнет принимать соединения."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def run_mode(mode, args):
+    """Прогон сценария против gunicorn в режиме mode; возвращает отчет loadtest."""
+    base_url = f'http://127.0.0.1:{args.port}'
+    options = loadtest.parse_args([
+        args.scenario,
+        '--base-url', base_url,
+        '--username', args.username,
+        '--password', args.password,
+        '--seed', str(args.seed),
+        '--timeout', str(args.timeout),
+        *(['--users', str(args.users)] if args.users else []),
+        *(['--duration', str(args.duration)] if args.duration else []),
+        *(['--ramp-up', str(args.ramp_up)] if args.ramp_up is not None else []),
+    ])
+    scenario = loadtest.load_scenario(args.scenario, options)
+
+    log_path = f'{args.log_prefix}_{mode}.log'
+    with open(log_path, 'w', encoding='utf-8') as log_file:
+        process = start_server(mode, args.workers, args.port, log_file)
+        try:
+            if not wait_for_port(process, args.port, args.startup_timeout):
+                raise RuntimeError(f'gunicorn ({mode}) не запустился, см. {log_path}')
+            print(f'\n=== {mode}: {args.workers} воркер(а), {base_url} ===')
+            report = asyncio.run(loadtest.run_load_test(scenario, options))
+        finally:
+            stop_server(process)
+    loadtest.print_report(report)
+    return report
+
+
+def print_comparison(reports):
+    modes = list(reports)
+    steps = []
+    for report in reports.values():
+        steps.extend(name for name in report['steps'] if name not in steps)
+
+    header = f'{"Шаг":<24}' + ''.join(f' {f"rps {m}":>10} {f"p50 {m}":>10} {f"p95 {m}":>10} {f"ош. {m}":>9}' for m in modes)
+    print()
+    print(header)
+
+    def ms(value):
+        return f'{value:.1f}' if value is not None else '-'
+
+    for name in steps:
+        line = f'{name:<24}'
+        for mode in modes:
+            step = reports[mode]['steps'].get(name)
+            if step is None:
+                line += f' {"-":>10} {"-":>10} {"-":>10} {"-":>9}'
+            else:
+                line += (
+                    f' {step["rps"]:>10.1f} {ms(step["p50_ms"]):>10} {ms(step["p95_ms"]):>10}'
+                    f' {step["error_rate"]:>9.1%}'
+                )
+        print(line)
+    line = f'{"Всего":<24}'
+    for mode in modes:
+        report = reports[mode]
+        line += f' {report["rps"]:>10.1f} {"":>10} {"":>10} {report["error_rate"]:>9.1%}'
+    print(line)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.compare_servers',
+        description='Сравнение WSGI и ASGI при одинаковом числе воркеров',
+    )
+    parser.add_argument('scenario', help='JSON-файл сценария (см. benchmarks/scenarios/)')
+    parser.add_argument('--modes', default=','.join(MODES), help='Режимы через запятую. По умолчанию: wsgi,asgi')
+    parser.add_argument('--workers', type=int, default=3, help='Воркеров gunicorn в каждом режиме')
+    parser.add_argument('--port', type=int, default=8790)
+    parser.add_argument('--users', type=int, help='Количество сессий (по умолчанию из сценария)')
+    parser.add_argument('--duration', type=float, help='Длительность прогона, с (по умолчанию из сценария)')
+    parser.add_argument('--ramp-up', type=float, help='Время плавного старта пользователей, с')
+    parser.add_argument('--username', default=os.environ.get('LOADTEST_USERNAME', 'admin'))
+    parser.add_argument('--password', default=os.environ.get('LOADTEST_PASSWORD', ''))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=30.0, help='Таймаут запроса, с')
+    parser.add_argument('--startup-timeout', type=float, default=30.0, help='Ожидание запуска сервера, с')
+    parser.add_argument('--log-prefix', default='compare_servers', help='Префикс файлов с логом gunicorn')
+    parser.add_argument('--output', help='Сохранить отчеты обоих режимов в JSON-файл')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    modes = [mode.strip() for mode in args.modes.split(',') if mode.strip()]
+    unknown = set(modes) - set(MODES)
+    if unknown:
+        print(f'Неизвестные режимы: {", ".join(sorted(unknown))}', file=sys.stderr)
+        return 2
+    if 'asgi' in modes and importlib.util.find_spec('uvicorn') is None:
+        print('Для режима asgi установите uvicorn (см. requirements.txt)', file=sys.stderr)
+        return 2
+
+    reports = {}
+    for mode in modes:
+        try:
+            reports[mode] = run_mode(mode, args)
+        except (RuntimeError, ValueError, loadtest.HttpError, OSError) as e:
+            print(f'Ошибка ({mode}): {e}', file=sys.stderr)
+            return 2
+    print_comparison(reports)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump({'workers': args.workers, 'reports': reports}, output_file, ensure_ascii=False, indent=2)
+        print(f'Отчет сохранен: {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
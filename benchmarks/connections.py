@@ -0,0 +1,155 @@
+"""
+Стоимость подключения к БД на AJAX-запросах календаря.
+
+Календарь при каждой навигации запрашивает ленту бронирований, закрытия
+кабинетов и ресурсы — несколько коротких запросов подряд, где открытие
+соединения с Postgres сопоставимо со временем самих SQL-запросов.
+Одна и та же последовательность запросов прогоняется в режимах:
+
+- per_request — новое соединение на каждый запрос (CONN_MAX_AGE = 0, без пула);
+- persistent — постоянное соединение (CONN_MAX_AGE) с проверкой перед запросом;
+- pool — пул psycopg3 (только Postgres с psycopg 3).
+
+Тестовый клиент Django не закрывает соединения после запроса, поэтому после
+каждого запроса вызывается close_old_connections(), как это делает обработчик
+запросов под gunicorn.
+"""
+import copy
+import datetime
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from .suite import BenchmarkContext, percentile
+
+MODES = ('per_request', 'persistent', 'pool')
+
+
+def pool_supported():
+    if connection.vendor != 'postgresql':
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+
+def _restore(original):
+    """Закрывает текущее соединение и пул и возвращает исходные настройки default."""
+    connection.close()
+    if hasattr(connection, 'close_pool'):
+        connection.close_pool()
+    connection.settings_dict.clear()
+    connection.settings_dict.update(copy.deepcopy(original))
+
+
+def _configure(mode, original):
+    """Переключает соединение default в режим mode."""
+    _restore(original)
+    settings_dict = connection.settings_dict
+    settings_dict['OPTIONS'].pop('pool', None)
+    settings_dict['CONN_HEALTH_CHECKS'] = True
+    if mode == 'per_request':
+        settings_dict['CONN_MAX_AGE'] = 0
+    elif mode == 'persistent':
+        settings_dict['CONN_MAX_AGE'] = 600
+    else:
+        settings_dict['CONN_MAX_AGE'] = 0
+        settings_dict['OPTIONS']['pool'] = original['OPTIONS'].get('pool') or {'min_size': 2, 'max_size': 4}
+
+
+def calendar_requests(context, rng):
+    """Запросы одной навигации по календарю (неделя)."""
+    day = context.random_day(rng)
+    start = timezone.make_aware(datetime.datetime.combine(day - datetime.timedelta(days=day.weekday()), datetime.time.min))
+    window = {'start': start.isoformat(), 'end': (start + datetime.timedelta(days=7)).isoformat()}
+    return [
+        ('/calendar/feed/', window),
+        ('/calendar/closures/', window),
+        ('/calendar/resources/specialists/', {}),
+        ('/calendar/resources/cabinets/', {}),
+    ]
+
+
+def run_mode(context, navigations, seed):
+    """
+    Прогон navigations навигаций календаря в текущем режиме подключения.
+
+    Returns:
+        dict: requests, connections (открыто новых), p50_ms, p95_ms, mean_ms
+    """
+    rng = random.Random(f'{seed}:connections')
+    opened = []
+
+    def on_connection_created(sender, connection, **kwargs):
+        opened.append(connection.alias)
+
+    # Прогрев: соединение, пул и кэши шаблонов/URL
+    for path, params in calendar_requests(context, rng):
+        context.get(path, params)
+        close_old_connections()
+
+    timings = []
+    connection_created.connect(on_connection_created)
+    try:
+        for _ in range(navigations):
+            for path, params in calendar_requests(context, rng):
+                started = time.perf_counter()
+                close_old_connections()  # request_started
+                context.get(path, params)
+                close_old_connections()  # request_finished
+                timings.append((time.perf_counter() - started) * 1000)
+    finally:
+        connection_created.disconnect(on_connection_created)
+
+    return {
+        'requests': len(timings),
+        'connections': len(opened),
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+    }
+
+
+def run_connection_benchmark(modes=None, navigations=50, seed=42, on_result=None):
+    """
+    Сравнивает режимы подключения на одной и той же последовательности запросов.
+
+    Returns:
+        dict: meta и results {режим: результат run_mode + saved_ms относительно per_request}
+    """
+    modes = list(modes or MODES)
+    if 'pool' in modes and not pool_supported():
+        modes.remove('pool')
+
+    original = copy.deepcopy(connection.settings_dict)
+    results = {}
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        context = BenchmarkContext()
+        try:
+            for mode in modes:
+                _configure(mode, original)
+                results[mode] = run_mode(context, navigations, seed)
+                if on_result:
+                    on_result(mode, results[mode])
+        finally:
+            _restore(original)
+
+    if 'per_request' in results:
+        base = results['per_request']['mean_ms']
+        for result in results.values():
+            result['saved_ms'] = round(base - result['mean_ms'], 2)
+
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'navigations': navigations,
+            'seed': seed,
+        },
+        'results': results,
+    }
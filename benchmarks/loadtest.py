@@ -0,0 +1,641 @@
+"""
+Нагрузочный тест календаря и бронирований по HTTP.
+
+Генератор нагрузки без внешних зависимостей (asyncio + стандартная библиотека):
+N виртуальных администраторов входят в систему, каждый в своей сессии,
+и по сценарию из JSON-файла опрашивают ленту календаря, переносят
+бронирования drag & drop, создают бронирования (в том числе серии)
+и набирают имена гостей в автодополнении. В конце печатается отчет
+по каждому шагу сценария: пропускная способность, перцентили задержки,
+доля ошибок; пороги из сценария и сравнение с прошлым отчетом дают
+ненулевой код выхода, что удобно перед деплоем.
+
+Сценарий изменяет данные (переносы, создание), поэтому запускайте его
+на тестовой базе, например после seed_scale. Перенесенные бронирования
+по умолчанию возвращаются на место, созданные удаляются после прогона.
+
+Использование:
+    python -m benchmarks.loadtest benchmarks/scenarios/admin_day.json --username admin --password admin
+    python -m benchmarks.loadtest benchmarks/scenarios/admin_day.json --users 30 --duration 120 \\
+        --base-url http://127.0.0.1:8000 --output report.json
+    python -m benchmarks.loadtest benchmarks/scenarios/admin_day.json --baseline report.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import math
+import os
+import random
+import ssl
+import sys
+import time
+import urllib.parse
+from collections import Counter, defaultdict
+
+LOGIN_PATH = '/accounts/login/'
+COMMENT_MARKER = 'loadtest'
+DEFAULT_GUEST_NAMES = ['Иван Иванов', 'Мария Петрова', 'John Smith', 'Anna Müller', 'Somchai Suksawat']
+
+
+class HttpError(Exception):
+    """Сетевая ошибка или неожиданный ответ сервера."""
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status = status
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body.decode('utf-8'))
+
+
+class HttpSession:
+    """
+    Минимальный HTTP/1.1-клиент с keep-alive и cookie одной сессии браузера.
+
+    Соединение переоткрывается, если сервер его закрыл (sync-воркеры gunicorn
+    закрывают соединение после каждого ответа).
+    """
+
+    def __init__(self, base_url, timeout=30.0):
+        parts = urllib.parse.urlsplit(base_url)
+        self.base_url = base_url.rstrip('/')
+        self.host = parts.hostname
+        self.use_ssl = parts.scheme == 'https'
+        self.port = parts.port or (443 if self.use_ssl else 80)
+        self.host_header = parts.netloc
+        self.timeout = timeout
+        self.cookies = {}
+        self.reader = None
+        self.writer = None
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = self.writer = None
+
+    async def _connect(self):
+        context = ssl.create_default_context() if self.use_ssl else None
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port, ssl=context)
+
+    async def request(self, method, path, params=None, data=None):
+        """Выполняет запрос; data (dict) отправляется как форма с CSRF-токеном."""
+        return await asyncio.wait_for(self._request(method, path, params, data), self.timeout)
+
+    async def _request(self, method, path, params, data):
+        if params:
+            path = f'{path}?{urllib.parse.urlencode(params, doseq=True)}'
+        body = b''
+        headers = {
+            'Host': self.host_header,
+            'Connection': 'keep-alive',
+            'Accept': 'application/json, text/html;q=0.9',
+            'X-Requested-With': 'XMLHttpRequest',
+            'User-Agent': 'booking-loadtest',
+        }
+        if method == 'POST':
+            body = urllib.parse.urlencode(data or {}, doseq=True).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['Referer'] = f'{self.base_url}/'
+            if 'csrftoken' in self.cookies:
+                headers['X-CSRFToken'] = self.cookies['csrftoken']
+        headers['Content-Length'] = str(len(body))
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+
+        raw = f'{method} {path} HTTP/1.1\r\n' + ''.join(f'{k}: {v}\r\n' for k, v in headers.items()) + '\r\n'
+        payload = raw.encode('latin-1') + body
+
+        reused = self.writer is not None
+        for attempt in range(2):
+            if self.writer is None:
+                await self._connect()
+            try:
+                self.writer.write(payload)
+                await self.writer.drain()
+                return await self._read_response(method)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                await self.close()
+                # Сервер мог закрыть простаивавшее соединение — повторяем один раз
+                if not reused or attempt:
+                    raise HttpError(f'Соединение прервано: {e}')
+
+    async def _read_response(self, method):
+        status_line = await self.reader.readuntil(b'\r\n')
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        headers = {}
+        while True:
+            line = (await self.reader.readuntil(b'\r\n')).decode('latin-1').rstrip('\r\n')
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            name = name.strip().lower()
+            value = value.strip()
+            if name == 'set-cookie':
+                self._store_cookie(value)
+            headers[name] = value
+
+        status = int(status)
+        if method == 'HEAD' or status in (204, 304) or 100 <= status < 200:
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = await self._read_chunked()
+        elif 'content-length' in headers:
+            body = await self.reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self.reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection', '').lower() == 'close' or version == 'HTTP/1.0':
+            await self.close()
+        return Response(status, headers, body)
+
+    async def _read_chunked(self):
+        chunks = []
+        while True:
+            size = int((await self.reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            if size == 0:
+                await self.reader.readuntil(b'\r\n')
+                return b''.join(chunks)
+            chunks.append(await self.reader.readexactly(size))
+            await self.reader.readexactly(2)
+
+    def _store_cookie(self, header):
+        pair, _, attributes = header.partition(';')
+        name, _, value = pair.strip().partition('=')
+        attributes = attributes.lower()
+        if 'max-age=0' in attributes or (not value and 'expires=' in attributes):
+            self.cookies.pop(name, None)
+        else:
+            self.cookies[name] = value.strip('"')
+
+
+class Stats:
+    """Задержки и ошибки по шагам сценария."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.errors = Counter()
+        self.skipped = Counter()
+        self.started = None
+        self.finished = None
+
+    def record(self, name, elapsed_ms, status=None, ok=True):
+        self.latencies[name].append(elapsed_ms)
+        self.statuses[name][status or 'error'] += 1
+        if not ok:
+            self.errors[name] += 1
+
+    def report(self):
+        elapsed = max((self.finished or time.monotonic()) - (self.started or time.monotonic()), 1e-9)
+        steps = {}
+        for name in sorted(set(self.latencies) | set(self.skipped)):
+            values = sorted(self.latencies.get(name, []))
+            count = len(values)
+            steps[name] = {
+                'requests': count,
+                'rps': round(count / elapsed, 2),
+                'p50_ms': _percentile(values, 0.5),
+                'p90_ms': _percentile(values, 0.9),
+                'p95_ms': _percentile(values, 0.95),
+                'p99_ms': _percentile(values, 0.99),
+                'max_ms': round(values[-1], 2) if values else None,
+                'errors': self.errors[name],
+                'error_rate': round(self.errors[name] / count, 4) if count else 0.0,
+                'statuses': {str(key): value for key, value in self.statuses[name].items()},
+                'skipped': self.skipped[name],
+            }
+        total = sum(step['requests'] for step in steps.values())
+        errors = sum(step['errors'] for step in steps.values())
+        return {
+            'duration_s': round(elapsed, 2),
+            'requests': total,
+            'rps': round(total / elapsed, 2),
+            'errors': errors,
+            'error_rate': round(errors / total, 4) if total else 0.0,
+            'steps': steps,
+        }
+
+
+def _percentile(values, fraction):
+    if not values:
+        return None
+    return round(values[max(0, math.ceil(fraction * len(values)) - 1)], 2)
+
+
+class SharedState:
+    """Данные, которые виртуальные пользователи узнают по ходу теста."""
+
+    def __init__(self, scenario, rng):
+        self.rng = rng
+        self.variant_specialists = {}  # id варианта услуги -> [id специалистов]
+        self.bookings = {}  # id -> {'start': iso, 'guest_name': str}
+        self.guest_names = set(scenario.get('guest_names') or DEFAULT_GUEST_NAMES)
+        self.created = []  # [(booking_id, series_id)] для очистки
+
+    def remember_events(self, events, limit=5000):
+        for event in events:
+            props = event.get('extendedProps') or {}
+            if props.get('eventType') != 'booking':
+                continue
+            if len(self.bookings) >= limit:
+                self.bookings.pop(self.rng.choice(list(self.bookings)))
+            self.bookings[event['id']] = {'start': event['start']}
+            if props.get('guest_name'):
+                self.guest_names.add(props['guest_name'])
+
+
+class VirtualUser:
+    """Один администратор в своей сессии, выполняющий шаги сценария."""
+
+    def __init__(self, index, options, scenario, state, stats):
+        self.index = index
+        self.options = options
+        self.scenario = scenario
+        self.state = state
+        self.stats = stats
+        self.rng = random.Random(f'{options.seed}:{index}')
+        self.session = HttpSession(options.base_url, timeout=options.timeout)
+        self.tz = _parse_offset(scenario.get('timezone_offset', '+07:00'))
+        self.date_window = scenario.get('date_window_days', [-14, 30])
+
+    async def login(self):
+        await self.session.request('GET', LOGIN_PATH)
+        response = await self.session.request('POST', LOGIN_PATH, data={
+            'username': self.options.username,
+            'password': self.options.password,
+            'csrfmiddlewaretoken': self.session.cookies.get('csrftoken', ''),
+        })
+        if response.status != 302 or 'sessionid' not in self.session.cookies:
+            raise HttpError(f'Не удалось войти как {self.options.username} (HTTP {response.status})')
+
+    async def timed(self, name, method, path, params=None, data=None, expected=(200,)):
+        started = time.monotonic()
+        try:
+            response = await self.session.request(method, path, params=params, data=data)
+        except (HttpError, OSError, asyncio.TimeoutError, ValueError):
+            await self.session.close()
+            self.stats.record(name, (time.monotonic() - started) * 1000, ok=False)
+            return None
+        self.stats.record(name, (time.monotonic() - started) * 1000, response.status, response.status in expected)
+        return response
+
+    async def run(self, deadline):
+        steps = self.scenario['steps']
+        weights = [step.get('weight', 1) for step in steps]
+        think_min, think_max = self.scenario.get('think_time', [0.5, 2.0])
+        while time.monotonic() < deadline:
+            step = self.rng.choices(steps, weights)[0]
+            await ACTIONS[step['action']](self, step)
+            await asyncio.sleep(self.rng.uniform(think_min, think_max))
+
+    # --- вспомогательное ---
+
+    def random_day(self):
+        today = datetime.datetime.now(self.tz).date()
+        return today + datetime.timedelta(days=self.rng.randint(*self.date_window))
+
+    def window(self, kind):
+        """Границы видимого периода, как их отправляет FullCalendar."""
+        day = self.random_day()
+        if kind == 'day':
+            start, days = day, 1
+        elif kind == 'month':
+            first = day.replace(day=1)
+            start, days = first - datetime.timedelta(days=first.weekday()), 42
+        else:
+            start, days = day - datetime.timedelta(days=day.weekday()), 7
+        start = datetime.datetime.combine(start, datetime.time.min, self.tz)
+        return {'start': start.isoformat(), 'end': (start + datetime.timedelta(days=days)).isoformat()}
+
+
+def _parse_offset(value):
+    sign = -1 if value.startswith('-') else 1
+    hours, minutes = value.lstrip('+-').split(':')
+    return datetime.timezone(sign * datetime.timedelta(hours=int(hours), minutes=int(minutes)))
+
+
+# --- действия сценария ---
+
+async def action_calendar_feed(user, step):
+    response = await user.timed(step['name'], 'GET', '/calendar/feed/', params=user.window(step.get('window', 'week')))
+    if response is not None and response.status == 200:
+        user.state.remember_events(response.json())
+
+
+async def action_closure_feed(user, step):
+    await user.timed(step['name'], 'GET', '/calendar/closures/', params=user.window(step.get('window', 'week')))
+
+
+async def action_resources(user, step):
+    await user.timed(step['name'], 'GET', f'/calendar/resources/{step.get("kind", "specialists")}/')
+
+
+async def action_update_time(user, step):
+    """Перенос бронирования мышью; с restore=true оно возвращается на прежнее время."""
+    if not user.state.bookings:
+        user.stats.skipped[step['name']] += 1
+        return
+    booking_id = user.rng.choice(list(user.state.bookings))
+    original = user.state.bookings[booking_id]['start']
+    start = datetime.datetime.fromisoformat(original.replace('Z', '+00:00'))
+    shift = datetime.timedelta(minutes=user.rng.choice([-120, -60, -30, -15, 15, 30, 60, 120]))
+    new_start = (start + shift).isoformat()
+
+    response = await user.timed(step['name'], 'POST', '/booking/update-time/', data={
+        'booking_id': booking_id, 'start_datetime': new_start,
+    })
+    if response is None or response.status != 200:
+        user.state.bookings.pop(booking_id, None)
+        return
+    if step.get('restore', True):
+        await asyncio.sleep(user.rng.uniform(0.1, 0.5))
+        await user.timed(step['name'], 'POST', '/booking/update-time/', data={
+            'booking_id': booking_id, 'start_datetime': original,
+        })
+    else:
+        user.state.bookings[booking_id] = {'start': new_start}
+
+
+async def action_quick_create(user, step):
+    """Быстрое создание из календаря: выбор кабинета, затем POST формы (опционально серия)."""
+    pairs = [(variant, specialists) for variant, specialists in user.state.variant_specialists.items() if specialists]
+    if not pairs:
+        user.stats.skipped[step['name']] += 1
+        return
+    variant_id, specialists = user.rng.choice(pairs)
+    specialist_id = user.rng.choice(specialists)
+    open_hour, close_hour = user.scenario.get('working_hours', [9, 19])
+    start = datetime.datetime.combine(
+        user.random_day(),
+        datetime.time(user.rng.randint(open_hour, close_hour - 1), user.rng.choice([0, 15, 30, 45])),
+    )
+    start_value = start.strftime('%Y-%m-%dT%H:%M')
+
+    cabinets = await user.timed(f'{step["name"]}.cabinets', 'GET', '/api/available-cabinets/', params={
+        'service_variant_id': variant_id, 'specialist_id': specialist_id, 'datetime': start_value,
+    }, expected=(200, 404))
+    cabinet_id = ''
+    if cabinets is not None and cabinets.status == 200:
+        available = cabinets.json().get('cabinets') or []
+        if available:
+            cabinet_id = user.rng.choice(available)['id']
+
+    data = {
+        'service_variant': variant_id,
+        'specialist': specialist_id,
+        'cabinet': cabinet_id,
+        'guest_name': user.rng.choice(sorted(user.state.guest_names)),
+        'guest_room_number': str(user.rng.randint(100, 999)),
+        'comment': COMMENT_MARKER,
+        'start_datetime': start_value,
+    }
+    recurrence = step.get('recurrence')
+    if recurrence:
+        data.update({
+            'recurrence_enabled': 'on',
+            'recurrence_frequency': recurrence.get('frequency', 'weekly'),
+            'recurrence_interval': recurrence.get('interval', 1),
+            'recurrence_end_type': 'count',
+            'recurrence_occurrences': recurrence.get('occurrences', 4),
+            'recurrence_weekdays': [start.weekday()] if recurrence.get('frequency', 'weekly') == 'weekly' else [],
+        })
+
+    response = await user.timed(step['name'], 'POST', '/booking/quick-create/', data=data)
+    if response is not None and response.status == 200:
+        payload = response.json()
+        if payload.get('booking_id'):
+            user.state.created.append((payload['booking_id'], payload.get('series_id')))
+
+
+async def action_guest_autocomplete(user, step):
+    """Набор имени гостя по буквам: запрос на каждое нажатие, начиная с min_chars."""
+    name = user.rng.choice(sorted(user.state.guest_names))
+    min_chars = step.get('min_chars', 2)
+    max_chars = min(len(name), step.get('max_chars', 10))
+    delay_min, delay_max = step.get('keystroke_delay', [0.08, 0.25])
+    for length in range(min_chars, max_chars + 1):
+        await user.timed(step['name'], 'GET', '/api/v1/guests/autocomplete/', params={'q': name[:length]})
+        await asyncio.sleep(user.rng.uniform(delay_min, delay_max))
+
+
+async def action_report(user, step):
+    """Отчет за месяц (по умолчанию CSV-выгрузка) — медленный запрос, занимающий воркер."""
+    first = user.random_day().replace(day=1)
+    last = (first + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    path = '/reports/download/' if step.get('format', 'csv') == 'csv' else '/reports/'
+    await user.timed(step['name'], 'GET', path, params={
+        'start_date': first.isoformat(),
+        'end_date': last.isoformat(),
+    })
+
+
+ACTIONS = {
+    'calendar_feed': action_calendar_feed,
+    'closure_feed': action_closure_feed,
+    'resources': action_resources,
+    'update_time': action_update_time,
+    'quick_create': action_quick_create,
+    'guest_autocomplete': action_guest_autocomplete,
+    'report': action_report,
+}
+
+
+# --- запуск ---
+
+async def discover(user, scenario):
+    """Находит варианты услуг и специалистов для быстрого создания."""
+    variant_ids = scenario.get('service_variant_ids') or range(1, scenario.get('max_service_variant_id', 30) + 1)
+    for variant_id in variant_ids:
+        response = await user.session.request(
+            'GET', '/api/specialists-for-service/', params={'service_variant_id': variant_id}
+        )
+        if response.status == 200:
+            user.state.variant_specialists[variant_id] = [item['id'] for item in response.json()]
+
+
+async def cleanup(user):
+    """Удаляет бронирования, созданные во время теста (попадают в архив удаленных)."""
+    deleted = 0
+    for booking_id, series_id in user.state.created:
+        try:
+            response = await user.session.request('POST', f'/booking/{booking_id}/delete/', data={
+                'scope': 'series' if series_id else 'single',
+                'deletion_reason': 'Нагрузочный тест',
+            })
+        except (HttpError, OSError, asyncio.TimeoutError):
+            continue
+        if response.status in (200, 302):
+            deleted += 1
+    return deleted
+
+
+async def run_load_test(scenario, options):
+    stats = Stats()
+    state = SharedState(scenario, random.Random(options.seed))
+    users = [VirtualUser(index, options, scenario, state, stats) for index in range(options.users)]
+
+    print(f'Вход {len(users)} пользователей на {options.base_url}...')
+    await asyncio.gather(*(user.login() for user in users))
+    await discover(users[0], scenario)
+    if not state.variant_specialists:
+        print('Внимание: не найдено ни одного варианта услуги, быстрое создание будет пропущено')
+
+    ramp_up = options.ramp_up
+    stats.started = time.monotonic()
+    deadline = stats.started + options.duration
+
+    async def start_user(user, delay):
+        await asyncio.sleep(delay)
+        await user.run(deadline)
+
+    print(f'Нагрузка {options.duration} с...')
+    await asyncio.gather(*(
+        start_user(user, ramp_up * index / max(1, len(users))) for index, user in enumerate(users)
+    ))
+    stats.finished = time.monotonic()
+
+    report = stats.report()
+    if state.created and not options.no_cleanup:
+        report['cleaned_up'] = await cleanup(users[0])
+    for user in users:
+        await user.session.close()
+
+    report['meta'] = {
+        'scenario': scenario.get('name', ''),
+        'base_url': options.base_url,
+        'users': options.users,
+        'seed': options.seed,
+        'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+    }
+    return report
+
+
+def check_thresholds(report, thresholds):
+    """Возвращает список нарушений порогов сценария (ключ '*' — для всех шагов)."""
+    violations = []
+    for name, step in report['steps'].items():
+        limits = {**thresholds.get('*', {}), **thresholds.get(name, {})}
+        for key, limit in limits.items():
+            if key == 'min_rps':
+                if step['rps'] < limit:
+                    violations.append(f'{name}: rps {step["rps"]} < {limit}')
+            elif step.get(key) is not None and step[key] > limit:
+                violations.append(f'{name}: {key} {step[key]} > {limit}')
+    return violations
+
+
+def compare_reports(report, baseline, tolerance):
+    """Регрессии относительно прошлого отчета: рост p95 больше tolerance или рост доли ошибок."""
+    violations = []
+    for name, step in report['steps'].items():
+        previous = baseline.get('steps', {}).get(name)
+        if not previous or not previous.get('p95_ms') or step['p95_ms'] is None:
+            continue
+        change = (step['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+        if change > tolerance:
+            violations.append(f'{name}: p95 {previous["p95_ms"]} -> {step["p95_ms"]} мс ({change:+.0%})')
+        if step['error_rate'] > previous['error_rate'] + 0.01:
+            violations.append(f'{name}: доля ошибок {previous["error_rate"]} -> {step["error_rate"]}')
+    return violations
+
+
+def print_report(report):
+    print()
+    print(f'{"Шаг":<28} {"запросов":>8} {"rps":>7} {"p50":>8} {"p95":>8} {"p99":>8} {"max":>8} {"ошибок":>7}')
+    for name, step in report['steps'].items():
+        def ms(value):
+            return f'{value:.1f}' if value is not None else '-'
+        print(
+            f'{name:<28} {step["requests"]:>8} {step["rps"]:>7.1f} {ms(step["p50_ms"]):>8} {ms(step["p95_ms"]):>8} '
+            f'{ms(step["p99_ms"]):>8} {ms(step["max_ms"]):>8} {step["error_rate"]:>7.1%}'
+        )
+    print(
+        f'Всего: {report["requests"]} запросов за {report["duration_s"]} с, '
+        f'{report["rps"]} rps, ошибок {report["error_rate"]:.1%}'
+    )
+    if 'cleaned_up' in report:
+        print(f'Удалено созданных бронирований: {report["cleaned_up"]}')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='python -m benchmarks.loadtest',
+        description='Нагрузочный тест календаря и бронирований по HTTP',
+    )
+    parser.add_argument('scenario', help='JSON-файл сценария (см. benchmarks/scenarios/)')
+    parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='Адрес сервера')
+    parser.add_argument('--users', type=int, help='Количество сессий (по умолчанию из сценария)')
+    parser.add_argument('--duration', type=float, help='Длительность, с (по умолчанию из сценария)')
+    parser.add_argument('--ramp-up', type=float, help='Время плавного старта пользователей, с')
+    parser.add_argument('--username', default=os.environ.get('LOADTEST_USERNAME', 'admin'))
+    parser.add_argument('--password', default=os.environ.get('LOADTEST_PASSWORD', ''))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--timeout', type=float, default=30.0, help='Таймаут запроса, с')
+    parser.add_argument('--output', help='Сохранить отчет в JSON-файл')
+    parser.add_argument('--baseline', help='Сравнить с прошлым отчетом')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Допустимый рост p95 (доля)')
+    parser.add_argument('--no-cleanup', action='store_true', help='Не удалять созданные бронирования')
+    return parser.parse_args(argv)
+
+
+def load_scenario(path, options):
+    """
+    Читает сценарий и дополняет options значениями из него.
+
+    Raises:
+        ValueError: в сценарии есть неизвестные действия
+    """
+    with open(path, encoding='utf-8') as scenario_file:
+        scenario = json.load(scenario_file)
+    unknown = {step['action'] for step in scenario['steps']} - set(ACTIONS)
+    if unknown:
+        raise ValueError(f'Неизвестные действия в сценарии: {", ".join(sorted(unknown))}')
+    options.users = options.users or scenario.get('users', 10)
+    options.duration = options.duration or scenario.get('duration', 60)
+    options.ramp_up = scenario.get('ramp_up', 5) if options.ramp_up is None else options.ramp_up
+    return scenario
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    try:
+        scenario = load_scenario(options.scenario, options)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    try:
+        report = asyncio.run(run_load_test(scenario, options))
+    except (HttpError, OSError) as e:
+        print(f'Ошибка: {e}', file=sys.stderr)
+        return 2
+    print_report(report)
+
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, ensure_ascii=False, indent=2)
+        print(f'Отчет сохранен: {options.output}')
+
+    violations = check_thresholds(report, scenario.get('thresholds', {}))
+    if options.baseline:
+        with open(options.baseline, encoding='utf-8') as baseline_file:
+            violations += compare_reports(report, json.load(baseline_file), options.tolerance)
+    if violations:
+        print('\nНарушения:')
+        for violation in violations:
+            print(f'  {violation}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
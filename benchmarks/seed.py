@@ -0,0 +1,527 @@
+"""
+Генерация синтетического набора данных в масштабе продакшена.
+
+В отличие от generate_test_data.py все строки создаются через bulk_create
+пачками по месяцам (без save() и сигналов), поэтому сотни тысяч бронирований
+загружаются за минуты. Генератор детерминирован: при одинаковом seed
+и параметрах получается один и тот же набор данных.
+
+Что создается:
+- специалисты с графиками (5 рабочих дней из 7) и кабинеты трех типов;
+- бронирования без пересечений по специалисту и кабинету; если заданное
+  число бронирований в день не помещается в расписание, излишек создается
+  отмененными (они не занимают время, как и в реальной базе);
+- еженедельные серии, закрытия кабинетов, технические записи;
+- гости с вариантами написания имени и похожими записями-дублями;
+- логи действий, архив удаленных бронирований и поисковый индекс.
+"""
+import datetime
+import random
+
+from django.contrib.auth.models import Group, User
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from booking.archive_utils import build_deleted_booking
+from booking.guest_utils import normalize_guest_name
+from booking.models import (
+    Booking,
+    BookingLog,
+    BookingSeries,
+    Cabinet,
+    CabinetClosure,
+    CabinetType,
+    CalendarNote,
+    DeletedBooking,
+    Guest,
+    Service,
+    ServiceVariant,
+    SpecialistProfile,
+    SpecialistSchedule,
+    SystemSettings,
+)
+from booking.search_utils import index_bookings, index_notes
+
+# Префикс имен пользователей, по которому генератор узнает свои данные
+USERNAME_PREFIX = 'scale_'
+
+FIRST_NAMES = [
+    'Иван', 'Петр', 'Алексей', 'Дмитрий', 'Сергей', 'Андрей', 'Михаил', 'Николай',
+    'Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Татьяна', 'Ирина', 'Екатерина',
+    'John', 'Michael', 'David', 'James', 'Robert', 'Emma', 'Olivia', 'Sophie',
+    'Hans', 'Klaus', 'Anna', 'Laura', 'Marco', 'Giulia', 'Somchai', 'Nattaya',
+]
+LAST_NAMES = [
+    'Иванов', 'Петров', 'Сидоров', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Соколов',
+    'Иванова', 'Петрова', 'Сидорова', 'Смирнова', 'Кузнецова', 'Попова', 'Новикова', 'Морозова',
+    'Smith', 'Johnson', 'Brown', 'Taylor', 'Wilson', 'Miller', 'Davis', 'Clark',
+    'Müller', 'Schmidt', 'Weber', 'Rossi', 'Bianchi', 'Dubois', 'Suksawat', 'Chaiyaporn',
+]
+NOTE_COMMENTS = [
+    'Санитарная обработка кабинетов',
+    'Планерка персонала',
+    'Поставка расходных материалов',
+    'Обучение нового сотрудника',
+    'Проверка оборудования',
+    'Групповое бронирование отеля',
+]
+CLOSURE_REASONS = ['Ремонт', 'Плановое обслуживание', 'Замена оборудования', 'Генеральная уборка']
+
+# Типы кабинетов и услуги: (тип, доля кабинетов, услуги [(название, [(суффикс, минут, цена)])])
+CATALOG = [
+    ('Массажный', 0.6, [
+        ('Тайский массаж', [('60 мин', 60, 2000), ('90 мин', 90, 2800), ('120 мин', 120, 3500)]),
+        ('Массаж спины', [('30 мин', 30, 1200), ('60 мин', 60, 2000)]),
+    ]),
+    ('Косметологический', 0.3, [
+        ('Уход за лицом', [('60 мин', 60, 2500), ('90 мин', 90, 3500)]),
+        ('Массаж лица', [('45 мин', 45, 1800)]),
+    ]),
+    ('VIP', 0.1, [
+        ('VIP Комплекс', [('120 мин', 120, 5000), ('180 мин', 180, 7000)]),
+    ]),
+]
+
+SERIES_LENGTH_WEEKS = 8
+SERIES_LANE_STEP = 10  # каждая десятая «дорожка» начинает день с бронирования серии
+
+
+class ScaleSeeder:
+    """
+    Генератор набора данных.
+
+    Usage:
+        ScaleSeeder(specialists=50, cabinets=30, days=730, bookings_per_day=400).run()
+    """
+
+    def __init__(self, specialists=50, cabinets=30, days=730, bookings_per_day=400,
+                 guests=5000, seed=42, future_days=None, batch_size=1000, log=print):
+        self.specialist_count = specialists
+        self.cabinet_count = cabinets
+        self.days = days
+        self.bookings_per_day = bookings_per_day
+        self.guest_count = guests
+        self.batch_size = batch_size
+        self.log = log
+        self.rng = random.Random(seed)
+
+        if future_days is None:
+            future_days = min(90, days // 4)
+        self.today = timezone.localdate()
+        self.first_day = self.today - datetime.timedelta(days=days - future_days)
+        self.stats = {
+            'bookings': 0, 'canceled_overflow': 0, 'series': 0, 'logs': 0,
+            'deleted': 0, 'notes': 0, 'closures': 0, 'guests': 0,
+        }
+
+    # --- справочники ---
+
+    def run(self):
+        system_settings = SystemSettings.get_solo()
+        self.buffer = datetime.timedelta(minutes=system_settings.buffer_time_minutes)
+        # У только что созданной записи поля еще строки по умолчанию ('09:00')
+        self.open_time = datetime.time.fromisoformat(str(system_settings.spa_open_time))
+        self.close_time = datetime.time.fromisoformat(str(system_settings.spa_close_time))
+
+        with transaction.atomic():
+            self.admin = self._create_admin()
+            self._create_catalog()
+            self._create_cabinets()
+            self._create_specialists()
+            self._create_guests()
+        self.lanes_by_weekday = {weekday: self._build_lanes(weekday) for weekday in range(7)}
+        self.series_by_key = {}
+
+        month_start = self.first_day.replace(day=1)
+        last_day = self.first_day + datetime.timedelta(days=self.days - 1)
+        while month_start <= last_day:
+            next_month = (month_start + datetime.timedelta(days=32)).replace(day=1)
+            chunk_days = [
+                month_start + datetime.timedelta(days=offset)
+                for offset in range((next_month - month_start).days)
+            ]
+            chunk_days = [day for day in chunk_days if self.first_day <= day <= last_day]
+            with transaction.atomic():
+                self._seed_days(chunk_days)
+            self.log(f'  {month_start.strftime("%Y-%m")}: всего бронирований {self.stats["bookings"]}')
+            month_start = next_month
+        return self.stats
+
+    def _create_admin(self):
+        admin, _ = User.objects.get_or_create(
+            username=f'{USERNAME_PREFIX}admin',
+            defaults={'is_staff': True, 'is_superuser': True, 'password': '!'},
+        )
+        return admin
+
+    def _create_catalog(self):
+        self.cabinet_types = []
+        self.services_by_type = {}
+        self.variants_by_service = {}
+        for type_name, share, services in CATALOG:
+            cabinet_type, _ = CabinetType.objects.get_or_create(name=type_name)
+            self.cabinet_types.append((cabinet_type, share))
+            self.services_by_type[cabinet_type.id] = []
+            for service_name, variants in services:
+                service, _ = Service.objects.get_or_create(name=service_name)
+                service.required_cabinet_types.add(cabinet_type)
+                self.services_by_type[cabinet_type.id].append(service)
+                self.variants_by_service[service.id] = [
+                    ServiceVariant.objects.get_or_create(
+                        service=service,
+                        name_suffix=suffix,
+                        defaults={'duration_minutes': minutes, 'price': price},
+                    )[0]
+                    for suffix, minutes, price in variants
+                ]
+
+    def _create_cabinets(self):
+        cabinets = []
+        remaining = self.cabinet_count
+        for index, (cabinet_type, share) in enumerate(self.cabinet_types):
+            is_last = index == len(self.cabinet_types) - 1
+            count = remaining if is_last else max(1, round(self.cabinet_count * share))
+            count = min(count, remaining)
+            remaining -= count
+            cabinets.extend(
+                Cabinet(name=f'{cabinet_type.name} S{number:02d}', cabinet_type=cabinet_type, is_active=True)
+                for number in range(1, count + 1)
+            )
+        self.cabinets = Cabinet.objects.bulk_create(cabinets)
+
+    def _create_specialists(self):
+        users = User.objects.bulk_create([
+            User(
+                username=f'{USERNAME_PREFIX}specialist_{number:03d}',
+                email=f'specialist{number:03d}@example.com',
+                password='!',
+            )
+            for number in range(1, self.specialist_count + 1)
+        ])
+        group, _ = Group.objects.get_or_create(name='Specialist')
+        group.user_set.add(*users)
+
+        full_names = [f'{last} {first}' for last in LAST_NAMES for first in FIRST_NAMES]
+        self.rng.shuffle(full_names)
+        profiles = SpecialistProfile.objects.bulk_create([
+            SpecialistProfile(user=user, full_name=full_names[index % len(full_names)])
+            for index, user in enumerate(users)
+        ])
+
+        # Все специалисты делают массаж, каждый второй — косметологию, каждый пятый — VIP
+        massage_type, cosmetology_type, vip_type = (cabinet_type for cabinet_type, _ in self.cabinet_types)
+        through = SpecialistProfile.services_can_perform.through
+        links = []
+        self.type_ids_by_specialist = {}
+        for index, profile in enumerate(profiles):
+            type_ids = [massage_type.id]
+            if index % 2 == 0:
+                type_ids.append(cosmetology_type.id)
+            if index % 5 == 0:
+                type_ids.append(vip_type.id)
+            self.type_ids_by_specialist[profile.id] = type_ids
+            for type_id in type_ids:
+                links.extend(
+                    through(specialistprofile_id=profile.id, service_id=service.id)
+                    for service in self.services_by_type[type_id]
+                )
+        through.objects.bulk_create(links)
+
+        # Два выходных подряд, со сдвигом по специалистам
+        schedules = []
+        self.working_days = {}
+        for index, profile in enumerate(profiles):
+            days_off = {index % 7, (index + 1) % 7}
+            self.working_days[profile.id] = {day for day in range(7) if day not in days_off}
+            schedules.extend(
+                SpecialistSchedule(
+                    specialist=profile, day_of_week=day,
+                    start_time=self.open_time, end_time=self.close_time,
+                )
+                for day in sorted(self.working_days[profile.id])
+            )
+        SpecialistSchedule.objects.bulk_create(schedules)
+        self.specialists = profiles
+
+    def _create_guests(self):
+        """Гости и похожие записи-дубли (опечатка в имени) для поиска дублей."""
+        guests = {}
+        attempts = 0
+        while len(guests) < self.guest_count and attempts < self.guest_count * 20:
+            attempts += 1
+            name = f'{self.rng.choice(FIRST_NAMES)} {self.rng.choice(LAST_NAMES)}'
+            if self.rng.random() < 0.5:
+                name = f'{name} {self.rng.choice("АБВГДЕЖЗИКЛМНОПРСТ")}.'
+            if self.rng.random() < 0.03:
+                name = self._typo(name)
+            normalized = normalize_guest_name(name)
+            if normalized and normalized not in guests:
+                guests[normalized] = Guest(normalized_name=normalized, display_name=name)
+        existing = set(Guest.objects.filter(normalized_name__in=list(guests)).values_list('normalized_name', flat=True))
+        Guest.objects.bulk_create(
+            [guest for key, guest in guests.items() if key not in existing],
+            batch_size=self.batch_size,
+        )
+        self.guests = list(Guest.objects.filter(normalized_name__in=list(guests)).order_by('id'))
+        # Постоянные гости: примерно треть визитов приходится на 5% гостей
+        self.regular_guests = self.guests[:max(1, len(self.guests) // 20)]
+        self.stats['guests'] = len(self.guests)
+
+    def _typo(self, name):
+        position = self.rng.randrange(1, len(name) - 1)
+        if self.rng.random() < 0.5:
+            return name[:position] + name[position + 1:]
+        return name[:position] + name[position] + name[position:]
+
+    def _guest_name_variant(self, guest):
+        """Как имя гостя вводят администраторы: регистр, пробелы, порядок слов."""
+        name = guest.display_name
+        roll = self.rng.random()
+        if roll < 0.1:
+            return name.upper()
+        if roll < 0.2:
+            return name.lower()
+        if roll < 0.25:
+            return name.replace(' ', '  ', 1)
+        if roll < 0.3 and ' ' in name:
+            first, rest = name.split(' ', 1)
+            return f'{rest} {first}'
+        return name
+
+    def _pick_guest(self):
+        if self.rng.random() < 0.33:
+            return self.rng.choice(self.regular_guests)
+        return self.rng.choice(self.guests)
+
+    # --- расписание ---
+
+    def _build_lanes(self, weekday):
+        """
+        «Дорожки» дня недели: пары (специалист, кабинет), которые не пересекаются
+        между собой. Сначала подбираются специалисты для особых кабинетов.
+        """
+        free = [profile for profile in self.specialists if weekday in self.working_days[profile.id]]
+        offset = weekday * 7 % len(free) if free else 0
+        free = free[offset:] + free[:offset]
+        massage_type_id = self.cabinet_types[0][0].id
+        lanes = []
+        special = [cabinet for cabinet in self.cabinets if cabinet.cabinet_type_id != massage_type_id]
+        regular = [cabinet for cabinet in self.cabinets if cabinet.cabinet_type_id == massage_type_id]
+        for cabinet in special + regular:
+            for profile in free:
+                if cabinet.cabinet_type_id in self.type_ids_by_specialist[profile.id]:
+                    variants = [
+                        variant
+                        for service in self.services_by_type[cabinet.cabinet_type_id]
+                        for variant in self.variants_by_service[service.id]
+                    ]
+                    lanes.append((profile, cabinet, variants))
+                    free.remove(profile)
+                    break
+        return lanes
+
+    def _closures_for_day(self, day):
+        """Примерно раз в полтора месяца кабинет закрывается на 2-4 часа."""
+        closures = []
+        for cabinet in self.cabinets:
+            if self.rng.random() < 1 / 45:
+                start_hour = self.rng.randint(self.open_time.hour, max(self.open_time.hour, self.close_time.hour - 4))
+                start = self._aware(day, datetime.time(start_hour))
+                closures.append(CabinetClosure(
+                    cabinet=cabinet,
+                    start_time=start,
+                    end_time=start + datetime.timedelta(hours=self.rng.randint(2, 4)),
+                    reason=self.rng.choice(CLOSURE_REASONS),
+                    created_by=self.admin,
+                ))
+        return closures
+
+    def _aware(self, day, time):
+        return timezone.make_aware(datetime.datetime.combine(day, time))
+
+    def _status(self, day, in_capacity):
+        if not in_capacity:
+            return 'canceled'
+        roll = self.rng.random()
+        if day < self.today:
+            return 'completed' if roll < 0.82 else 'paid' if roll < 0.93 else 'canceled'
+        return 'confirmed' if roll < 0.85 else 'unconfirmed' if roll < 0.95 else 'canceled'
+
+    def _make_booking(self, profile, cabinet, variant, start, status, guest, series=None, sequence=1):
+        return Booking(
+            guest=guest,
+            guest_name=self._guest_name_variant(guest),
+            guest_room_number=str(self.rng.randint(100, 999)) if self.rng.random() < 0.7 else '',
+            service_variant=variant,
+            specialist=profile,
+            cabinet=cabinet,
+            start_time=start,
+            end_time=start + datetime.timedelta(minutes=variant.duration_minutes) + self.buffer,
+            created_by=self.admin,
+            series=series,
+            sequence=sequence,
+            status=status,
+        )
+
+    def _series_for(self, day, weekday, lane_index, profile, cabinet, variant, start):
+        week_index = (day - self.first_day).days // 7
+        key = (weekday, lane_index, week_index // SERIES_LENGTH_WEEKS)
+        series = self.series_by_key.get(key)
+        if series is None:
+            series = BookingSeries(
+                start_time=start,
+                frequency=BookingSeries.FREQUENCY_WEEKLY,
+                interval=1,
+                occurrence_count=SERIES_LENGTH_WEEKS,
+                weekdays=[weekday],
+                created_by=self.admin,
+            )
+            series.scale_guest = self._pick_guest()
+            series.scale_variant = variant
+            self.series_by_key[key] = series
+        return series, week_index % SERIES_LENGTH_WEEKS + 1
+
+    def _plan_day(self, day, closures):
+        """Возвращает (бронирования серий, прочие кандидаты) без пересечений."""
+        day_open = self._aware(day, self.open_time)
+        day_close = self._aware(day, self.close_time)
+        blocked = {}
+        for closure in closures:
+            blocked.setdefault(closure.cabinet.id, []).append((closure.start_time, closure.end_time))
+
+        series_bookings = []
+        candidates = []
+        for lane_index, (profile, cabinet, variants) in enumerate(self.lanes_by_weekday[day.weekday()]):
+            cursor = day_open
+            if lane_index % SERIES_LANE_STEP == 0:
+                series, sequence = self._series_for(
+                    day, day.weekday(), lane_index, profile, cabinet, variants[0], cursor
+                )
+                variant = series.scale_variant
+                end = cursor + datetime.timedelta(minutes=variant.duration_minutes) + self.buffer
+                if not any(start < end and cursor < stop for start, stop in blocked.get(cabinet.id, [])):
+                    series_bookings.append((series, sequence, profile, cabinet, variant, cursor))
+                    cursor = end
+
+            while True:
+                variant = self.rng.choice(variants)
+                cursor += datetime.timedelta(minutes=self.rng.choice([0, 0, 0, 15, 30, 60]))
+                end = cursor + datetime.timedelta(minutes=variant.duration_minutes) + self.buffer
+                if end > day_close:
+                    break
+                overlap = [stop for start, stop in blocked.get(cabinet.id, []) if start < end and cursor < stop]
+                if overlap:
+                    cursor = max(overlap)
+                    continue
+                candidates.append((profile, cabinet, variant, cursor))
+                cursor = end
+        return series_bookings, candidates
+
+    # --- генерация по месяцам ---
+
+    def _seed_days(self, days):
+        closures, notes, bookings = [], [], []
+        for day in days:
+            day_closures = self._closures_for_day(day)
+            closures.extend(day_closures)
+
+            for _ in range(self.rng.randint(0, 3)):
+                start = self._aware(day, datetime.time(self.rng.randint(self.open_time.hour, self.close_time.hour - 1)))
+                notes.append(CalendarNote(
+                    start_time=start,
+                    end_time=start + datetime.timedelta(minutes=self.rng.choice([30, 60, 120])),
+                    comment=self.rng.choice(NOTE_COMMENTS),
+                    created_by=self.admin,
+                ))
+
+            series_bookings, candidates = self._plan_day(day, day_closures)
+            target = max(0, self.bookings_per_day - len(series_bookings))
+            for series, sequence, profile, cabinet, variant, start in series_bookings:
+                bookings.append(self._make_booking(
+                    profile, cabinet, variant, start, self._status(day, True),
+                    series.scale_guest, series=series, sequence=sequence,
+                ))
+            chosen = self.rng.sample(candidates, min(target, len(candidates)))
+            chosen.sort(key=lambda candidate: candidate[3])
+            for profile, cabinet, variant, start in chosen:
+                bookings.append(self._make_booking(
+                    profile, cabinet, variant, start, self._status(day, True), self._pick_guest()
+                ))
+            # Не поместившиеся в расписание — отмененные (не занимают время)
+            for _ in range(target - len(chosen)):
+                profile, cabinet, variant, start = self.rng.choice(candidates) if candidates else (None,) * 4
+                if profile is None:
+                    break
+                bookings.append(self._make_booking(
+                    profile, cabinet, variant, start, self._status(day, False), self._pick_guest()
+                ))
+                self.stats['canceled_overflow'] += 1
+
+        new_series = []
+        for booking in bookings:
+            if booking.series is not None and booking.series.pk is None and booking.series not in new_series:
+                new_series.append(booking.series)
+        BookingSeries.objects.bulk_create(new_series, batch_size=self.batch_size)
+        self.stats['series'] += len(new_series)
+
+        # Около 2% обычных бронирований сразу уходят в архив удаленных
+        archived = [booking for booking in bookings if booking.series is None and self.rng.random() < 0.02]
+        archived_ids = {id(booking) for booking in archived}
+        bookings = [booking for booking in bookings if id(booking) not in archived_ids]
+
+        CabinetClosure.objects.bulk_create(closures, batch_size=self.batch_size)
+        CalendarNote.objects.bulk_create(notes, batch_size=self.batch_size)
+        Booking.objects.bulk_create(bookings, batch_size=self.batch_size)
+        self._create_logs(bookings)
+        self._archive(archived)
+        index_bookings(bookings)
+        index_notes(notes)
+
+        self.stats['bookings'] += len(bookings)
+        self.stats['closures'] += len(closures)
+        self.stats['notes'] += len(notes)
+
+    def _create_logs(self, bookings):
+        """Лог «создано» для каждого бронирования и изменения статуса для части из них."""
+        logs = []
+        for booking in bookings:
+            action = 'series_created' if booking.series is not None and booking.sequence == 1 else 'created'
+            logs.append(BookingLog(booking=booking, action=action, user=self.admin, message='Бронирование создано'))
+            if booking.status != 'confirmed' and self.rng.random() < 0.5:
+                logs.append(BookingLog(
+                    booking=booking,
+                    action='status_changed',
+                    user=self.admin,
+                    message=f'Статус изменен на {booking.status}',
+                    old_values={'status': 'confirmed'},
+                    new_values={'status': booking.status},
+                ))
+        created = BookingLog.objects.bulk_create(logs, batch_size=self.batch_size)
+        # created_at заполняется auto_now_add; переносим на время начала бронирования
+        BookingLog.objects.filter(id__in=[log.id for log in created]).update(
+            created_at=Subquery(
+                Booking.objects.filter(pk=OuterRef('booking_id')).values('start_time')[:1]
+            )
+        )
+        self.stats['logs'] += len(created)
+
+    def _archive(self, bookings):
+        archives = [
+            build_deleted_booking(
+                booking,
+                deleted_by=self.admin,
+                deletion_reason=self.rng.choice(['Гость отменил', 'Ошибка ввода', '']),
+            )
+            for booking in bookings
+        ]
+        created = DeletedBooking.objects.bulk_create(archives, batch_size=self.batch_size)
+        DeletedBooking.objects.filter(id__in=[archive.id for archive in created]).update(
+            deleted_at=F('start_time') - datetime.timedelta(hours=2)
+        )
+        self.stats['deleted'] += len(created)
+
+
+def scale_data_exists():
+    """Есть ли в базе данные, созданные генератором."""
+    return User.objects.filter(username__startswith=f'{USERNAME_PREFIX}specialist_').exists()
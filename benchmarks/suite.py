@@ -0,0 +1,309 @@
+"""
+Замеры горячих путей: время (p50/p95) и количество SQL-запросов.
+
+Входные данные каждого замера выбираются генератором случайных чисел
+с фиксированным seed, поэтому повторные прогоны на одном наборе данных
+(см. seed.py) сравнимы между собой и с сохраненным baseline.
+"""
+import datetime
+import json
+import math
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+
+from booking.guest_utils import find_duplicate_groups
+from booking.models import Booking, Cabinet, Guest, ServiceVariant, SpecialistProfile
+from booking.utils import check_booking_conflicts, detect_occurrence_conflicts, find_available_slots
+
+# Регистрация бенчмарков: имя -> (функция подготовки, число прогонов по умолчанию или None,
+# бюджет SQL-запросов или None)
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=None, max_queries=None):
+    """
+    Регистрирует бенчмарк.
+
+    Функция получает контекст и генератор случайных чисел и возвращает
+    вызываемый объект без аргументов — только он и попадает в замер.
+    repeat ограничивает число прогонов для тяжелых операций.
+    max_queries — бюджет SQL-запросов на один прогон: превышение считается
+    ошибкой независимо от baseline (запросы на строку списка растут с объемом данных).
+    """
+    def decorator(prepare):
+        BENCHMARKS[name] = (prepare, repeat, max_queries)
+        return prepare
+    return decorator
+
+
+class BenchmarkContext:
+    """Общие данные для всех бенчмарков: справочники, период данных, HTTP-клиент."""
+
+    def __init__(self):
+        bounds = Booking.objects.aggregate(first=Min('start_time'), last=Max('start_time'))
+        if bounds['first'] is None:
+            raise ValueError('В базе нет бронирований: сначала выполните seed_scale')
+        self.first_day = timezone.localtime(bounds['first']).date()
+        self.last_day = timezone.localtime(bounds['last']).date()
+        self.variants = list(ServiceVariant.objects.select_related('service').order_by('id'))
+        self.specialists = list(SpecialistProfile.objects.order_by('id'))
+        self.cabinets = list(Cabinet.objects.filter(is_active=True).order_by('id'))
+        self.guest_names = list(Guest.objects.order_by('id').values_list('display_name', flat=True)[:2000])
+        self.booking_count = Booking.objects.count()
+
+        user = User.objects.filter(is_superuser=True).order_by('id').first()
+        if user is None:
+            user = User.objects.create(username='benchmark_admin', is_staff=True, is_superuser=True, password='!')
+        self.client = Client()
+        self.client.force_login(user)
+
+    def random_day(self, rng):
+        return self.first_day + datetime.timedelta(days=rng.randrange((self.last_day - self.first_day).days + 1))
+
+    def random_start(self, rng):
+        day = self.random_day(rng)
+        return timezone.make_aware(datetime.datetime.combine(day, datetime.time(rng.randint(9, 19), rng.choice([0, 15, 30, 45]))))
+
+    def get(self, path, params):
+        response = self.client.get(path, params)
+        if response.status_code != 200:
+            raise RuntimeError(f'{path} вернул {response.status_code}')
+        # Для потоковых ответов (CSV) важно прочитать тело целиком
+        return b''.join(response) if response.streaming else response.content
+
+
+@benchmark('find_available_slots')
+def bench_find_available_slots(context, rng):
+    day = context.random_day(rng)
+    variant = rng.choice(context.variants)
+    return lambda: find_available_slots(day, variant)
+
+
+@benchmark('check_booking_conflicts')
+def bench_check_booking_conflicts(context, rng):
+    start = context.random_start(rng)
+    variant = rng.choice(context.variants)
+    specialist = rng.choice(context.specialists)
+    cabinet = rng.choice(context.cabinets)
+    return lambda: check_booking_conflicts(start, variant, specialist, cabinet)
+
+
+@benchmark('detect_occurrence_conflicts')
+def bench_detect_occurrence_conflicts(context, rng):
+    """Проверка еженедельной серии из 12 повторений."""
+    start = context.random_start(rng)
+    occurrences = [start + datetime.timedelta(weeks=week) for week in range(12)]
+    variant = rng.choice(context.variants)
+    specialist = rng.choice(context.specialists)
+    cabinet = rng.choice(context.cabinets)
+    return lambda: detect_occurrence_conflicts(occurrences, variant, specialist, cabinet)
+
+
+@benchmark('calendar_feed_view')
+def bench_calendar_feed_view(context, rng):
+    """Неделя календаря, как ее запрашивает FullCalendar."""
+    start = timezone.make_aware(datetime.datetime.combine(context.random_day(rng), datetime.time.min))
+    params = {
+        'start': start.isoformat(),
+        'end': (start + datetime.timedelta(days=7)).isoformat(),
+    }
+    return lambda: context.get('/calendar/feed/', params)
+
+
+def _month_range(context, rng):
+    start = context.random_day(rng).replace(day=1)
+    end = (start + datetime.timedelta(days=32)).replace(day=1) - datetime.timedelta(days=1)
+    return {'start_date': start.isoformat(), 'end_date': end.isoformat()}
+
+
+@benchmark('reports_view')
+def bench_reports_view(context, rng):
+    params = _month_range(context, rng)
+    return lambda: context.get('/reports/', params)
+
+
+@benchmark('download_report_view')
+def bench_download_report_view(context, rng):
+    """CSV-выгрузка отчета за месяц."""
+    params = _month_range(context, rng)
+    return lambda: context.get('/reports/download/', params)
+
+
+@benchmark('find_duplicate_groups', repeat=3)
+def bench_find_duplicate_groups(context, rng):
+    return lambda: find_duplicate_groups()
+
+
+@benchmark('guest_autocomplete_view')
+def bench_guest_autocomplete_view(context, rng):
+    """Автодополнение по началу имени: короткий (3 символа) и длинный запрос."""
+    name = rng.choice(context.guest_names) if context.guest_names else 'Иван'
+    query = name[:rng.choice([3, 5, 8])]
+    return lambda: context.get('/api/v1/guests/autocomplete/', {'q': query})
+
+
+# Списки админки: число запросов не должно зависеть от строк на странице и объема таблиц.
+# В бюджет входят 2 запроса сессии и пользователя.
+
+@benchmark('admin_booking_changelist', max_queries=8)
+def bench_admin_booking_changelist(context, rng):
+    """Бронирования за месяц (date_hierarchy)."""
+    day = context.random_day(rng)
+    params = {'start_time__year': day.year, 'start_time__month': day.month}
+    return lambda: context.get('/admin/booking/booking/', params)
+
+
+@benchmark('admin_bookinglog_changelist', max_queries=8)
+def bench_admin_bookinglog_changelist(context, rng):
+    return lambda: context.get('/admin/booking/bookinglog/', {})
+
+
+@benchmark('admin_guest_changelist', max_queries=7)
+def bench_admin_guest_changelist(context, rng):
+    """Поиск гостя по началу имени с сортировкой по числу бронирований."""
+    name = rng.choice(context.guest_names) if context.guest_names else 'Иван'
+    return lambda: context.get('/admin/booking/guest/', {'q': name[:3], 'o': '-3'})
+
+
+@benchmark('admin_deletedbooking_changelist', max_queries=7)
+def bench_admin_deletedbooking_changelist(context, rng):
+    return lambda: context.get('/admin/booking/deletedbooking/', {})
+
+
+def percentile(values, fraction):
+    """Перцентиль по методу ближайшего ранга."""
+    ordered = sorted(values)
+    index = max(0, math.ceil(fraction * len(ordered)) - 1)
+    return ordered[index]
+
+
+def run_benchmark(context, name, repeat=20, warmup=2, seed=42):
+    """
+    Выполняет один бенчмарк.
+
+    Returns:
+        dict: runs, p50_ms, p95_ms, mean_ms, max_ms, queries (медиана), queries_max,
+        max_queries (бюджет или None)
+    """
+    prepare, max_repeat, max_queries = BENCHMARKS[name]
+    if max_repeat:
+        repeat = min(repeat, max_repeat)
+        warmup = 0
+    rng = random.Random(f'{seed}:{name}')
+
+    for _ in range(warmup):
+        prepare(context, rng)()
+
+    timings = []
+    query_counts = []
+    for _ in range(repeat):
+        case = prepare(context, rng)
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            case()
+            timings.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(queries))
+
+    return {
+        'runs': repeat,
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p95_ms': round(percentile(timings, 0.95), 2),
+        'mean_ms': round(statistics.mean(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'queries': int(statistics.median(query_counts)),
+        'queries_max': max(query_counts),
+        'max_queries': max_queries,
+    }
+
+
+def run_suite(names=None, repeat=20, warmup=2, seed=42, on_result=None):
+    """
+    Выполняет бенчмарки (по умолчанию все) и возвращает отчет для сохранения в JSON.
+    """
+    names = names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f'Неизвестные бенчмарки: {", ".join(unknown)}')
+
+    # Тестовый клиент ходит с хостом testserver
+    with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+        context = BenchmarkContext()
+        results = {}
+        for name in names:
+            results[name] = run_benchmark(context, name, repeat=repeat, warmup=warmup, seed=seed)
+            if on_result:
+                on_result(name, results[name])
+
+    return {
+        'meta': {
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'bookings': context.booking_count,
+            'period': [context.first_day.isoformat(), context.last_day.isoformat()],
+            'seed': seed,
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as report_file:
+        return json.load(report_file)
+
+
+def save_report(report, path):
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, ensure_ascii=False, indent=2)
+        report_file.write('\n')
+
+
+def over_budget(report):
+    """
+    Бенчмарки, превысившие бюджет SQL-запросов хотя бы в одном прогоне.
+
+    Returns:
+        list: словари name, queries_max, max_queries
+    """
+    return [
+        {'name': name, 'queries_max': result['queries_max'], 'max_queries': result['max_queries']}
+        for name, result in report['results'].items()
+        if result.get('max_queries') is not None and result['queries_max'] > result['max_queries']
+    ]
+
+
+def compare(report, baseline, tolerance=0.2):
+    """
+    Сравнивает отчет с baseline.
+
+    Регрессия — p95 вырос больше чем на tolerance (доля) или выросло
+    медианное число запросов.
+
+    Returns:
+        list: словари name, p95_ms, baseline_p95_ms, change, queries, baseline_queries, regression
+    """
+    rows = []
+    for name, result in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        change = (result['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] if previous['p95_ms'] else 0.0
+        rows.append({
+            'name': name,
+            'p95_ms': result['p95_ms'],
+            'baseline_p95_ms': previous['p95_ms'],
+            'change': change,
+            'queries': result['queries'],
+            'baseline_queries': previous['queries'],
+            'regression': change > tolerance or result['queries'] > previous['queries'],
+        })
+    return rows
@@ -1,13 +1,22 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.admin.helpers import ActionForm
 from django.urls import path
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_http_methods
+from django.utils import timezone
 from django.utils.html import format_html
-from django.db.models import Count
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.fields.json import KeyTextTransform
+from django.db.models.functions import Coalesce
 from solo.admin import SingletonModelAdmin
 from booking.guest_utils import find_duplicate_groups, merge_guests, calculate_similarity
+from booking.search_utils import search_object_ids
+from booking.db_routers import use_replica
+from booking.admin_utils import LargeTableAdminMixin
+from booking.schedule_utils import apply_schedule_template
 from .models import (
     SystemSettings,
     CabinetType,
@@ -19,11 +28,15 @@ from .models import (
     Booking,
     ScheduleTemplate,
     ScheduleTemplateDay,
+    ScheduleOverride,
+    ScheduleOverrideInterval,
     CabinetClosure,
     CalendarNote,
     DeletedBooking,
     BookingLog,
     Guest,
+    EmailOutbox,
+    SearchEntry,
 )
 
 
@@ -49,18 +62,82 @@ class ServiceAdmin(admin.ModelAdmin):
     filter_horizontal = ('required_cabinet_types',)
 
 
+class SpecialistActionForm(ActionForm):
+    """Форма действий над специалистами: выбор шаблона расписания"""
+    schedule_template = forms.ModelChoiceField(
+        queryset=ScheduleTemplate.objects.all(),
+        required=False,
+        label='Шаблон расписания'
+    )
+
+
 @admin.register(SpecialistProfile)
 class SpecialistProfileAdmin(admin.ModelAdmin):
     list_display = ('full_name', 'user')
     filter_horizontal = ('services_can_perform',)
+    action_form = SpecialistActionForm
+    actions = ['apply_schedule_template_action']
+
+    # Сколько бронирований вне новых часов перечислять в сообщении
+    OUTSIDE_HOURS_SHOWN = 20
+
+    def apply_schedule_template_action(self, request, queryset):
+        """Применяет выбранный шаблон ко всем отмеченным специалистам одной транзакцией"""
+        template_id = request.POST.get('schedule_template')
+        if not template_id:
+            messages.error(request, 'Выберите шаблон расписания')
+            return
+        template = ScheduleTemplate.objects.filter(id=template_id).first()
+        if template is None:
+            messages.error(request, 'Шаблон не найден')
+            return
+
+        report = apply_schedule_template(template, queryset.values_list('id', flat=True))
+        messages.success(
+            request,
+            f'Шаблон "{template.name}" применен к {report["specialists"]} специалистам ({report["days"]} дней)'
+        )
+        outside_hours = report['outside_hours']
+        if outside_hours:
+            lines = [
+                f'#{booking["id"]} {booking["specialist_name"]}, '
+                f'{timezone.localtime(booking["start_time"]).strftime("%d.%m.%Y %H:%M")}, {booking["guest_name"]}'
+                for booking in outside_hours[:self.OUTSIDE_HOURS_SHOWN]
+            ]
+            if len(outside_hours) > self.OUTSIDE_HOURS_SHOWN:
+                lines.append(f'и еще {len(outside_hours) - self.OUTSIDE_HOURS_SHOWN}')
+            messages.warning(
+                request,
+                f'Вне новых часов работы {len(outside_hours)} бронирований: ' + '; '.join(lines)
+            )
+
+    apply_schedule_template_action.short_description = 'Применить шаблон расписания'
     inlines = [SpecialistScheduleInline]
 
 
 @admin.register(Booking)
-class BookingAdmin(admin.ModelAdmin):
+class BookingAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('start_time', 'guest_name', 'service_variant', 'specialist', 'cabinet', 'status')
-    list_filter = ('status', 'specialist', 'start_time')
-    readonly_fields = ('end_time',)
+    list_filter = ('status', 'specialist')
+    # str(booking) (подпись флажка действий) обращается к гостю, str(service_variant) - к услуге
+    list_select_related = ('guest', 'service_variant__service', 'specialist', 'cabinet')
+    date_hierarchy = 'start_time'
+    ordering = ('-start_time',)
+    # icontains по имени гостя использует trigram-индекс (миграция 0027)
+    search_fields = ('guest_name',)
+    # Выпадающие списки гостей и серий на форме загружали бы всю таблицу
+    raw_id_fields = ('guest', 'series', 'created_by')
+    readonly_fields = ('end_time', 'updated_at')
+
+    def get_search_results(self, request, queryset, search_term):
+        """К icontains по имени гостя добавляются ID и полнотекстовый индекс (комментарий, комната, услуга...)"""
+        base_queryset = queryset
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            if search_term.strip().isdigit():
+                queryset |= base_queryset.filter(id=int(search_term))
+            queryset |= base_queryset.filter(id__in=search_object_ids(search_term, SearchEntry.KIND_BOOKING))
+        return queryset, may_have_duplicates
 
 
 class SpecialistScheduleAdmin(admin.ModelAdmin):
@@ -204,12 +281,33 @@ class ScheduleTemplateAdmin(admin.ModelAdmin):
     create_template_from_specialist.short_description = 'Создать шаблон из расписания специалиста'
 
 
+class ScheduleOverrideIntervalInline(admin.TabularInline):
+    """Inline для интервалов работы в исключении из графика"""
+    model = ScheduleOverrideInterval
+    extra = 0
+    fields = ('start_time', 'end_time')
+    verbose_name = 'Интервал работы'
+    verbose_name_plural = 'Интервалы работы (для типа «Свои интервалы»)'
+
+
+@admin.register(ScheduleOverride)
+class ScheduleOverrideAdmin(admin.ModelAdmin):
+    """Admin для исключений из графика: выходные, отпуска, смены с перерывом"""
+    list_display = ('specialist', 'start_date', 'end_date', 'kind', 'reason')
+    list_filter = ('kind', 'specialist')
+    list_select_related = ('specialist',)
+    search_fields = ('reason', 'specialist__full_name')
+    date_hierarchy = 'start_date'
+    inlines = [ScheduleOverrideIntervalInline]
+    readonly_fields = ('created_at', 'updated_at')
+
+
 @admin.register(DeletedBooking)
-class DeletedBookingAdmin(admin.ModelAdmin):
+class DeletedBookingAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin для удаленных бронирований"""
     list_display = ('get_guest_name', 'get_service', 'get_specialist', 'get_deleted_at', 'restored', 'deletion_scope')
     list_filter = ('restored', 'deletion_scope', 'deleted_at')
-    search_fields = ('booking_data__guest_name', 'booking_data__specialist_name', 'booking_data__cabinet_name')
+    search_fields = ('guest_name', 'specialist_name', 'cabinet_name')
     readonly_fields = ('original_id', 'booking_data', 'series_id', 'series_data', 'deleted_at', 'restored_at')
     date_hierarchy = 'deleted_at'
     ordering = ('-deleted_at',)
@@ -227,20 +325,31 @@ class DeletedBookingAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """
+        Услуга извлекается из JSON в базе, а сами JSON-поля в список не загружаются
+        (на форме они дочитываются отдельными запросами).
+        """
+        return super().get_queryset(request).annotate(
+            service_name=KeyTextTransform('service_variant_name', 'booking_data')
+        ).defer('booking_data', 'series_data')
+
     def get_guest_name(self, obj):
-        """Имя гостя из JSON данных"""
-        return obj.booking_data.get('guest_name', '—') if obj.booking_data else '—'
+        """Имя гостя (денормализованная колонка)"""
+        return obj.guest_name or '—'
     get_guest_name.short_description = 'Гость'
+    get_guest_name.admin_order_field = 'guest_name'
     
     def get_service(self, obj):
         """Услуга из JSON данных"""
-        return obj.booking_data.get('service_variant_name', '—') if obj.booking_data else '—'
+        return obj.service_name or '—'
     get_service.short_description = 'Услуга'
     
     def get_specialist(self, obj):
-        """Специалист из JSON данных"""
-        return obj.booking_data.get('specialist_name', '—') if obj.booking_data else '—'
+        """Специалист (денормализованная колонка)"""
+        return obj.specialist_name or '—'
     get_specialist.short_description = 'Специалист'
+    get_specialist.admin_order_field = 'specialist_name'
     
     def get_deleted_at(self, obj):
         """Дата удаления"""
@@ -251,11 +360,14 @@ class DeletedBookingAdmin(admin.ModelAdmin):
 
 
 @admin.register(BookingLog)
-class BookingLogAdmin(admin.ModelAdmin):
+class BookingLogAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin для логов бронирований"""
     list_display = ('booking', 'action', 'user', 'created_at', 'message_short')
-    list_filter = ('action', 'created_at', 'user')
-    search_fields = ('booking__guest_name', 'message', 'user__username')
+    list_filter = ('action', 'user')
+    # str(booking) обращается к гостю и услуге
+    list_select_related = ('booking__guest', 'booking__service_variant__service', 'user')
+    # icontains по сообщению использует trigram-индекс (миграция 0027), таблица пользователей маленькая
+    search_fields = ('message', 'user__username')
     readonly_fields = ('booking', 'action', 'user', 'message', 'old_values', 'new_values', 'created_at', 'ip_address')
     date_hierarchy = 'created_at'
     ordering = ('-created_at',)
@@ -270,6 +382,16 @@ class BookingLogAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_search_results(self, request, queryset, search_term):
+        """Бронирования ищем по полнотекстовому индексу, а не icontains по имени гостя"""
+        base_queryset = queryset
+        queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            if search_term.strip().isdigit():
+                queryset |= base_queryset.filter(booking_id=int(search_term))
+            queryset |= base_queryset.filter(booking_id__in=search_object_ids(search_term, SearchEntry.KIND_BOOKING))
+        return queryset, may_have_duplicates
+
     def message_short(self, obj):
         """Короткое сообщение для списка"""
         if obj.message:
@@ -287,10 +409,10 @@ class BookingLogAdmin(admin.ModelAdmin):
 
 
 @admin.register(Guest)
-class GuestAdmin(admin.ModelAdmin):
+class GuestAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     """Admin для управления гостями"""
     list_display = ('display_name', 'normalized_name', 'get_booking_count', 'created_at')
-    list_filter = ('created_at',)
+    # icontains по обоим полям использует trigram-индексы (миграция 0027)
     search_fields = ('display_name', 'normalized_name')
     readonly_fields = ('normalized_name', 'created_at', 'updated_at')
     date_hierarchy = 'created_at'
@@ -306,11 +428,24 @@ class GuestAdmin(admin.ModelAdmin):
         }),
     )
     
+    def get_queryset(self, request):
+        """
+        Количество бронирований - коррелированным подзапросом: считается только
+        для гостей текущей страницы (по индексу booking.guest_id), а не GROUP BY
+        по всей таблице бронирований.
+        """
+        booking_count = Booking.objects.filter(guest=OuterRef('pk')).order_by().values('guest').annotate(
+            count=Count('id')
+        ).values('count')
+        return super().get_queryset(request).annotate(
+            booking_count=Coalesce(Subquery(booking_count, output_field=IntegerField()), Value(0))
+        )
+
     def get_booking_count(self, obj):
         """Количество бронирований"""
-        return obj.bookings.count()
+        return obj.booking_count
     get_booking_count.short_description = 'Бронирований'
-    get_booking_count.admin_order_field = 'bookings__count'
+    get_booking_count.admin_order_field = 'booking_count'
     
     def get_urls(self):
         urls = super().get_urls()
@@ -328,6 +463,7 @@ class GuestAdmin(admin.ModelAdmin):
         ]
         return custom_urls + urls
     
+    @use_replica
     def merge_duplicates_view(self, request):
         """Страница для просмотра и выбора дублей для объединения"""
         threshold = float(request.GET.get('threshold', 0.85))
@@ -429,6 +565,36 @@ class GuestAdmin(admin.ModelAdmin):
     merge_selected_guests.short_description = 'Объединить выбранных гостей'
 
 
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Admin для очереди email-уведомлений"""
+    list_display = ('recipient', 'kind', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status', 'kind', 'created_at')
+    search_fields = ('recipient', 'subject')
+    list_select_related = ('specialist',)
+    readonly_fields = (
+        'specialist', 'kind', 'booking_ids', 'changed_booking_ids', 'recipient', 'subject', 'body', 'html_body',
+        'attempts', 'claimed_at', 'last_error', 'created_at', 'sent_at',
+    )
+    ordering = ('-created_at',)
+    actions = ['requeue_emails']
+
+    def has_add_permission(self, request):
+        """Письма попадают в очередь только из приложения"""
+        return False
+
+    def requeue_emails(self, request, queryset):
+        """Вернуть выбранные письма в очередь"""
+        from django.utils import timezone
+        updated = queryset.exclude(status=EmailOutbox.STATUS_SENT).update(
+            status=EmailOutbox.STATUS_PENDING,
+            attempts=0,
+            next_attempt_at=timezone.now(),
+        )
+        messages.success(request, f'Возвращено в очередь писем: {updated}')
+    requeue_emails.short_description = 'Повторить отправку'
+
+
 admin.site.register(SystemSettings, SingletonModelAdmin)
 admin.site.register(CabinetType)
 admin.site.register(Cabinet)
@@ -441,6 +607,7 @@ admin.site.register(CabinetClosure)
 class CalendarNoteAdmin(admin.ModelAdmin):
     list_display = ('start_time', 'end_time', 'comment_short', 'created_by', 'created_at')
     list_filter = ('created_at',)
+    # icontains по комментарию использует trigram-индекс (миграция 0025)
     search_fields = ('comment',)
     readonly_fields = ('created_at', 'updated_at')
     date_hierarchy = 'start_time'
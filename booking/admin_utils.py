@@ -0,0 +1,46 @@
+"""
+Производительность списков в админке на больших таблицах.
+
+Django admin на каждой странице списка выполняет COUNT(*) по отфильтрованному
+запросу и еще один — по всей таблице («показать все N»). На миллионах строк это
+самые дорогие запросы страницы, поэтому списки бронирований, логов, гостей
+и архива используют оценку количества из статистики PostgreSQL
+(pagination_utils.estimate_count) и не считают общее число записей.
+"""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+
+from .pagination_utils import estimate_count
+
+
+def get_exact_count_limit():
+    """До этого количества (по оценке) записи считаются точно."""
+    return getattr(settings, 'ADMIN_EXACT_COUNT_LIMIT', 10000)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор с оценкой количества записей для больших списков.
+
+    На PostgreSQL количество берется из плана запроса (EXPLAIN); небольшие
+    выборки (меньше ADMIN_EXACT_COUNT_LIMIT по оценке) пересчитываются точно,
+    чтобы фильтры с малым результатом показывали верное число страниц.
+    На остальных СУБД — обычный count().
+    """
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+        count, is_estimate = estimate_count(self.object_list)
+        if is_estimate and count < get_exact_count_limit():
+            return self.object_list.count()
+        return count
+
+
+class LargeTableAdminMixin:
+    """Оценка количества вместо COUNT(*) и без подсчета всей таблицы."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -8,10 +8,12 @@ from rest_framework.permissions import AllowAny
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.authentication import SessionAuthentication
 from django.http import JsonResponse
+from django.utils.cache import get_conditional_response
 import logging
 
 from .models import Booking, SpecialistProfile, Guest
 from .serializers import BookingSerializer
+from .schedule_sync_utils import build_schedule_payload, schedule_etag
 from .guest_utils import find_similar_guests, normalize_guest_name
 
 logger = logging.getLogger(__name__)
@@ -39,11 +41,11 @@ class MyScheduleAPI(generics.ListAPIView):
     """
     API для получения расписания специалиста (только для чтения).
     
-    Возвращает все бронирования для текущего авторизованного специалиста.
+    Возвращает бронирования текущего авторизованного специалиста.
     
     Endpoint: GET /api/v1/my-schedule/
     
-    Response:
+    Без параметров - все бронирования списком (как в первых версиях API):
     [
         {
             "id": 1,
@@ -55,9 +57,21 @@ class MyScheduleAPI(generics.ListAPIView):
             "service_duration": 60,
             "start_time": "2025-11-03T10:00:00Z",
             "end_time": "2025-11-03T11:15:00Z",
-            "status": "confirmed"
+            "status": "confirmed",
+            "updated_at": "2025-11-01T09:12:44Z"
         }
     ]
+    
+    С параметрами from/to, limit, cursor или updated_since - страница
+    (см. schedule_sync_utils):
+    {
+        "results": [...],
+        "next_cursor": "...",
+        "next_updated_since": "2025-11-01T09:11:44+00:00",
+        "deleted": [15, 16]
+    }
+    
+    Ответ отдается с ETag; запрос с совпадающим If-None-Match получает 304.
     """
     serializer_class = BookingSerializer
     permission_classes = [permissions.IsAuthenticated, IsSpecialistPermission]
@@ -74,10 +88,21 @@ class MyScheduleAPI(generics.ListAPIView):
             ).select_related(
                 'specialist', 'cabinet',
                 'service_variant', 'service_variant__service'
-            ).order_by('start_time')
+            ).order_by('start_time', 'id')
         except SpecialistProfile.DoesNotExist:
             logger.error(f"SpecialistProfile not found for user {self.request.user.id}")
             return Booking.objects.none()
+    
+    def list(self, request, *args, **kwargs):
+        specialist = SpecialistProfile.objects.get(user=request.user)
+        data = build_schedule_payload(specialist, request.query_params)
+        etag = schedule_etag(data)
+        response = get_conditional_response(request._request, etag=etag)
+        if response is None:
+            response = Response(data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
 
 
 @api_view(['GET'])
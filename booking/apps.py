@@ -6,4 +6,5 @@ class BookingConfig(AppConfig):
     name = 'booking'
     
     def ready(self):
-        import booking.signals  # noqa
\ No newline at end of file
+        import booking.signals  # noqa
+        import booking.checks  # noqa
@@ -0,0 +1,124 @@
+"""
+Утилиты для архивирования удаленных бронирований (DeletedBooking)
+"""
+import datetime
+import logging
+
+from django.db import transaction
+
+from .models import Booking, BookingLog, DeletedBooking
+from .side_effect_utils import apply_booking_side_effects
+
+logger = logging.getLogger(__name__)
+
+
+def serialize_booking(booking):
+    """Данные бронирования для поля DeletedBooking.booking_data."""
+    return {
+        'guest_name': booking.guest_name,
+        'guest_room_number': booking.guest_room_number,
+        'service_variant_id': booking.service_variant_id,
+        'service_variant_name': str(booking.service_variant),
+        'specialist_id': booking.specialist_id,
+        'specialist_name': booking.specialist.full_name if booking.specialist else None,
+        'cabinet_id': booking.cabinet_id,
+        'cabinet_name': booking.cabinet.name if booking.cabinet else None,
+        'start_time': booking.start_time.isoformat() if booking.start_time else None,
+        'end_time': booking.end_time.isoformat() if booking.end_time else None,
+        'status': booking.status,
+        'created_by_id': booking.created_by_id,
+        'created_by_username': booking.created_by.username if booking.created_by else None,
+        'series_id': booking.series_id,
+        'sequence': booking.sequence,
+    }
+
+
+def serialize_series(series):
+    """Данные серии для поля DeletedBooking.series_data."""
+    if not series:
+        return None
+    return {
+        'id': series.id,
+        'start_time': series.start_time.isoformat() if series.start_time else None,
+        'frequency': series.frequency,
+        'interval': series.interval,
+        'occurrence_count': series.occurrence_count,
+        'end_date': series.end_date.isoformat() if series.end_date else None,
+        'weekdays': series.weekdays,
+        'excluded_dates': [
+            d.isoformat() if isinstance(d, datetime.date) else str(d)
+            for d in (series.excluded_dates or [])
+        ],
+        'created_by_id': series.created_by_id,
+    }
+
+
+def build_deleted_booking(booking, deleted_by=None, deletion_reason='', deletion_scope='single', series_data=None):
+    """
+    Создает (без сохранения) запись архива для бронирования.
+
+    series_data можно передать заранее, чтобы не сериализовать серию
+    для каждого бронирования при массовом удалении.
+    """
+    if series_data is None and booking.series_id:
+        series_data = serialize_series(booking.series)
+    booking_data = serialize_booking(booking)
+    return DeletedBooking(
+        original_id=booking.id,
+        booking_data=booking_data,
+        guest_name=booking_data['guest_name'] or '',
+        specialist_name=booking_data['specialist_name'] or '',
+        cabinet_name=booking_data['cabinet_name'] or '',
+        start_time=booking.start_time,
+        series_id=booking.series_id,
+        series_data=series_data,
+        deleted_by=deleted_by,
+        deletion_reason=deletion_reason,
+        deletion_scope=deletion_scope,
+    )
+
+
+def archive_and_delete_series(series, deleted_by=None, deletion_reason=''):
+    """
+    Удаляет всю серию бронирований с архивированием за постоянное число запросов.
+
+    Бронирования серии загружаются одним запросом со всеми связанными объектами,
+    архив создается одним bulk_create, а удаление выполняется напрямую
+    в БД без сигналов pre_delete (архив уже записан).
+
+    Returns:
+        int: количество удаленных бронирований
+    """
+    series_id = series.pk
+    with transaction.atomic():
+        bookings = list(
+            Booking.objects.filter(series=series)
+            .select_related('service_variant__service', 'specialist', 'cabinet', 'created_by')
+        )
+        series_data = serialize_series(series)
+        archives = [
+            build_deleted_booking(
+                booking,
+                deleted_by=deleted_by,
+                deletion_reason=deletion_reason,
+                deletion_scope='series',
+                series_data=series_data,
+            )
+            for booking in bookings
+        ]
+        DeletedBooking.objects.bulk_create(archives, batch_size=500)
+
+        booking_ids = [booking.id for booking in bookings]
+        # Логи удаляются вместе с бронированием (CASCADE), здесь — явно и одним запросом
+        logs = BookingLog.objects.filter(booking_id__in=booking_ids)
+        logs._raw_delete(logs.db)
+        doomed = Booking.objects.filter(id__in=booking_ids)
+        doomed._raw_delete(doomed.db)
+        # Сигналы post_delete не вызывались - их работа выполняется для всей серии сразу
+        apply_booking_side_effects(bookings, deleted=True)
+
+        # Бронирования, добавленные в серию параллельно, удалятся каскадом через сигналы
+        series.delete()
+
+    logger.info(f"Series {series_id} deleted with {len(booking_ids)} bookings archived")
+    return len(booking_ids)
@@ -0,0 +1,336 @@
+"""
+Async-версии JSON-эндпоинтов только для чтения (режим ASGI, см. ASYNC_VIEWS_ENABLED).
+
+Под uvicorn-воркерами медленный запрос не занимает воркер целиком: пока один
+view ждет базу, тот же процесс обслуживает опросы календаря. Ответы совпадают
+с sync-версиями из views.py и api_views.py, которые используются под WSGI.
+"""
+import asyncio
+import json
+import logging
+import time
+
+from asgiref.sync import sync_to_async
+from django.db.models import Count, Q
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from .db_routers import use_replica
+from .decorators import admin_required, staff_required
+from .guest_utils import find_similar_guests, normalize_guest_name
+from .live_utils import KIND_CLOSURE, get_bus, get_live_setting
+from .metrics import timed
+from .models import Booking, CabinetClosure, CalendarNote, Cabinet, Guest, SpecialistProfile
+from .schedule_sync_utils import build_schedule_payload, schedule_etag
+from .density_utils import MAX_DAYS as DENSITY_MAX_DAYS, days_in_window
+from .views import (
+    build_booking_event,
+    build_density_payload,
+    build_closure_event,
+    build_note_event,
+    generate_cabinet_colors,
+    parse_feed_window,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@admin_required
+@timed('calendar_feed')
+@use_replica
+async def calendar_feed_view(request):
+    """
+    Возвращает события для FullCalendar в формате JSON.
+    """
+    window = parse_feed_window(request)
+    if window is None:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+    start_date, end_date = window
+
+    cabinets = [cabinet async for cabinet in Cabinet.objects.filter(is_active=True).order_by('id')]
+    cabinet_colors = generate_cabinet_colors(cabinets)
+
+    bookings = Booking.objects.filter(
+        start_time__range=[start_date, end_date]
+    ).select_related('service_variant', 'specialist', 'cabinet').order_by('start_time')
+    events = [build_booking_event(b, cabinet_colors) async for b in bookings]
+
+    # Технические записи (информационные заметки)
+    notes = CalendarNote.objects.filter(
+        start_time__lt=end_date,
+        end_time__gt=start_date
+    ).order_by('start_time')
+    events.extend([build_note_event(note) async for note in notes])
+
+    response = JsonResponse(events, safe=False)
+    response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+    response['Pragma'] = 'no-cache'
+    return response
+
+
+@admin_required
+@timed('calendar_density')
+@use_replica
+async def calendar_density_view(request):
+    """
+    Агрегаты по дням и ресурсам для месячного вида календаря (см. density_utils).
+    """
+    window = parse_feed_window(request)
+    if window is None:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+    days = days_in_window(*window)
+    if not days or len(days) > DENSITY_MAX_DAYS:
+        return JsonResponse({'error': f'Период должен быть от 1 до {DENSITY_MAX_DAYS} дней'}, status=400)
+
+    # Кэш Django синхронный, агрегаты считаются в потоке
+    payload = await sync_to_async(build_density_payload)(days)
+    response = JsonResponse(payload)
+    response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+    return response
+
+
+@staff_required
+async def cabinet_closure_feed_view(request):
+    """
+    Возвращает события-закрытия кабинетов для FullCalendar.
+    """
+    window = parse_feed_window(request)
+    if window is None:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+    start_date, end_date = window
+
+    closures = CabinetClosure.objects.filter(
+        start_time__lt=end_date,
+        end_time__gt=start_date
+    ).select_related('cabinet').order_by('start_time')
+
+    user = await request.auser()
+    can_delete = user.is_staff or user.is_superuser
+    events = [build_closure_event(closure, can_delete) async for closure in closures]
+    return JsonResponse(events, safe=False)
+
+
+@admin_required
+async def specialist_resources_view(request):
+    """
+    Возвращает список специалистов как ресурсы для FullCalendar.
+    """
+    resources = [{'id': s.id, 'title': s.full_name} async for s in SpecialistProfile.objects.all()]
+    return JsonResponse(resources, safe=False)
+
+
+@admin_required
+async def cabinet_resources_view(request):
+    """
+    Возвращает список кабинетов как ресурсы для FullCalendar.
+    """
+    resources = [{'id': c.id, 'title': c.name} async for c in Cabinet.objects.filter(is_active=True)]
+    return JsonResponse(resources, safe=False)
+
+
+# Пустой комментарий раз в 20 с не дает прокси (nginx, балансировщик) закрыть простаивающий поток
+STREAM_HEARTBEAT_SECONDS = 20
+STREAM_RETRY_MS = 3000
+
+
+def _sse_message(message, include_closures):
+    patches = message['patches']
+    if not include_closures:
+        patches = [patch for patch in patches if patch.get('kind') != KIND_CLOSURE]
+        if not patches:
+            return ''
+    data = json.dumps(patches, ensure_ascii=False, separators=(',', ':'))
+    return f"id: {message['id']}\nevent: patch\ndata: {data}\n\n"
+
+
+@admin_required
+async def calendar_stream_view(request):
+    """
+    Поток Server-Sent Events с изменениями календаря (см. live_utils).
+
+    Каждое событие patch - список патчей: upsert (готовое событие FullCalendar),
+    remove или refetch. После переподключения EventSource присылает Last-Event-ID,
+    и пропущенные сообщения досылаются из истории шины; если их уже нет,
+    клиент получает refetch. Поток закрывается через LIVE_UPDATES_STREAM_SECONDS,
+    браузер переподключается сам.
+    """
+    user = await request.auser()
+    include_closures = user.is_staff or user.is_superuser
+    last_event_id = request.headers.get('Last-Event-ID')
+    lifetime = get_live_setting('STREAM_SECONDS', 600)
+
+    bus = get_bus()
+
+    async def stream():
+        # Подписка до чтения истории: повтор патча безопасен, пропуск - нет
+        subscriber = bus.subscribe()
+        _, queue = subscriber
+        try:
+            yield f'retry: {STREAM_RETRY_MS}\n\n'
+            if last_event_id:
+                missed = bus.missed_since(last_event_id)
+                if missed is None:
+                    missed = [{'id': last_event_id, 'patches': [{'op': 'refetch'}]}]
+                for message in missed:
+                    chunk = _sse_message(message, include_closures)
+                    if chunk:
+                        yield chunk
+
+            deadline = time.monotonic() + lifetime
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    message = await asyncio.wait_for(queue.get(), min(STREAM_HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ': ping\n\n'
+                    continue
+                chunk = _sse_message(message, include_closures)
+                if chunk:
+                    yield chunk
+        finally:
+            bus.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Без этого nginx буферизует ответ и события приходят пачками
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _api_response(data, status=200):
+    """JSON так же, как его отдает DRF (компактный, без экранирования кириллицы)."""
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+def _api_error(exc):
+    """Ответ в формате обработчика исключений DRF."""
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = _api_response(data, status=exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = JWTAuthentication().authenticate_header(None)
+    return response
+
+
+@csrf_exempt
+async def guest_autocomplete_view(request):
+    """
+    Автодополнение имен гостей (аналог api_views.guest_autocomplete_view).
+
+    Количество бронирований считается одним агрегирующим запросом,
+    а не отдельным COUNT на каждого гостя.
+    """
+    if request.method != 'GET':
+        return _api_error(exceptions.MethodNotAllowed(request.method))
+
+    query = request.GET.get('q', '').strip()
+    limit = int(request.GET.get('limit', 10))
+
+    if not query or len(query) < 2:
+        return JsonResponse([], safe=False)
+
+    normalized_query = normalize_guest_name(query)
+
+    if len(query) <= 3:
+        # Для очень коротких запросов используем icontains (содержит) для более широкого поиска
+        all_guests = [
+            guest async for guest in Guest.objects.filter(
+                Q(normalized_name__icontains=query) |
+                Q(display_name__icontains=query) |
+                Q(normalized_name__icontains=normalized_query)
+            ).distinct().order_by('display_name')[:limit]
+        ]
+    else:
+        # Поиск похожих целиком синхронный (триграммы/индекс) - выполняем в потоке
+        similar_guests = await sync_to_async(find_similar_guests)(query, threshold=0.5, limit=limit)
+        exact_matches = [
+            guest async for guest in Guest.objects.filter(
+                Q(normalized_name__istartswith=normalized_query) |
+                Q(display_name__istartswith=query)
+            ).exclude(
+                id__in=[g.id for g in similar_guests]
+            ).distinct()[:limit - len(similar_guests)]
+        ]
+        all_guests = list(similar_guests) + exact_matches
+
+    guests = []
+    seen_ids = set()
+    for guest in all_guests[:limit]:
+        if guest.id not in seen_ids:
+            seen_ids.add(guest.id)
+            guests.append(guest)
+
+    booking_counts = {
+        row['guest_id']: row['count']
+        async for row in Booking.objects.filter(
+            guest_id__in=seen_ids
+        ).values('guest_id').annotate(count=Count('id')).order_by()
+    }
+    results = [
+        {
+            'id': guest.id,
+            'display_name': guest.display_name,
+            'normalized_name': guest.normalized_name,
+            'booking_count': booking_counts.get(guest.id, 0),
+        }
+        for guest in guests
+    ]
+    return JsonResponse(results, safe=False)
+
+
+async def _authenticate_api_user(request):
+    """
+    Аутентификация как у MyScheduleAPI: сначала JWT, затем сессия.
+
+    Raises:
+        AuthenticationFailed: передан некорректный токен
+    """
+    authenticated = await sync_to_async(JWTAuthentication().authenticate)(request)
+    if authenticated is not None:
+        return authenticated[0]
+    user = await request.auser()
+    return user if user.is_authenticated else None
+
+
+@csrf_exempt
+async def my_schedule_view(request):
+    """
+    Расписание текущего специалиста (аналог api_views.MyScheduleAPI,
+    параметры и формат ответа - в schedule_sync_utils).
+
+    DRF 3.15 не поддерживает async-view, поэтому аутентификация, проверка прав
+    и формат ошибок воспроизведены вручную; сериализация - тем же BookingSerializer.
+    """
+    if request.method != 'GET':
+        return _api_error(exceptions.MethodNotAllowed(request.method))
+
+    try:
+        user = await _authenticate_api_user(request)
+    except exceptions.AuthenticationFailed as exc:
+        return _api_error(exc)
+    if user is None:
+        return _api_error(exceptions.NotAuthenticated())
+
+    try:
+        specialist = await SpecialistProfile.objects.aget(user=user)
+    except SpecialistProfile.DoesNotExist:
+        logger.warning(f"User {user.id} attempted to access specialist API without profile")
+        return _api_error(exceptions.PermissionDenied())
+
+    try:
+        # Сериализация обходит связанные объекты синхронно, поэтому целиком в потоке
+        data = await sync_to_async(build_schedule_payload)(specialist, request.GET)
+    except exceptions.ValidationError as exc:
+        return _api_error(exc)
+    etag = schedule_etag(data)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = _api_response(data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,296 @@
+"""
+Массовые операции с бронированиями: перенос, передача другому специалисту,
+смена кабинета, отмена и смена статуса.
+
+Пакет обрабатывается за постоянное число запросов независимо от его размера:
+бронирования, специалисты и кабинеты загружаются по одному запросу, конфликты
+проверяются одним проходом check_booking_conflicts_bulk, изменения сохраняются
+bulk_update в одной транзакции, логи — одним bulk_create (buffered_booking_logs).
+
+bulk_update не вызывает сигналы post_save, поэтому их работа (поисковый индекс,
+живое обновление календаря, кэши плотности и .ics, синхронизация API,
+сводки специалистам) выполняется для всего пакета через apply_booking_side_effects.
+"""
+import copy
+import datetime
+import logging
+
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .log_utils import buffered_booking_logs, get_booking_changes, log_booking_action
+from .models import Booking, Cabinet, SpecialistProfile, SystemSettings
+from .side_effect_utils import apply_booking_side_effects
+from .utils import check_booking_conflicts_bulk
+
+logger = logging.getLogger(__name__)
+
+# Больше бронирований за один запрос не принимаем
+MAX_BULK_BOOKINGS = 500
+OPERATIONS = ('move', 'reassign', 'cabinet', 'cancel', 'status')
+CONFLICT_MODES = ('warn', 'skip')
+UPDATE_FIELDS = ['start_time', 'end_time', 'specialist', 'cabinet', 'status', 'updated_at']
+STATUS_NAMES = dict(Booking.STATUS_CHOICES)
+CONFLICT_MESSAGES = {
+    'specialist_busy': 'Специалист занят в это время',
+    'cabinet_busy': 'Кабинет занят в это время',
+    'specialist_not_available': 'Специалист не работает в это время',
+    'cabinet_not_available': 'Кабинет недоступен в это время',
+}
+# Действие лога, если изменилось только одно поле
+LOG_ACTIONS = {
+    'start_time': 'time_changed',
+    'specialist_id': 'specialist_changed',
+    'cabinet_id': 'cabinet_changed',
+    'status': 'status_changed',
+}
+CHANGE_NAMES = {
+    'start_time': 'время',
+    'specialist_id': 'специалист',
+    'cabinet_id': 'кабинет',
+    'status': 'статус',
+}
+
+
+class BulkOperationError(ValueError):
+    """Некорректный пакет операций (ответ 400 для всего запроса)."""
+
+
+def _parse_id(value, name):
+    if isinstance(value, bool) or not isinstance(value, (int, str)) or not str(value).isdigit():
+        raise BulkOperationError(f'{name}: ожидается целое число')
+    return int(value)
+
+
+def _parse_start_time(value):
+    """Время начала: локальное YYYY-MM-DDTHH:MM или ISO 8601 со смещением."""
+    moment = parse_datetime(value.replace('Z', '+00:00')) if isinstance(value, str) else None
+    if moment is None:
+        raise ValueError('Неверный формат даты и времени')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def parse_operations(payload):
+    """
+    Разворачивает тело запроса в список операций по одному бронированию.
+
+    Формат:
+        {
+            "on_conflict": "warn" | "skip",
+            "operations": [
+                {"op": "move", "booking_id": 1, "start_time": "2025-11-03T10:00"},
+                {"op": "reassign", "booking_id": 2, "specialist_id": 5, "cabinet_id": 3},
+                {"op": "cabinet", "booking_id": 3, "cabinet_id": 4},
+                {"op": "cancel", "booking_ids": [4, 5]},
+                {"op": "status", "booking_ids": [6, 7], "status": "completed"}
+            ]
+        }
+
+    Raises:
+        BulkOperationError: некорректная структура пакета
+
+    Returns:
+        tuple (operations, on_conflict): operations - список словарей op,
+        booking_id и параметров в порядке запроса
+    """
+    if not isinstance(payload, dict) or not isinstance(payload.get('operations'), list):
+        raise BulkOperationError('Ожидается объект с полем operations (список операций)')
+    on_conflict = payload.get('on_conflict', 'warn')
+    if on_conflict not in CONFLICT_MODES:
+        raise BulkOperationError(f'on_conflict: допустимо {", ".join(CONFLICT_MODES)}')
+
+    operations = []
+    for index, item in enumerate(payload['operations']):
+        if not isinstance(item, dict) or item.get('op') not in OPERATIONS:
+            raise BulkOperationError(f'operations[{index}]: op должно быть одним из {", ".join(OPERATIONS)}')
+        if 'booking_ids' in item:
+            if not isinstance(item['booking_ids'], list):
+                raise BulkOperationError(f'operations[{index}].booking_ids: ожидается список')
+            booking_ids = [_parse_id(value, f'operations[{index}].booking_ids') for value in item['booking_ids']]
+        else:
+            booking_ids = [_parse_id(item.get('booking_id'), f'operations[{index}].booking_id')]
+        params = {key: value for key, value in item.items() if key not in ('booking_id', 'booking_ids')}
+        operations.extend(dict(params, booking_id=booking_id) for booking_id in booking_ids)
+
+    if len({operation['booking_id'] for operation in operations}) > MAX_BULK_BOOKINGS:
+        raise BulkOperationError(f'Не более {MAX_BULK_BOOKINGS} бронирований за запрос')
+    return operations, on_conflict
+
+
+def _conflict_warning(conflicts):
+    messages = [message for key, message in CONFLICT_MESSAGES.items() if conflicts.get(key)]
+    return '; '.join(messages) if messages else 'Выбранное время имеет конфликты'
+
+
+def _apply_operation(booking, operation, specialists, cabinets):
+    """
+    Применяет операцию к бронированию в памяти.
+
+    Raises:
+        ValueError: операцию нельзя применить (текст ошибки - для ответа)
+    """
+    op = operation['op']
+    if op == 'move':
+        booking.start_time = _parse_start_time(operation.get('start_time'))
+    elif op == 'reassign':
+        specialist = specialists.get(operation.get('specialist_id'))
+        if specialist is None:
+            raise ValueError('Специалист не найден')
+        if not any(service.id == booking.service_variant.service_id for service in specialist.services_can_perform.all()):
+            raise ValueError('Выбранный специалист не может выполнять данную услугу')
+        booking.specialist = specialist
+    elif op in ('cancel', 'status'):
+        status = 'canceled' if op == 'cancel' else operation.get('status')
+        if status not in STATUS_NAMES:
+            raise ValueError(f'Неизвестный статус: {status}')
+        booking.status = status
+
+    if op == 'cabinet' or (op in ('move', 'reassign') and operation.get('cabinet_id') is not None):
+        cabinet = cabinets.get(operation.get('cabinet_id'))
+        if cabinet is None:
+            raise ValueError('Кабинет не найден')
+        if not any(cabinet_type.id == cabinet.cabinet_type_id
+                   for cabinet_type in booking.service_variant.service.required_cabinet_types.all()):
+            raise ValueError('Выбранный кабинет не подходит для данной услуги')
+        booking.cabinet = cabinet
+
+
+def _lookup_ids(operations, key):
+    ids = set()
+    for operation in operations:
+        value = operation.get(key)
+        if value is None:
+            continue
+        try:
+            operation[key] = _parse_id(value, key)
+        except BulkOperationError:
+            # Ошибка достанется этой операции: объекта с id 0 не бывает
+            operation[key] = 0
+            continue
+        ids.add(operation[key])
+    return ids
+
+
+def apply_bulk_operations(operations, user, on_conflict='warn', request=None):
+    """
+    Применяет операции из parse_operations одной транзакцией.
+
+    Конфликты по умолчанию не мешают изменению (как при переносе drag & drop),
+    а возвращаются предупреждением; с on_conflict='skip' бронирование
+    с конфликтом не меняется. Ошибка в операции пропускает только ее бронирование.
+
+    Returns:
+        list: по одному результату на бронирование в порядке первого упоминания -
+        booking_id, success, changed (список полей), warning или error
+    """
+    booking_ids = list(dict.fromkeys(operation['booking_id'] for operation in operations))
+    specialist_ids = _lookup_ids(operations, 'specialist_id')
+    cabinet_ids = _lookup_ids(operations, 'cabinet_id')
+
+    with transaction.atomic(), buffered_booking_logs():
+        bookings = Booking.objects.select_for_update(of=('self',)).filter(id__in=booking_ids).select_related(
+            'service_variant__service', 'specialist__user', 'cabinet', 'guest'
+        ).prefetch_related('service_variant__service__required_cabinet_types').in_bulk()
+        specialists = SpecialistProfile.objects.select_related('user').prefetch_related(
+            'services_can_perform'
+        ).in_bulk(specialist_ids) if specialist_ids else {}
+        cabinets = Cabinet.objects.in_bulk(cabinet_ids) if cabinet_ids else {}
+
+        results = {booking_id: {'booking_id': booking_id, 'success': True} for booking_id in booking_ids}
+        originals = {}
+        for operation in operations:
+            result = results[operation['booking_id']]
+            booking = bookings.get(operation['booking_id'])
+            if booking is None:
+                result.update(success=False, error='Бронирование не найдено')
+                continue
+            if not result['success']:
+                continue
+            originals.setdefault(booking.id, copy.copy(booking))
+            try:
+                _apply_operation(booking, operation, specialists, cabinets)
+            except ValueError as e:
+                result.update(success=False, error=str(e))
+
+        system_settings = SystemSettings.get_solo()
+        changed = []
+        for booking_id in booking_ids:
+            booking = bookings.get(booking_id)
+            result = results[booking_id]
+            if not result['success']:
+                # Бронирование остается как было: частично примененные операции отбрасываем
+                if booking_id in originals:
+                    bookings[booking_id] = originals[booking_id]
+                continue
+            old_values, new_values = get_booking_changes(originals[booking_id], booking)
+            result['changed'] = [field.removesuffix('_id') for field in new_values]
+            if new_values:
+                total_duration = booking.service_variant.duration_minutes + system_settings.buffer_time_minutes
+                booking.end_time = booking.start_time + datetime.timedelta(minutes=total_duration)
+                changed.append((booking, originals[booking_id], old_values, new_values))
+
+        # Один проход проверки конфликтов: сначала неизмененные бронирования пакета
+        # занимают свое время, затем проверяются измененные (как при сохранении по одному).
+        # Смена статуса проверяется, только если бронирование снова становится подтвержденным:
+        # отметка «выполнено» в конце дня не должна давать предупреждений о графике.
+        changed_ids = {booking.id for booking, _, _, _ in changed}
+        checked = [booking for booking in bookings.values() if booking.id not in changed_ids] + [
+            booking for booking, _, _, new_values in changed
+            if {'start_time', 'specialist_id', 'cabinet_id'} & set(new_values)
+            or ('status' in new_values and booking.status == 'confirmed')
+        ]
+        conflicts = check_booking_conflicts_bulk([
+            {
+                'start_time': booking.start_time,
+                'service_variant': booking.service_variant,
+                'specialist': booking.specialist,
+                'cabinet': booking.cabinet,
+                'status': booking.status,
+            }
+            for booking in checked
+        ], exclude_booking_ids=booking_ids)
+        conflicts_by_id = {
+            booking.id: booking_conflicts
+            for booking, booking_conflicts in zip(checked, conflicts)
+            # Отмененные бронирования конфликтов не создают
+            if booking_conflicts and booking.id in changed_ids and booking.status != 'canceled'
+        }
+
+        applied = []
+        now = timezone.now()
+        for booking, original, old_values, new_values in changed:
+            result = results[booking.id]
+            booking_conflicts = conflicts_by_id.get(booking.id)
+            if booking_conflicts:
+                if on_conflict == 'skip':
+                    result.update(success=False, changed=[], error=_conflict_warning(booking_conflicts))
+                    continue
+                result['warning'] = _conflict_warning(booking_conflicts)
+            booking.updated_at = now
+            applied.append((booking, original, new_values))
+            fields = list(new_values)
+            change_text = ', '.join(CHANGE_NAMES.get(field, field) for field in fields)
+            log_booking_action(
+                booking=booking,
+                action=LOG_ACTIONS[fields[0]] if len(fields) == 1 and fields[0] in LOG_ACTIONS else 'updated',
+                user=user,
+                message=f'Массовая операция: изменено {change_text}',
+                old_values=old_values,
+                new_values=new_values,
+                request=request,
+            )
+
+        if applied:
+            Booking.objects.bulk_update([booking for booking, _, _ in applied], UPDATE_FIELDS, batch_size=500)
+            apply_booking_side_effects(
+                [booking for booking, _, _ in applied],
+                originals={booking.id: (original.start_time, original.specialist_id) for booking, original, _ in applied},
+                system_settings=system_settings,
+            )
+            logger.info(f"Bulk booking operations by {user.username if user else None}: {len(applied)} bookings changed")
+
+    return [results[booking_id] for booking_id in booking_ids]
+
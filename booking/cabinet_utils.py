@@ -0,0 +1,171 @@
+"""
+Автоматический выбор кабинета для бронирования и серий.
+
+Когда кабинет не выбран вручную, для каждого повторения подбирается свободный
+подходящий кабинет, при котором в расписании остается меньше всего простоев:
+бронирование ставится вплотную к уже занятому времени (best fit), а свободные
+кабинеты остаются целыми для длинных процедур. При равенстве выбирается
+кабинет с меньшим id, поэтому результат детерминирован. Если свободного
+кабинета нет, assign_cabinets_or_least_busy берет кабинет с наименьшим
+пересечением (сначала с закрытиями, затем с бронированиями) — бронирование
+создается с предупреждением о конфликте, как при ручном выборе кабинета.
+
+Занятость всех подходящих кабинетов загружается на весь период серии сразу
+(постоянное число запросов независимо от длины серии), дальше подбор идет
+в памяти, как в check_booking_conflicts_bulk.
+"""
+import datetime
+
+from django.utils import timezone
+
+from .metrics import timed
+from .models import Booking, Cabinet, CabinetClosure, SystemSettings
+
+
+def get_valid_cabinets(service_variant):
+    """Активные кабинеты подходящего для услуги типа в порядке id."""
+    return list(
+        Cabinet.objects.filter(
+            cabinet_type__in=service_variant.service.required_cabinet_types.all(),
+            is_active=True,
+        ).distinct().order_by('id')
+    )
+
+
+def _as_time(value):
+    # До первого сохранения SystemSettings время может оставаться строкой из default
+    return datetime.time.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _gap_score(busy_intervals, start_time, end_time, open_time, close_time):
+    """
+    Простой, который оставляет бронирование в кабинете: время до ближайшей
+    занятости слева и справа в пределах часов работы SPA.
+    """
+    local_start = timezone.localtime(start_time)
+    day_open = timezone.make_aware(datetime.datetime.combine(local_start.date(), open_time))
+    day_close = timezone.make_aware(datetime.datetime.combine(local_start.date(), close_time))
+
+    left = min(day_open, start_time)
+    right = max(day_close, end_time)
+    for busy_start, busy_end in busy_intervals:
+        if busy_end <= start_time:
+            left = max(left, busy_end)
+        elif busy_start >= end_time:
+            right = min(right, busy_start)
+    return (start_time - left) + (right - end_time)
+
+
+def assign_cabinets(occurrences, service_variant, exclude_booking_ids=None, cabinets=None):
+    """
+    Подбирает свободный кабинет для каждого времени начала из occurrences.
+
+    Args:
+        occurrences: список datetime начала (одно бронирование или серия)
+        service_variant: ServiceVariant, определяет длительность и типы кабинетов
+        exclude_booking_ids: ID бронирований, которые не учитываются (редактирование серии)
+        cabinets: подходящие кабинеты, если уже загружены (иначе get_valid_cabinets)
+
+    Returns:
+        list: Cabinet для каждого повторения или None, если свободного подходящего
+        кабинета нет (вызывающий код решает, что делать с конфликтом)
+    """
+    return [
+        cabinet if free else None
+        for cabinet, free in _assign(occurrences, service_variant, exclude_booking_ids, cabinets)
+    ]
+
+
+def assign_cabinets_or_least_busy(occurrences, service_variant, exclude_booking_ids=None, cabinets=None):
+    """
+    Как assign_cabinets, но без пропусков: если свободного кабинета нет, берется
+    наименее конфликтующий.
+
+    Returns:
+        list: пары (Cabinet или None, если подходящих кабинетов нет; свободен ли кабинет)
+    """
+    return _assign(occurrences, service_variant, exclude_booking_ids, cabinets)
+
+
+@timed('assign_cabinets')
+def _assign(occurrences, service_variant, exclude_booking_ids, cabinets):
+    if not occurrences:
+        return []
+    if cabinets is None:
+        cabinets = get_valid_cabinets(service_variant)
+    if not cabinets:
+        return [(None, False)] * len(occurrences)
+
+    settings = SystemSettings.get_solo()
+    duration = datetime.timedelta(minutes=service_variant.duration_minutes + settings.buffer_time_minutes)
+    open_time = _as_time(settings.spa_open_time)
+    close_time = _as_time(settings.spa_close_time)
+
+    # Окно загрузки - с запасом на целый день, чтобы видеть соседние бронирования
+    range_start = min(occurrences) - datetime.timedelta(days=1)
+    range_end = max(occurrences) + duration + datetime.timedelta(days=1)
+    cabinet_ids = [cabinet.id for cabinet in cabinets]
+
+    # Те же правила занятости, что и в check_booking_conflicts: учитываются подтвержденные
+    bookings = Booking.objects.filter(
+        cabinet_id__in=cabinet_ids,
+        start_time__lt=range_end,
+        end_time__gt=range_start,
+        status='confirmed',
+    )
+    if exclude_booking_ids:
+        bookings = bookings.exclude(id__in=list(exclude_booking_ids))
+
+    # Интервалы раскладываются по (кабинет, день): повторение сравнивается только со своим днем
+    busy_by_day = {}
+    closed_by_day = {}
+
+    def add_interval(index, cabinet_id, start_time, end_time):
+        day = timezone.localtime(start_time).date()
+        last_day = timezone.localtime(end_time).date()
+        while day <= last_day:
+            index.setdefault((cabinet_id, day), []).append((start_time, end_time))
+            day += datetime.timedelta(days=1)
+
+    for cabinet_id, start_time, end_time in bookings.values_list('cabinet_id', 'start_time', 'end_time'):
+        add_interval(busy_by_day, cabinet_id, start_time, end_time)
+
+    for cabinet_id, start_time, end_time in CabinetClosure.objects.filter(
+        cabinet_id__in=cabinet_ids,
+        start_time__lt=range_end,
+        end_time__gt=range_start,
+    ).values_list('cabinet_id', 'start_time', 'end_time'):
+        # Многодневное закрытие режем по окну загрузки, чтобы не раскладывать годы по дням
+        add_interval(closed_by_day, cabinet_id, max(start_time, range_start), min(end_time, range_end))
+
+    def overlap(intervals, start_time, end_time):
+        return sum(
+            (min(busy_end, end_time) - max(busy_start, start_time) for busy_start, busy_end in intervals
+             if busy_start < end_time and busy_end > start_time),
+            datetime.timedelta(),
+        )
+
+    assignments = []
+    for start_time in occurrences:
+        end_time = start_time + duration
+        days = {timezone.localtime(start_time).date(), timezone.localtime(end_time).date()}
+        best = None
+        least_busy = None
+        for cabinet in cabinets:
+            # Интервал через полночь разложен в оба дня - считаем его один раз
+            busy = list({interval for day in days for interval in busy_by_day.get((cabinet.id, day), ())})
+            closed = list({interval for day in days for interval in closed_by_day.get((cabinet.id, day), ())})
+            conflict = (overlap(closed, start_time, end_time), overlap(busy, start_time, end_time), cabinet.id)
+            if conflict[0] or conflict[1]:
+                if least_busy is None or conflict < least_busy[0]:
+                    least_busy = (conflict, cabinet)
+                continue
+            # Закрытия тоже ограничивают простой: бронирование вплотную к закрытию не дробит день
+            score = (_gap_score(busy + closed, start_time, end_time, open_time, close_time), cabinet.id)
+            if best is None or score < best[0]:
+                best = (score, cabinet)
+        cabinet, free = (best[1], True) if best else (least_busy[1], False)
+        # Следующие повторения серии видят уже назначенное время
+        add_interval(busy_by_day, cabinet.id, start_time, end_time)
+        assignments.append((cabinet, free))
+    return assignments
@@ -0,0 +1,164 @@
+"""
+Проверки конфигурации подключений к БД и кэша (Django system checks).
+
+Выполняются при старте контейнера (manage.py check / migrate в entrypoint.sh)
+и выдают предупреждения, а не ошибки: приложение запустится, но с
+неоптимальными или опасными настройками пула, постоянных соединений и кэша.
+"""
+import importlib.util
+import os
+
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+from django.db import connections
+
+DEFAULT_WORKERS = 3
+# Соединения, которые оставляем для миграций, mailer, psql и бэкапов
+RESERVED_CONNECTIONS = 10
+
+
+def get_worker_count():
+    """Число воркеров gunicorn, как его задает config/gunicorn.conf.py."""
+    try:
+        return int(os.environ.get('WEB_CONCURRENCY', DEFAULT_WORKERS))
+    except ValueError:
+        return DEFAULT_WORKERS
+
+
+def get_pool_options(alias='default'):
+    """Параметры пула psycopg3 из OPTIONS или None, если пул выключен."""
+    pool = settings.DATABASES[alias].get('OPTIONS', {}).get('pool')
+    if not pool:
+        return None
+    return pool if isinstance(pool, dict) else {}
+
+
+@register(Tags.database)
+def check_connection_settings(app_configs, databases=None, **kwargs):
+    """Согласованность пула, CONN_MAX_AGE и режима pgbouncer."""
+    db = settings.DATABASES['default']
+    if 'postgresql' not in db['ENGINE']:
+        return []
+
+    warnings = []
+    pool = get_pool_options()
+    options = db.get('OPTIONS', {})
+    conn_max_age = db.get('CONN_MAX_AGE', 0)
+    pgbouncer = getattr(settings, 'DATABASE_PGBOUNCER', False)
+
+    if pool is not None:
+        if importlib.util.find_spec('psycopg') is None or importlib.util.find_spec('psycopg_pool') is None:
+            warnings.append(Warning(
+                'Пул соединений включен, но psycopg 3 или psycopg_pool не установлены.',
+                hint='Установите psycopg[binary,pool] (requirements.txt) или задайте DATABASE_POOL=False.',
+                id='booking.W101',
+            ))
+        if conn_max_age:
+            warnings.append(Warning(
+                'Пул соединений несовместим с CONN_MAX_AGE != 0: Django не сможет открыть соединение.',
+                hint='Для пула оставьте CONN_MAX_AGE = 0.',
+                id='booking.W102',
+            ))
+        min_size = pool.get('min_size', 4)
+        max_size = pool.get('max_size') or min_size
+        if min_size > max_size:
+            warnings.append(Warning(
+                f'min_size пула ({min_size}) больше max_size ({max_size}).',
+                hint='Проверьте DATABASE_POOL_MIN_SIZE и DATABASE_POOL_MAX_SIZE.',
+                id='booking.W103',
+            ))
+        if not db.get('CONN_HEALTH_CHECKS'):
+            warnings.append(Warning(
+                'Пул выдает соединения без проверки: после рестарта Postgres первые запросы упадут.',
+                hint='Задайте CONN_HEALTH_CHECKS = True (Django передаст пулу check_connection).',
+                id='booking.W104',
+            ))
+        if 'check' in pool:
+            warnings.append(Warning(
+                'OPTIONS["pool"]["check"] конфликтует с проверкой, которую Django передает пулу сам.',
+                hint='Уберите "check" из OPTIONS["pool"] и используйте CONN_HEALTH_CHECKS = True.',
+                id='booking.W111',
+            ))
+    elif not conn_max_age and not settings.DEBUG and not pgbouncer:
+        warnings.append(Warning(
+            'Ни пул, ни постоянные соединения не настроены: каждый запрос открывает новое соединение с Postgres.',
+            hint='Включите DATABASE_POOL=True или задайте DATABASE_CONN_MAX_AGE.',
+            id='booking.W105',
+        ))
+    elif conn_max_age and not db.get('CONN_HEALTH_CHECKS'):
+        warnings.append(Warning(
+            'Постоянные соединения без CONN_HEALTH_CHECKS: разорванное соединение всплывет ошибкой в запросе.',
+            hint='Задайте CONN_HEALTH_CHECKS = True.',
+            id='booking.W106',
+        ))
+
+    if conn_max_age and getattr(settings, 'SERVER_MODE', 'wsgi') == 'asgi':
+        warnings.append(Warning(
+            'Под ASGI постоянные соединения (CONN_MAX_AGE) не закрываются после запроса и копятся.',
+            hint='Под ASGI используйте пул (DATABASE_POOL=True).',
+            id='booking.W107',
+        ))
+
+    if pgbouncer:
+        if not db.get('DISABLE_SERVER_SIDE_CURSORS'):
+            warnings.append(Warning(
+                'pgbouncer в режиме transaction несовместим с server-side курсорами (iterator()).',
+                hint='Задайте DISABLE_SERVER_SIDE_CURSORS = True.',
+                id='booking.W108',
+            ))
+        if options.get('prepare_threshold', 5) is not None:
+            warnings.append(Warning(
+                'pgbouncer в режиме transaction не сохраняет prepared statements psycopg 3.',
+                hint='Задайте OPTIONS["prepare_threshold"] = None.',
+                id='booking.W109',
+            ))
+        if getattr(settings, 'LIVE_UPDATES_ENABLED', False) and getattr(settings, 'LIVE_UPDATES_BUS', 'auto') != 'inprocess':
+            warnings.append(Warning(
+                'LISTEN не работает через pgbouncer в режиме transaction: живое обновление календаря не получит изменения.',
+                hint='Задайте LIVE_UPDATES_BUS=inprocess (один воркер) или подключите слушателя к Postgres напрямую.',
+                id='booking.W112',
+            ))
+
+    # Лимит сервера проверяем, только когда есть доступ к базе (check --database, migrate)
+    if pool is not None and databases and 'default' in databases:
+        warnings.extend(_check_max_connections(pool))
+    return warnings
+
+
+@register(Tags.caches)
+def check_cache_settings(app_configs, **kwargs):
+    """Кэш графиков, плотности и .ics сбрасывается через поколение - он должен быть общим для воркеров."""
+    backend = settings.CACHES.get('default', {}).get('BACKEND', '')
+    workers = get_worker_count()
+    if backend.endswith('LocMemCache') and workers > 1 and not settings.DEBUG:
+        return [Warning(
+            f'LocMemCache у каждого из {workers} воркеров свой: после изменения графика или бронирования '
+            f'остальные воркеры до истечения кэша (SCHEDULE_CACHE_SECONDS и др.) показывают старые '
+            f'часы работы, слоты и плотность календаря.',
+            hint='Задайте общий CACHE_BACKEND (Redis, файловый) или WEB_CONCURRENCY=1.',
+            id='booking.W113',
+        )]
+    return []
+
+
+def _check_max_connections(pool):
+    connection = connections['default']
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW max_connections')
+            max_connections = int(cursor.fetchone()[0])
+    except Exception:
+        return []
+
+    workers = get_worker_count()
+    max_size = pool.get('max_size') or pool.get('min_size', 4)
+    required = workers * max_size
+    if required + RESERVED_CONNECTIONS > max_connections:
+        return [Warning(
+            f'Пулы {workers} воркеров могут открыть до {required} соединений, '
+            f'а max_connections Postgres = {max_connections} '
+            f'(нужен запас {RESERVED_CONNECTIONS} для миграций, mailer и обслуживания).',
+            hint='Уменьшите DATABASE_POOL_MAX_SIZE или WEB_CONCURRENCY, либо подключитесь через pgbouncer.',
+            id='booking.W110',
+        )]
+    return []
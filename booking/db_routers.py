@@ -0,0 +1,118 @@
+"""
+Маршрутизация тяжелых чтений на реплику БД.
+
+Если в DATABASES есть алиас replica (см. replica_database_settings в settings.py),
+чтения внутри view, помеченных @use_replica (отчеты, выгрузки, лента календаря,
+архив удаленных, поиск дублей гостей), идут на реплику; все записи и остальные
+view — на default.
+
+Read-your-writes: после успешного изменяющего запроса ReplicaPinningMiddleware
+ставит cookie на REPLICA_STICKY_SECONDS, и пока она жива, чтения этого
+пользователя идут на default — перенесенное drag & drop бронирование сразу
+видно в ленте, даже если реплика отстает.
+"""
+import functools
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import OperationalError, connections
+
+logger = logging.getLogger(__name__)
+
+REPLICA_ALIAS = 'replica'
+PIN_COOKIE_NAME = 'db_primary_pin'
+# Модели, которые всегда читаются с default (сессия только что могла быть записана)
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in settings.DATABASES
+
+
+def get_sticky_seconds():
+    return getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+@contextmanager
+def replica_reads():
+    """Чтения внутри блока разрешено отправлять на реплику."""
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@contextmanager
+def pinned_to_primary(pinned=True):
+    """Чтения внутри блока идут на default (read-your-writes)."""
+    token = _pinned_to_primary.set(pinned)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+def use_replica(view_func):
+    """
+    Декоратор read-only view (в том числе async): чтения идут на реплику.
+
+    Если реплика недоступна, view выполняется повторно с чтением из default.
+    """
+    if iscoroutinefunction(view_func):
+        @functools.wraps(view_func)
+        async def async_wrapper(*args, **kwargs):
+            if not replica_configured():
+                return await view_func(*args, **kwargs)
+            try:
+                with replica_reads():
+                    return await view_func(*args, **kwargs)
+            except OperationalError as e:
+                logger.warning(f"Replica unavailable, falling back to primary: {e}")
+                return await view_func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(view_func)
+    def wrapper(*args, **kwargs):
+        if not replica_configured():
+            return view_func(*args, **kwargs)
+        try:
+            with replica_reads():
+                return view_func(*args, **kwargs)
+        except OperationalError as e:
+            logger.warning(f"Replica unavailable, falling back to primary: {e}")
+            return view_func(*args, **kwargs)
+    return wrapper
+
+
+class ReplicaRouter:
+    """
+    Роутер для DATABASE_ROUTERS: реплика только для чтений внутри @use_replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get() or _pinned_to_primary.get():
+            return None
+        if model._meta.app_label in PRIMARY_ONLY_APPS or not replica_configured():
+            return None
+        # Внутри транзакции на default читаем оттуда же, иначе не увидим свои изменения
+        if connections['default'].in_atomic_block:
+            return None
+        return REPLICA_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика - копия default, объекты с обеих баз можно связывать
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит с репликацией (или копированием SQLite), не миграциями
+        return db != REPLICA_ALIAS
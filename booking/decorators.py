@@ -1,11 +1,33 @@
 """
-Декораторы для проверки прав доступа пользователей
+Декораторы для проверки прав доступа пользователей.
+
+Декораторы работают и с async-view (см. async_views.py): для них
+пользователь загружается через request.auser(), а проверка групп — aexists().
 """
+from asgiref.sync import iscoroutinefunction
 from django.core.exceptions import PermissionDenied
 from django.http import JsonResponse
 from django.contrib.auth.views import redirect_to_login
 
 
+def _is_ajax_or_api(request):
+    return request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.path.startswith('/api/')
+
+
+def _unauthenticated_response(request):
+    # Для AJAX-запросов возвращаем JSON, для обычных - редирект на логин
+    if _is_ajax_or_api(request):
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+    return redirect_to_login(request.path)
+
+
+def _forbidden_response(request):
+    # Для AJAX-запросов возвращаем JSON, для обычных вызываем PermissionDenied
+    if _is_ajax_or_api(request):
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    raise PermissionDenied
+
+
 def group_required(*group_names):
     """
     Декоратор для проверки принадлежности пользователя к одной из указанных групп.
@@ -19,24 +41,25 @@ def group_required(*group_names):
             ...
     """
     def decorator(view_func):
+        if iscoroutinefunction(view_func):
+            async def async_wrapper(request, *args, **kwargs):
+                user = await request.auser()
+                if not user.is_authenticated:
+                    return _unauthenticated_response(request)
+                if user.is_superuser or await user.groups.filter(name__in=group_names).aexists():
+                    return await view_func(request, *args, **kwargs)
+                return _forbidden_response(request)
+            return async_wrapper
+
         def wrapper(request, *args, **kwargs):
             # Проверяем авторизацию (request.user.is_authenticated проверяется автоматически Django)
             if not request.user.is_authenticated:
-                # Для AJAX-запросов возвращаем JSON
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.path.startswith('/api/'):
-                    return JsonResponse({'error': 'Требуется авторизация'}, status=401)
-                # Для обычных запросов - редирект на логин
-                return redirect_to_login(request.path)
+                return _unauthenticated_response(request)
             
             # Проверяем группы
             if request.user.groups.filter(name__in=group_names).exists() or request.user.is_superuser:
                 return view_func(request, *args, **kwargs)
-            else:
-                # Для AJAX-запросов возвращаем JSON
-                if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.path.startswith('/api/'):
-                    return JsonResponse({'error': 'Доступ запрещен'}, status=403)
-                # Для обычных запросов вызываем PermissionDenied
-                raise PermissionDenied
+            return _forbidden_response(request)
         return wrapper
     return decorator
 
@@ -48,20 +71,23 @@ def staff_required(view_func):
     """
     Декоратор для сотрудников (Django is_staff).
     """
+    if iscoroutinefunction(view_func):
+        async def async_wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            if not user.is_authenticated:
+                return _unauthenticated_response(request)
+            if user.is_staff or user.is_superuser:
+                return await view_func(request, *args, **kwargs)
+            return _forbidden_response(request)
+        return async_wrapper
 
     def wrapper(request, *args, **kwargs):
         if not request.user.is_authenticated:
-            if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.path.startswith('/api/'):
-                return JsonResponse({'error': 'Требуется авторизация'}, status=401)
-            return redirect_to_login(request.path)
+            return _unauthenticated_response(request)
 
         if request.user.is_staff or request.user.is_superuser:
             return view_func(request, *args, **kwargs)
 
-        if request.headers.get('X-Requested-With') == 'XMLHttpRequest' or request.path.startswith('/api/'):
-            return JsonResponse({'error': 'Доступ запрещен'}, status=403)
-        raise PermissionDenied
+        return _forbidden_response(request)
 
     return wrapper
-
-
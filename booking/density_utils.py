@@ -0,0 +1,244 @@
+"""
+Плотность календаря: агрегаты по дням и ресурсам для месячного вида.
+
+Вместо тысяч событий с extendedProps месячный вид получает по каждому дню
+число бронирований, занятые минуты и загрузку специалистов относительно их
+графика (с учетом исключений, см. schedule_utils) и кабинетов относительно часов работы SPA
+за вычетом закрытий.
+
+Бронирования агрегируются одним GROUP BY по диапазону start_time (индекс
+booking_start_time_idx). Готовые дни кэшируются по отдельности (Django cache):
+сигналы сбрасывают только затронутые дни, а изменения графиков и системных
+настроек — все дни сразу через поколение кэша.
+"""
+import datetime
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .metrics import record_cache_access
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = 'calendar_density'
+GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+# Больше дней за запрос не отдаем (месячный вид FullCalendar - до 42 дней)
+MAX_DAYS = 62
+EXCLUDED_STATUSES = ('canceled',)
+
+
+def get_cache_seconds():
+    return getattr(settings, 'CALENDAR_DENSITY_CACHE_SECONDS', 600)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(GENERATION_KEY, generation, None)
+    return generation
+
+
+def _day_key(day, generation):
+    return f'{CACHE_PREFIX}:{generation}:{day.isoformat()}'
+
+
+def local_day_bounds(day):
+    """Начало дня day и начало следующего дня в текущей таймзоне."""
+    start = timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+    return start, timezone.make_aware(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time.min))
+
+
+def days_in_window(start, end):
+    """Дни, попадающие в окно [start, end) FullCalendar."""
+    first = timezone.localtime(start).date() if timezone.is_aware(start) else start.date()
+    last_moment = end - datetime.timedelta(microseconds=1)
+    last = timezone.localtime(last_moment).date() if timezone.is_aware(last_moment) else last_moment.date()
+    return [first + datetime.timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def _minutes_between(start, end):
+    return max(0, int((end - start).total_seconds() // 60))
+
+
+def _time_minutes(start_time, end_time):
+    return max(0, (end_time.hour * 60 + end_time.minute) - (start_time.hour * 60 + start_time.minute))
+
+
+def _utilization(booked, available):
+    return round(booked / available, 3) if available else None
+
+
+def compute_density(days):
+    """
+    Агрегаты по дням (без кэша).
+
+    Returns:
+        dict {date: данные дня}, данные дня - словарь, готовый для JSON:
+        date, bookings, booked_minutes, available_minutes, utilization,
+        specialists и cabinets ({id: bookings, booked_minutes, available_minutes,
+        utilization}), closures (список закрытий, пересекающих день).
+    """
+    from .models import Booking, Cabinet, CabinetClosure, SystemSettings
+    from .schedule_utils import get_working_intervals
+
+    if not days:
+        return {}
+    window_start, _ = local_day_bounds(min(days))
+    _, window_end = local_day_bounds(max(days))
+    wanted = set(days)
+
+    # Один GROUP BY: диапазон по start_time без функций над колонкой в WHERE
+    rows = (
+        Booking.objects
+        .filter(start_time__gte=window_start, start_time__lt=window_end)
+        .exclude(status__in=EXCLUDED_STATUSES)
+        .annotate(day=TruncDate('start_time', tzinfo=timezone.get_current_timezone()))
+        .values('day', 'specialist_id', 'cabinet_id')
+        .annotate(bookings=Count('id'), booked_minutes=Sum('service_variant__duration_minutes'))
+        .order_by()
+    )
+
+    working_intervals = get_working_intervals(days)
+
+    system_settings = SystemSettings.get_solo()
+    open_time = system_settings.spa_open_time
+    close_time = system_settings.spa_close_time
+    if isinstance(open_time, str):
+        open_time = datetime.time.fromisoformat(open_time)
+    if isinstance(close_time, str):
+        close_time = datetime.time.fromisoformat(close_time)
+    cabinet_ids = list(Cabinet.objects.filter(is_active=True).order_by('id').values_list('id', flat=True))
+
+    result = {}
+    for day in days:
+        specialists = {
+            specialist_id: {
+                'bookings': 0,
+                'booked_minutes': 0,
+                'available_minutes': sum(_minutes_between(start, end) for start, end in intervals),
+            }
+            for specialist_id, intervals in working_intervals[day].items()
+        }
+        open_minutes = _time_minutes(open_time, close_time)
+        cabinets = {
+            cabinet_id: {'bookings': 0, 'booked_minutes': 0, 'available_minutes': open_minutes}
+            for cabinet_id in cabinet_ids
+        }
+        result[day] = {'date': day.isoformat(), 'specialists': specialists, 'cabinets': cabinets, 'closures': []}
+
+    for row in rows:
+        day = row['day']
+        if day not in wanted:
+            continue
+        entry = result[day]
+        booked = row['booked_minutes'] or 0
+        for key, resource_id in (('specialists', row['specialist_id']), ('cabinets', row['cabinet_id'])):
+            resource = entry[key].setdefault(resource_id, {'bookings': 0, 'booked_minutes': 0, 'available_minutes': 0})
+            resource['bookings'] += row['bookings']
+            resource['booked_minutes'] += booked
+
+    closures = CabinetClosure.objects.filter(
+        start_time__lt=window_end, end_time__gt=window_start
+    ).only('id', 'cabinet_id', 'start_time', 'end_time', 'reason')
+    for closure in closures:
+        for day in days:
+            day_start, day_end = local_day_bounds(day)
+            overlap_start, overlap_end = max(closure.start_time, day_start), min(closure.end_time, day_end)
+            if overlap_start >= overlap_end:
+                continue
+            entry = result[day]
+            entry['closures'].append({
+                'id': closure.id,
+                'cabinet_id': closure.cabinet_id,
+                'minutes': _minutes_between(overlap_start, overlap_end),
+                'reason': closure.reason,
+            })
+            # Закрытие уменьшает доступное время кабинета в часы работы SPA
+            open_start = timezone.make_aware(datetime.datetime.combine(day, open_time))
+            open_end = timezone.make_aware(datetime.datetime.combine(day, close_time))
+            closed = _minutes_between(max(overlap_start, open_start), min(overlap_end, open_end))
+            cabinet = entry['cabinets'].get(closure.cabinet_id)
+            if cabinet:
+                cabinet['available_minutes'] = max(0, cabinet['available_minutes'] - closed)
+
+    for entry in result.values():
+        for resources in (entry['specialists'], entry['cabinets']):
+            for resource in resources.values():
+                resource['utilization'] = _utilization(resource['booked_minutes'], resource['available_minutes'])
+        specialists = entry['specialists'].values()
+        entry['bookings'] = sum(resource['bookings'] for resource in specialists)
+        entry['booked_minutes'] = sum(resource['booked_minutes'] for resource in specialists)
+        entry['available_minutes'] = sum(resource['available_minutes'] for resource in specialists)
+        entry['utilization'] = _utilization(entry['booked_minutes'], entry['available_minutes'])
+        # Ключи JSON - строки; сортируем для стабильного ответа
+        entry['specialists'] = {str(key): entry['specialists'][key] for key in sorted(entry['specialists'])}
+        entry['cabinets'] = {str(key): entry['cabinets'][key] for key in sorted(entry['cabinets'])}
+    return result
+
+
+def get_density(days):
+    """
+    Агрегаты по дням с кэшем: из базы считаются только отсутствующие в кэше дни
+    (одним запросом по охватывающему их диапазону).
+
+    Returns:
+        list: данные дней в порядке days
+    """
+    generation = _generation()
+    keys = {day: _day_key(day, generation) for day in days}
+    cached = cache.get_many(list(keys.values()))
+    missing = [day for day in days if keys[day] not in cached]
+    record_cache_access('calendar_density', not missing)
+
+    if missing:
+        computed = compute_density(missing)
+        cache.set_many({keys[day]: computed[day] for day in missing}, get_cache_seconds())
+        cached.update({keys[day]: computed[day] for day in missing})
+    return [cached[keys[day]] for day in days]
+
+
+def invalidate_density_days(days):
+    """Сбрасывает кэш плотности для дней days (date или datetime)."""
+    dates = set()
+    for value in days:
+        if value is None:
+            continue
+        if isinstance(value, datetime.datetime):
+            value = timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+        dates.add(value)
+    if not dates:
+        return
+    # После коммита: иначе параллельный запрос успеет закэшировать еще старые данные
+    transaction.on_commit(lambda: _delete_days(dates))
+
+
+def _delete_days(dates):
+    generation = _generation()
+    cache.delete_many([_day_key(day, generation) for day in dates])
+
+
+def invalidate_density_range(start, end):
+    """Сбрасывает кэш плотности для всех дней периода [start, end) (закрытия кабинетов)."""
+    days = days_in_window(start, end)
+    if len(days) > MAX_DAYS:
+        invalidate_all_density()
+    else:
+        invalidate_density_days(days)
+
+
+def invalidate_all_density():
+    """Сбрасывает кэш плотности целиком (графики, часы работы, буфер)."""
+    transaction.on_commit(_next_generation)
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
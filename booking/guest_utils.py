@@ -5,7 +5,9 @@ import re
 from typing import List, Tuple, Dict
 from django.db.models import Q, Count
 from django.db import transaction
+from django.utils import timezone
 from .models import Guest, Booking
+from .side_effect_utils import apply_booking_side_effects
 
 
 def normalize_guest_name(name: str) -> str:
@@ -241,21 +243,37 @@ def merge_guests(primary_guest: Guest, duplicate_guests: List[Guest], primary_di
         primary_guest.display_name = primary_display_name.strip()
         primary_guest.save(update_fields=['display_name'])
     
+    # update() не вызывает сигналы: бронирования для индекса, календарей и лент запоминаем заранее
+    all_duplicate_names = [g.display_name for g in duplicate_guests]
+    affected_ids = list(
+        Booking.objects.filter(
+            Q(guest__in=duplicate_guests) | Q(guest__isnull=True, guest_name__in=all_duplicate_names)
+        ).values_list('id', flat=True)
+    )
+
     # Обновляем все бронирования: и guest, и guest_name
     bookings_updated = Booking.objects.filter(
         guest__in=duplicate_guests
     ).update(
         guest=primary_guest,
-        guest_name=primary_guest.display_name  # Обновляем и старое поле для совместимости
+        guest_name=primary_guest.display_name,  # Обновляем и старое поле для совместимости
+        updated_at=timezone.now(),  # update() не трогает auto_now, а имя видно в API расписания
     )
     
     # Также обновляем бронирования, которые еще используют старое поле guest_name
     # (для старых данных, где guest может быть null)
-    all_duplicate_names = [g.display_name for g in duplicate_guests]
     Booking.objects.filter(
         guest__isnull=True,
         guest_name__in=all_duplicate_names
-    ).update(guest_name=primary_guest.display_name)
+    ).update(guest_name=primary_guest.display_name, updated_at=timezone.now())
+
+    # Объединение дублей - чистка справочника, писем специалистам о нем не отправляем
+    apply_booking_side_effects(
+        Booking.objects.filter(id__in=affected_ids).select_related(
+            'guest', 'specialist', 'cabinet', 'service_variant__service'
+        ),
+        notify=False,
+    )
     
     # Удаляем дублирующихся гостей
     guest_ids = [g.id for g in duplicate_guests]
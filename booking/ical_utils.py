@@ -0,0 +1,214 @@
+"""
+Подписка специалиста на свой график в формате iCalendar (.ics).
+
+Календарные приложения опрашивают ссылку каждые несколько минут, поэтому
+лента хранится в кэше уже отрендеренной вместе с ETag и Last-Modified:
+повторный запрос — это один запрос токена к базе, обращение к кэшу и,
+как правило, ответ 304. Токен не кэшируется: новая ссылка и отключение
+пользователя действуют сразу во всех процессах. Кэш специалиста сбрасывается сигналами, только когда
+меняется одно из его бронирований (или бронирование переходит к другому
+специалисту), а окно ленты сдвигается раз в сутки. Переименование кабинета
+или услуги меняет события во многих лентах сразу, поэтому сбрасывает все
+ленты через поколение кэша.
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .metrics import record_cache_access
+
+CACHE_PREFIX = 'ical'
+GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+PRODID = '-//Satva Wellness//Booking//RU'
+STATUS_MAP = {
+    'unconfirmed': 'TENTATIVE',
+    'canceled': 'CANCELLED',
+}
+
+
+def get_ical_setting(name, default):
+    return getattr(settings, f'ICAL_{name}', default)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(GENERATION_KEY, generation, None)
+    return generation
+
+
+def _feed_key(specialist_id, generation):
+    return f'{CACHE_PREFIX}:feed:{generation}:{specialist_id}'
+
+
+def escape_text(value):
+    """Экранирование TEXT по RFC 5545."""
+    return (
+        str(value or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def fold_line(line):
+    """Переносит строку длиннее 75 октетов (продолжение начинается с пробела)."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line
+    parts = []
+    limit = 75
+    while encoded:
+        chunk = encoded[:limit]
+        # Не режем многобайтовый символ UTF-8 посередине
+        while chunk and (encoded[len(chunk):len(chunk) + 1] or b'\x00')[0] & 0xC0 == 0x80:
+            chunk = chunk[:-1]
+        parts.append(chunk.decode('utf-8'))
+        encoded = encoded[len(chunk):]
+        limit = 74
+    return '\r\n '.join(parts)
+
+
+def format_utc(value):
+    return value.astimezone(datetime.timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def build_vevent(booking, stamp):
+    """VEVENT бронирования (нужны service_variant__service и cabinet)."""
+    # Клиенту показываем время процедуры без буфера, как в календаре
+    end_time = booking.start_time + datetime.timedelta(minutes=booking.service_variant.duration_minutes)
+    description = [f'Гость: {booking.guest_name}']
+    if booking.guest_room_number:
+        description.append(f'Комната: {booking.guest_room_number}')
+    if booking.comment:
+        description.append(booking.comment)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:booking-{booking.id}@{get_ical_setting("UID_DOMAIN", "satva-booking")}',
+        f'DTSTAMP:{format_utc(stamp)}',
+        f'DTSTART:{format_utc(booking.start_time)}',
+        f'DTEND:{format_utc(end_time)}',
+        f'SUMMARY:{escape_text(f"{booking.service_variant} — {booking.guest_name}")}',
+        f'LOCATION:{escape_text(booking.cabinet.name)}',
+        f'DESCRIPTION:{escape_text(chr(10).join(description))}',
+        f'STATUS:{STATUS_MAP.get(booking.status, "CONFIRMED")}',
+        'END:VEVENT',
+    ]
+    return lines
+
+
+def render_specialist_calendar(specialist, now=None):
+    """
+    Текст .ics с бронированиями специалиста в скользящем окне
+    (ICAL_PAST_DAYS назад и ICAL_FUTURE_DAYS вперед от сегодняшнего дня).
+    """
+    from .models import Booking
+
+    now = now or timezone.now()
+    today = timezone.localtime(now).date()
+    window_start = timezone.make_aware(datetime.datetime.combine(
+        today - datetime.timedelta(days=get_ical_setting('PAST_DAYS', 30)), datetime.time.min
+    ))
+    window_end = timezone.make_aware(datetime.datetime.combine(
+        today + datetime.timedelta(days=get_ical_setting('FUTURE_DAYS', 180)), datetime.time.min
+    ))
+    bookings = (
+        Booking.objects
+        .filter(specialist_id=specialist.id, start_time__gte=window_start, start_time__lt=window_end)
+        .select_related('service_variant__service', 'cabinet')
+        .order_by('start_time', 'id')
+    )
+
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape_text(f"График — {specialist.full_name}")}',
+        f'X-WR-TIMEZONE:{settings.TIME_ZONE}',
+        # Подсказка клиентам, как часто опрашивать ленту
+        'REFRESH-INTERVAL;VALUE=DURATION:PT15M',
+        'X-PUBLISHED-TTL:PT15M',
+    ]
+    for booking in bookings:
+        lines.extend(build_vevent(booking, now))
+    lines.append('END:VCALENDAR')
+    return '\r\n'.join(fold_line(line) for line in lines) + '\r\n'
+
+
+def get_specialist_id_for_token(token):
+    """ID специалиста с активным пользователем по токену подписки или None."""
+    from .models import SpecialistProfile
+
+    return SpecialistProfile.objects.filter(
+        calendar_token=token, user__is_active=True
+    ).values_list('id', flat=True).first()
+
+
+def get_specialist_feed(specialist_id):
+    """
+    Готовая лента из кэша или перестроенная (при изменениях и раз в сутки).
+
+    Returns:
+        dict: body, etag, last_modified (datetime UTC) или None, если специалиста нет
+    """
+    from .models import SpecialistProfile
+
+    today = timezone.localdate().isoformat()
+    feed_key = _feed_key(specialist_id, _generation())
+    feed = cache.get(feed_key)
+    hit = feed is not None and feed['window_day'] == today
+    record_cache_access('ical_feed', hit)
+    if hit:
+        return feed
+
+    specialist = SpecialistProfile.objects.filter(id=specialist_id, user__is_active=True).first()
+    if specialist is None:
+        return None
+    now = timezone.now()
+    body = render_specialist_calendar(specialist, now)
+    # DTSTAMP меняется при каждой сборке, поэтому ETag считаем без него
+    content = '\r\n'.join(line for line in body.split('\r\n') if not line.startswith('DTSTAMP:'))
+    etag = hashlib.md5(content.encode('utf-8')).hexdigest()
+    if feed is not None and feed['etag'] == etag:
+        # Окно сдвинулось, а события те же: клиенты продолжают получать 304
+        body, last_modified = feed['body'], feed['last_modified']
+    else:
+        last_modified = now.replace(microsecond=0)
+    feed = {'body': body, 'etag': etag, 'last_modified': last_modified, 'window_day': today}
+    cache.set(feed_key, feed, get_ical_setting('CACHE_SECONDS', 86400))
+    return feed
+
+
+def invalidate_specialist_feeds(specialist_ids):
+    """Сбрасывает ленты специалистов после коммита текущей транзакции."""
+    specialist_ids = {specialist_id for specialist_id in specialist_ids if specialist_id}
+    if not specialist_ids:
+        return
+    transaction.on_commit(lambda: _delete_feeds(specialist_ids))
+
+
+def _delete_feeds(specialist_ids):
+    generation = _generation()
+    cache.delete_many([_feed_key(specialist_id, generation) for specialist_id in specialist_ids])
+
+
+def invalidate_all_feeds():
+    """Сбрасывает ленты всех специалистов (кабинеты, услуги) после коммита транзакции."""
+    transaction.on_commit(_next_generation)
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
@@ -0,0 +1,305 @@
+"""
+Шина изменений календаря для живого обновления (SSE, см. async_views.calendar_stream_view).
+
+Сигналы и массовые операции сообщают id измененных бронирований, технических
+записей и закрытий кабинетов. После коммита транзакции по ним строятся патчи —
+готовые события FullCalendar (upsert) или удаления (remove) — и публикуются:
+
+- postgres: NOTIFY в канал LIVE_UPDATES_CHANNEL; каждый процесс слушает канал
+  отдельным соединением (LISTEN) и раздает патчи своим подписчикам, поэтому
+  изменение в одном воркере или в команде manage.py видят все открытые календари;
+- inprocess: только подписчики текущего процесса (SQLite, runserver, один воркер).
+
+Если изменений в транзакции больше LIVE_UPDATES_MAX_PATCHES (серии, массовое
+восстановление), вместо патчей отправляется команда refetch.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.db import connections, transaction
+
+logger = logging.getLogger(__name__)
+
+KIND_BOOKING = 'booking'
+KIND_NOTE = 'technical_note'
+KIND_CLOSURE = 'closure'
+
+# Лимит полезной нагрузки NOTIFY в Postgres - 8000 байт
+NOTIFY_PAYLOAD_LIMIT = 7500
+
+_pending = threading.local()
+
+
+def live_updates_enabled():
+    return getattr(settings, 'LIVE_UPDATES_ENABLED', False)
+
+
+def get_live_setting(name, default):
+    return getattr(settings, f'LIVE_UPDATES_{name}', default)
+
+
+# --- сбор изменений ---
+
+def notify_changed(kind, ids):
+    """
+    Отмечает объекты kind как измененные (созданные, обновленные или удаленные).
+
+    Патчи строятся и публикуются один раз после коммита текущей транзакции.
+    """
+    if not live_updates_enabled():
+        return
+    ids = [object_id for object_id in ids if object_id is not None]
+    if not ids:
+        return
+    pending = getattr(_pending, 'changes', None)
+    if pending is not None and _flush_scheduled():
+        pending.setdefault(kind, set()).update(ids)
+        return
+    # Первое изменение в транзакции (или прежняя транзакция откатилась вместе с обработчиком)
+    _pending.changes = {kind: set(ids)}
+    transaction.on_commit(_flush_pending)
+
+
+def _flush_scheduled():
+    """Обработчик _flush_pending еще ждет коммита (при откате Django его отбрасывает)."""
+    connection = connections['default']
+    return connection.in_atomic_block and any(
+        callback is _flush_pending for _, callback, _ in connection.run_on_commit
+    )
+
+
+def notify_bookings_changed(ids):
+    notify_changed(KIND_BOOKING, ids)
+
+
+def notify_notes_changed(ids):
+    notify_changed(KIND_NOTE, ids)
+
+
+def notify_closures_changed(ids):
+    notify_changed(KIND_CLOSURE, ids)
+
+
+def _flush_pending():
+    changes = getattr(_pending, 'changes', None)
+    _pending.changes = None
+    if not changes:
+        return
+    try:
+        publish_patches(build_patches(changes))
+    except Exception as e:
+        # Живое обновление не должно ломать сохранение бронирования
+        logger.error(f"Error publishing calendar changes: {e}", exc_info=True)
+
+
+def build_patches(changes):
+    """
+    Патчи для FullCalendar по id измененных объектов.
+
+    Объекты, которых уже нет в базе, превращаются в remove.
+    """
+    from .models import Booking, Cabinet, CabinetClosure, CalendarNote
+    from .views import build_booking_event, build_closure_event, build_note_event, generate_cabinet_colors
+
+    total = sum(len(ids) for ids in changes.values())
+    if total > get_live_setting('MAX_PATCHES', 100):
+        return [{'op': 'refetch'}]
+
+    patches = []
+    booking_ids = changes.get(KIND_BOOKING)
+    if booking_ids:
+        cabinet_colors = generate_cabinet_colors(Cabinet.objects.filter(is_active=True).order_by('id'))
+        bookings = Booking.objects.filter(id__in=booking_ids).select_related('service_variant', 'specialist', 'cabinet')
+        found = set()
+        for booking in bookings:
+            found.add(booking.id)
+            patches.append({'op': 'upsert', 'kind': KIND_BOOKING, 'id': booking.id,
+                            'event': build_booking_event(booking, cabinet_colors)})
+        patches.extend({'op': 'remove', 'kind': KIND_BOOKING, 'id': booking_id} for booking_id in booking_ids - found)
+
+    note_ids = changes.get(KIND_NOTE)
+    if note_ids:
+        found = set()
+        for note in CalendarNote.objects.filter(id__in=note_ids):
+            found.add(note.id)
+            patches.append({'op': 'upsert', 'kind': KIND_NOTE, 'id': note.id, 'event': build_note_event(note)})
+        patches.extend({'op': 'remove', 'kind': KIND_NOTE, 'id': note_id} for note_id in note_ids - found)
+
+    closure_ids = changes.get(KIND_CLOSURE)
+    if closure_ids:
+        found = set()
+        for closure in CabinetClosure.objects.filter(id__in=closure_ids).select_related('cabinet'):
+            found.add(closure.id)
+            # Ленту закрытий видят только сотрудники, и все они могут удалять закрытия
+            patches.append({'op': 'upsert', 'kind': KIND_CLOSURE, 'id': closure.id,
+                            'event': build_closure_event(closure, can_delete=True)})
+        patches.extend({'op': 'remove', 'kind': KIND_CLOSURE, 'id': closure_id} for closure_id in closure_ids - found)
+
+    return patches
+
+
+def _chunk_messages(patches):
+    """Делит патчи на сообщения, помещающиеся в NOTIFY."""
+    chunk, size = [], 0
+    for patch in patches:
+        encoded = json.dumps(patch, ensure_ascii=False, separators=(',', ':'))
+        if len(encoded.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            # Одно событие не помещается (очень длинный комментарий) - клиенты перечитают ленту
+            yield [{'op': 'refetch'}]
+            continue
+        if chunk and size + len(encoded.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(patch)
+        size += len(encoded.encode()) + 1
+    if chunk:
+        yield chunk
+
+
+def publish_patches(patches):
+    if patches:
+        get_bus().publish(patches)
+
+
+# --- шина ---
+
+def _deliver(queue, message):
+    """Кладет сообщение в очередь подписчика; переполненную очередь заменяет командой refetch."""
+    try:
+        queue.put_nowait(message)
+    except asyncio.QueueFull:
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait({'id': message['id'], 'patches': [{'op': 'refetch'}]})
+
+
+class InProcessBus:
+    """
+    Раздача патчей подписчикам текущего процесса.
+
+    Подписчик - asyncio.Queue в цикле событий SSE-потока; публиковать можно
+    из любого потока. Последние сообщения хранятся для повторной отправки
+    после переподключения (Last-Event-ID).
+    """
+
+    def __init__(self, history_size=200):
+        self.token = uuid.uuid4().hex[:8]
+        self.sequence = itertools.count(1)
+        self.history = deque(maxlen=history_size)
+        self.subscribers = set()
+        self.lock = threading.Lock()
+
+    def publish(self, patches):
+        for chunk in _chunk_messages(patches):
+            self.dispatch(chunk)
+
+    def dispatch(self, patches):
+        with self.lock:
+            message = {'id': f'{self.token}:{next(self.sequence)}', 'patches': patches}
+            self.history.append(message)
+            subscribers = list(self.subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(_deliver, queue, message)
+            except RuntimeError:
+                # Цикл событий уже закрыт - подписчик отвалился
+                self.unsubscribe((loop, queue))
+
+    def subscribe(self):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(maxsize=get_live_setting('QUEUE_SIZE', 500)))
+        with self.lock:
+            self.subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def missed_since(self, last_event_id):
+        """
+        Сообщения после last_event_id или None, если их уже не восстановить
+        (другой процесс, история переполнена) - тогда клиент перечитывает ленту.
+        """
+        token, _, number = (last_event_id or '').partition(':')
+        if token != self.token or not number.isdigit():
+            return None
+        with self.lock:
+            history = list(self.history)
+        number = int(number)
+        if history and int(history[0]['id'].split(':')[1]) > number + 1:
+            return None
+        return [message for message in history if int(message['id'].split(':')[1]) > number]
+
+
+class PostgresBus(InProcessBus):
+    """
+    Шина через LISTEN/NOTIFY: публикация - pg_notify в текущем соединении Django,
+    прием - фоновый поток с отдельным соединением (запускается при первой подписке).
+    """
+
+    def __init__(self, channel, history_size=200):
+        super().__init__(history_size)
+        self.channel = channel
+        self.listener = None
+
+    def publish(self, patches):
+        with connections['default'].cursor() as cursor:
+            for chunk in _chunk_messages(patches):
+                cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, json.dumps(chunk, ensure_ascii=False)])
+
+    def subscribe(self):
+        with self.lock:
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self.listen, name='calendar-listen', daemon=True)
+                self.listener.start()
+        return super().subscribe()
+
+    def listen(self):
+        """Слушает канал и переподключается при обрыве (с нарастающей паузой)."""
+        import psycopg
+
+        backoff = 1
+        reconnect = False
+        while True:
+            try:
+                params = connections['default'].get_connection_params()
+                with psycopg.connect(**params, autocommit=True) as connection:
+                    connection.execute(f'LISTEN "{self.channel}"')
+                    backoff = 1
+                    if reconnect:
+                        # Пропущенные за время обрыва изменения не восстановить
+                        self.dispatch([{'op': 'refetch'}])
+                    reconnect = True
+                    for notify in connection.notifies():
+                        self.dispatch(json.loads(notify.payload))
+            except Exception as e:
+                logger.warning(f"Calendar change listener disconnected: {e}")
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+
+
+_bus = None
+_bus_lock = threading.Lock()
+
+
+def get_bus():
+    """Шина процесса: postgres для Postgres (LIVE_UPDATES_BUS=auto), иначе inprocess."""
+    global _bus
+    if _bus is None:
+        with _bus_lock:
+            if _bus is None:
+                backend = get_live_setting('BUS', 'auto')
+                if backend == 'auto':
+                    backend = 'postgres' if connections['default'].vendor == 'postgresql' else 'inprocess'
+                if backend == 'postgres':
+                    _bus = PostgresBus(get_live_setting('CHANNEL', 'booking_calendar_changes'))
+                else:
+                    _bus = InProcessBus()
+    return _bus
@@ -1,12 +1,77 @@
 """
 Утилиты для логирования действий с бронированиями
 """
+from contextlib import contextmanager
+from django.db import connection, transaction
 from django.utils import timezone
 from .models import BookingLog, Booking
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Стек активных буферов логов текущего потока (см. buffered_booking_logs)
+_log_buffers = threading.local()
+
+
+def _get_buffer_stack():
+    if not hasattr(_log_buffers, 'stack'):
+        _log_buffers.stack = []
+    return _log_buffers.stack
+
+
+@contextmanager
+def buffered_booking_logs():
+    """
+    Собирает записи BookingLog, созданные внутри блока, и сохраняет их одним bulk_create.
+
+    Если блок выполняется внутри транзакции, запись откладывается до коммита
+    (transaction.on_commit): при откате логи не сохраняются, как и раньше.
+    Вложенные блоки передают свои записи внешнему буферу.
+
+    Usage:
+        with transaction.atomic(), buffered_booking_logs():
+            for booking in bookings:
+                log_booking_action(booking, 'deleted', user, '...', request=request)
+    """
+    stack = _get_buffer_stack()
+    buffer = []
+    stack.append(buffer)
+    try:
+        yield buffer
+    finally:
+        stack.pop()
+        if stack:
+            stack[-1].extend(buffer)
+        else:
+            flush_booking_logs(buffer)
+
+
+def flush_booking_logs(entries):
+    """Сохраняет накопленные записи логов (после коммита, если идет транзакция)."""
+    if not entries:
+        return
+    entries = list(entries)
+    if connection.in_atomic_block:
+        transaction.on_commit(lambda: _write_booking_logs(entries))
+    else:
+        _write_booking_logs(entries)
+
+
+def _write_booking_logs(entries):
+    try:
+        # Логи удаленных в этой же транзакции бронирований все равно были бы
+        # удалены каскадом, поэтому пропускаем их, чтобы не нарушить внешний ключ
+        booking_ids = {entry.booking_id for entry in entries}
+        existing_ids = set(
+            Booking.objects.filter(id__in=booking_ids).values_list('id', flat=True)
+        )
+        entries = [entry for entry in entries if entry.booking_id in existing_ids]
+        BookingLog.objects.bulk_create(entries, batch_size=500)
+        logger.info(f"Booking logs flushed: {len(entries)} records")
+    except Exception as e:
+        logger.error(f"Error flushing booking logs: {e}", exc_info=True)
+
 
 def get_client_ip(request):
     """Получает IP адрес клиента из запроса"""
@@ -20,7 +85,10 @@ def get_client_ip(request):
 
 def log_booking_action(booking, action, user, message, old_values=None, new_values=None, request=None):
     """
-    Логирует действие с бронированием
+    Логирует действие с бронированием.
+
+    Внутри buffered_booking_logs() запись не сохраняется сразу, а попадает
+    в буфер и пишется вместе с остальными одним запросом.
     
     Args:
         booking: Booking - бронирование
@@ -36,7 +104,7 @@ def log_booking_action(booking, action, user, message, old_values=None, new_valu
         if request:
             ip_address = get_client_ip(request)
         
-        BookingLog.objects.create(
+        log_entry = BookingLog(
             booking=booking,
             action=action,
             user=user,
@@ -45,6 +113,14 @@ def log_booking_action(booking, action, user, message, old_values=None, new_valu
             new_values=new_values,
             ip_address=ip_address
         )
+
+        stack = _get_buffer_stack()
+        if stack:
+            stack[-1].append(log_entry)
+            logger.debug(f"Booking log buffered: booking_id={booking.id}, action={action}")
+            return
+
+        log_entry.save()
         
         logger.info(f"Booking log created: booking_id={booking.id}, action={action}, user={user.username if user else 'None'}")
         
@@ -0,0 +1,88 @@
+"""
+Команда для применения шаблона расписания сразу ко многим специалистам
+(например, график нового сезона). Все строки графика записываются одной
+вставкой с обновлением в одной транзакции; в конце выводятся будущие
+бронирования, которые не укладываются в новые часы работы.
+
+Использование:
+    python manage.py apply_schedule_template --template "Летний график" --all
+    python manage.py apply_schedule_template --template 3 --specialists 1 2 5
+    python manage.py apply_schedule_template --template 3 --all --dry-run
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from booking.models import ScheduleTemplate, SpecialistProfile
+from booking.schedule_utils import apply_schedule_template
+
+
+class Command(BaseCommand):
+    help = 'Применяет шаблон расписания к нескольким специалистам и показывает бронирования вне новых часов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--template',
+            required=True,
+            help='ID или название шаблона расписания'
+        )
+        parser.add_argument(
+            '--specialists',
+            nargs='+',
+            type=int,
+            help='ID специалистов'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Применить ко всем специалистам'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать результат, не сохраняя изменения'
+        )
+
+    def handle(self, *args, **options):
+        template = self._get_template(options['template'])
+
+        if options['all'] == bool(options['specialists']):
+            raise CommandError('Укажите либо --specialists, либо --all')
+        specialists = SpecialistProfile.objects.all()
+        if options['specialists']:
+            specialists = specialists.filter(id__in=options['specialists'])
+            missing = set(options['specialists']) - set(specialists.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f'Специалисты не найдены: {", ".join(map(str, sorted(missing)))}')
+        specialist_ids = list(specialists.values_list('id', flat=True))
+        if not specialist_ids:
+            raise CommandError('Нет специалистов')
+
+        report = apply_schedule_template(template, specialist_ids, dry_run=options['dry_run'])
+
+        prefix = '[DRY RUN] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Шаблон "{template.name}" применен к {report["specialists"]} специалистам: '
+            f'{report["days"]} дней, {report["schedules"]} строк графика'
+        ))
+
+        outside_hours = report['outside_hours']
+        if not outside_hours:
+            self.stdout.write('Все будущие бронирования укладываются в новые часы работы')
+            return
+
+        self.stdout.write(self.style.WARNING(f'Вне новых часов работы: {len(outside_hours)} бронирований'))
+        for booking in outside_hours:
+            start = timezone.localtime(booking['start_time']).strftime('%d.%m.%Y %H:%M')
+            end = timezone.localtime(booking['end_time']).strftime('%H:%M')
+            self.stdout.write(
+                f'  #{booking["id"]:<8} {start}-{end}  {booking["specialist_name"]}  {booking["guest_name"]}'
+            )
+
+    def _get_template(self, value):
+        templates = ScheduleTemplate.objects.filter(id=int(value)) if value.isdigit() else ScheduleTemplate.objects.filter(name=value)
+        templates = list(templates[:2])
+        if not templates:
+            raise CommandError(f'Шаблон не найден: {value}')
+        if len(templates) > 1:
+            raise CommandError(f'Несколько шаблонов с названием "{value}", укажите ID')
+        return templates[0]
@@ -0,0 +1,155 @@
+"""
+Команда для переноса старых записей архива удаленных бронирований и логов
+в сжатые JSONL-файлы на диске (по одному файлу на месяц). Заодно удаляет
+устаревшие записи об удалениях из расписания (синхронизация API).
+
+Использование:
+    python manage.py archive_old_records
+    python manage.py archive_old_records --months 6 --output-dir /backups/archive
+    python manage.py archive_old_records --only logs --dry-run
+    python manage.py archive_old_records --vacuum
+"""
+import gzip
+import json
+import os
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.utils import timezone
+
+from booking.models import DeletedBooking, BookingLog, ScheduleRemoval
+
+
+# Что архивируем: ключ для --only -> (модель, поле даты)
+TARGETS = {
+    'deleted': (DeletedBooking, 'deleted_at'),
+    'logs': (BookingLog, 'created_at'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Переносит записи DeletedBooking и BookingLog старше N месяцев в сжатые JSONL-файлы'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=None,
+            help='Сколько месяцев хранить в базе. По умолчанию: ARCHIVE_RETENTION_MONTHS'
+        )
+        parser.add_argument(
+            '--output-dir',
+            type=str,
+            default=None,
+            help='Каталог для файлов архива. По умолчанию: ARCHIVE_DIR'
+        )
+        parser.add_argument(
+            '--only',
+            choices=sorted(TARGETS),
+            help='Архивировать только удаленные бронирования (deleted) или только логи (logs)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Сколько записей переносить за один проход. По умолчанию: 1000'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько записей будет перенесено'
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='После переноса выполнить VACUUM ANALYZE (только PostgreSQL)'
+        )
+
+    def handle(self, *args, **options):
+        months = options['months'] or getattr(settings, 'ARCHIVE_RETENTION_MONTHS', 12)
+        if months < 1:
+            raise CommandError('--months должно быть не меньше 1')
+        output_dir = options['output_dir'] or getattr(settings, 'ARCHIVE_DIR', 'archive')
+        cutoff = self._get_cutoff(months)
+
+        self.stdout.write(
+            f'Переносим записи старше {timezone.localtime(cutoff).strftime("%d.%m.%Y")} в {output_dir}'
+        )
+
+        targets = [options['only']] if options['only'] else sorted(TARGETS)
+        for key in targets:
+            model, date_field = TARGETS[key]
+            queryset = model.objects.filter(**{f'{date_field}__lt': cutoff})
+
+            if options['dry_run']:
+                self.stdout.write(f'  {model._meta.verbose_name_plural}: {queryset.count()} (dry-run)')
+                continue
+
+            moved = self._archive(queryset, model, date_field, output_dir, options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'  {model._meta.verbose_name_plural}: перенесено {moved}'
+            ))
+
+            if moved and options['vacuum'] and connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(f'VACUUM ANALYZE {model._meta.db_table}')
+
+        if not options['only']:
+            self._prune_schedule_removals(options['dry_run'])
+
+    def _prune_schedule_removals(self, dry_run):
+        """
+        Удаляет записи ScheduleRemoval старше SCHEDULE_API_SYNC_RETENTION_DAYS: клиенты
+        с более давней синхронизацией все равно загружают расписание заново.
+        """
+        days = getattr(settings, 'SCHEDULE_API_SYNC_RETENTION_DAYS', 30)
+        queryset = ScheduleRemoval.objects.filter(removed_at__lt=timezone.now() - datetime.timedelta(days=days))
+        if dry_run:
+            self.stdout.write(f'  {ScheduleRemoval._meta.verbose_name_plural}: {queryset.count()} (dry-run)')
+            return
+        removed = queryset._raw_delete(queryset.db)
+        self.stdout.write(self.style.SUCCESS(
+            f'  {ScheduleRemoval._meta.verbose_name_plural}: удалено {removed}'
+        ))
+
+    def _get_cutoff(self, months):
+        """Начало месяца, отстоящего на months назад: файлы содержат целые месяцы."""
+        today = timezone.localdate()
+        month_index = today.year * 12 + (today.month - 1) - months
+        first_day = datetime.date(month_index // 12, month_index % 12 + 1, 1)
+        return timezone.make_aware(datetime.datetime.combine(first_day, datetime.time.min))
+
+    def _archive(self, queryset, model, date_field, output_dir, batch_size):
+        """
+        Пишет записи пачками в <output_dir>/<таблица>/<ГГГГ-ММ>.jsonl.gz и удаляет их из базы.
+
+        Запись удаляется только после того, как попала на диск, поэтому при сбое
+        запись может оказаться в файле дважды, но не потеряется.
+        """
+        table_dir = os.path.join(output_dir, model._meta.db_table)
+        os.makedirs(table_dir, exist_ok=True)
+
+        moved = 0
+        while True:
+            rows = list(queryset.order_by('id').values()[:batch_size])
+            if not rows:
+                return moved
+
+            rows_by_month = {}
+            for row in rows:
+                month = timezone.localtime(row[date_field]).strftime('%Y-%m')
+                rows_by_month.setdefault(month, []).append(row)
+
+            for month, month_rows in rows_by_month.items():
+                path = os.path.join(table_dir, f'{month}.jsonl.gz')
+                # Gzip допускает дозапись: каждая пачка - отдельный член архива
+                with gzip.open(path, 'at', encoding='utf-8') as archive_file:
+                    for row in month_rows:
+                        archive_file.write(json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False))
+                        archive_file.write('\n')
+
+            model.objects.filter(id__in=[row['id'] for row in rows]).delete()
+            moved += len(rows)
@@ -0,0 +1,25 @@
+"""
+Команда для полной перестройки поискового индекса (SearchEntry).
+
+Использование:
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+
+from booking.search_utils import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс по бронированиям и техническим записям'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Размер пачки при индексации. По умолчанию: 1000'
+        )
+
+    def handle(self, *args, **options):
+        total = rebuild_search_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Проиндексировано объектов: {total}'))
@@ -0,0 +1,107 @@
+"""
+Команда для замера горячих путей на данных seed_scale и сравнения с baseline.
+
+Использование:
+    python manage.py run_benchmarks
+    python manage.py run_benchmarks --only find_available_slots calendar_feed_view --repeat 50
+    python manage.py run_benchmarks --save-baseline benchmarks/baseline.json
+    python manage.py run_benchmarks --baseline benchmarks/baseline.json --tolerance 0.2
+
+Бенчмарки с бюджетом SQL-запросов (списки админки) завершают команду ошибкой
+при превышении бюджета и без baseline.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.suite import BENCHMARKS, compare, load_report, over_budget, run_suite, save_report
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время (p50/p95) и число SQL-запросов горячих путей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--only',
+            nargs='+',
+            choices=list(BENCHMARKS),
+            help='Запустить только указанные бенчмарки'
+        )
+        parser.add_argument('--repeat', type=int, default=20, help='Прогонов на бенчмарк. По умолчанию: 20')
+        parser.add_argument('--warmup', type=int, default=2, help='Прогревочных прогонов. По умолчанию: 2')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно выбора входных данных. По умолчанию: 42')
+        parser.add_argument('--output', type=str, help='Сохранить отчет в JSON-файл')
+        parser.add_argument('--save-baseline', type=str, help='Сохранить отчет как baseline')
+        parser.add_argument('--baseline', type=str, help='Сравнить с сохраненным baseline')
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Допустимый рост p95 (доля) до признания регрессии. По умолчанию: 0.2'
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должно быть не меньше 1')
+        baseline = load_report(options['baseline']) if options['baseline'] else None
+
+        self.stdout.write(f'{"Бенчмарк":<30} {"прогонов":>8} {"p50, мс":>10} {"p95, мс":>10} {"запросов":>9}')
+
+        def print_result(name, result):
+            self.stdout.write(
+                f'{name:<30} {result["runs"]:>8} {result["p50_ms"]:>10.2f} '
+                f'{result["p95_ms"]:>10.2f} {result["queries"]:>9}'
+            )
+
+        try:
+            report = run_suite(
+                names=options['only'],
+                repeat=options['repeat'],
+                warmup=options['warmup'],
+                seed=options['seed'],
+                on_result=print_result,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        meta = report['meta']
+        self.stdout.write(
+            f'База: {meta["database"]}, бронирований: {meta["bookings"]}, период: {meta["period"][0]} — {meta["period"][1]}'
+        )
+
+        for path in (options['output'], options['save_baseline']):
+            if path:
+                save_report(report, path)
+                self.stdout.write(f'Отчет сохранен: {path}')
+
+        exceeded = over_budget(report)
+        for row in exceeded:
+            self.stdout.write(self.style.ERROR(
+                f'{row["name"]}: {row["queries_max"]} запросов при бюджете {row["max_queries"]}'
+            ))
+
+        if baseline is None:
+            if exceeded:
+                raise CommandError(f'Превышен бюджет запросов: {len(exceeded)}')
+            return
+
+        if baseline.get('meta', {}).get('bookings') != meta['bookings']:
+            self.stdout.write(self.style.WARNING(
+                f'Baseline снят на другом объеме данных ({baseline.get("meta", {}).get("bookings")} бронирований)'
+            ))
+
+        self.stdout.write('')
+        self.stdout.write(f'{"Сравнение с baseline":<30} {"p95, мс":>10} {"было":>10} {"изменение":>10} {"запросов":>12}')
+        regressions = 0
+        for row in compare(report, baseline, tolerance=options['tolerance']):
+            line = (
+                f'{row["name"]:<30} {row["p95_ms"]:>10.2f} {row["baseline_p95_ms"]:>10.2f} '
+                f'{row["change"]:>+10.0%} {row["baseline_queries"]:>5} -> {row["queries"]:<5}'
+            )
+            if row['regression']:
+                regressions += 1
+                self.stdout.write(self.style.ERROR(line))
+            else:
+                self.stdout.write(line)
+
+        if regressions or exceeded:
+            raise CommandError(f'Найдены регрессии: {regressions}, превышен бюджет запросов: {len(exceeded)}')
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
@@ -0,0 +1,62 @@
+"""
+Команда для замера экономии на подключении к БД в AJAX-запросах календаря.
+
+Сравнивает новое соединение на каждый запрос, постоянные соединения
+(CONN_MAX_AGE) и пул psycopg3 (см. DATABASE_POOL в settings_production).
+
+Использование:
+    python manage.py run_connection_benchmark
+    python manage.py run_connection_benchmark --navigations 200 --output connections.json
+    python manage.py run_connection_benchmark --modes per_request pool
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.connections import MODES, pool_supported, run_connection_benchmark
+from benchmarks.suite import save_report
+
+
+class Command(BaseCommand):
+    help = 'Замеряет задержку AJAX-запросов календаря при разных режимах подключения к БД'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=MODES, help='Режимы подключения. По умолчанию: все')
+        parser.add_argument(
+            '--navigations',
+            type=int,
+            default=50,
+            help='Навигаций по календарю (по 4 запроса). По умолчанию: 50'
+        )
+        parser.add_argument('--seed', type=int, default=42, help='Зерно выбора недель. По умолчанию: 42')
+        parser.add_argument('--output', type=str, help='Сохранить отчет в JSON-файл')
+
+    def handle(self, *args, **options):
+        if options['navigations'] < 1:
+            raise CommandError('--navigations должно быть не меньше 1')
+        if 'pool' in (options['modes'] or MODES) and not pool_supported():
+            self.stdout.write(self.style.WARNING('Пул доступен только для Postgres с psycopg 3 — режим pool пропущен'))
+
+        self.stdout.write(f'{"Режим":<14} {"запросов":>9} {"соединений":>11} {"p50, мс":>10} {"p95, мс":>10} {"среднее":>10}')
+
+        def print_result(mode, result):
+            self.stdout.write(
+                f'{mode:<14} {result["requests"]:>9} {result["connections"]:>11} {result["p50_ms"]:>10.2f} '
+                f'{result["p95_ms"]:>10.2f} {result["mean_ms"]:>10.2f}'
+            )
+
+        try:
+            report = run_connection_benchmark(
+                modes=options['modes'],
+                navigations=options['navigations'],
+                seed=options['seed'],
+                on_result=print_result,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        for mode, result in report['results'].items():
+            if mode != 'per_request' and 'saved_ms' in result:
+                self.stdout.write(f'{mode}: экономия {result["saved_ms"]:.2f} мс на запрос относительно per_request')
+
+        if options['output']:
+            save_report(report, options['output'])
+            self.stdout.write(f'Отчет сохранен: {options["output"]}')
@@ -0,0 +1,66 @@
+"""
+Команда для генерации синтетических данных в масштабе продакшена (для бенчмарков).
+
+Использование:
+    python manage.py seed_scale
+    python manage.py seed_scale --specialists 50 --cabinets 30 --days 730 --bookings-per-day 400
+    python manage.py seed_scale --days 60 --bookings-per-day 50 --seed 7
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from benchmarks.seed import ScaleSeeder, scale_data_exists
+
+
+class Command(BaseCommand):
+    help = 'Генерирует детерминированный набор данных для бенчмарков (bulk_create пачками)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--specialists', type=int, default=50, help='Количество специалистов. По умолчанию: 50')
+        parser.add_argument('--cabinets', type=int, default=30, help='Количество кабинетов. По умолчанию: 30')
+        parser.add_argument('--days', type=int, default=730, help='Длина периода в днях. По умолчанию: 730')
+        parser.add_argument(
+            '--future-days',
+            type=int,
+            default=None,
+            help='Сколько дней периода приходится на будущее. По умолчанию: min(90, days / 4)'
+        )
+        parser.add_argument(
+            '--bookings-per-day',
+            type=int,
+            default=400,
+            help='Бронирований в день; не поместившиеся в расписание создаются отмененными. По умолчанию: 400'
+        )
+        parser.add_argument('--guests', type=int, default=5000, help='Количество гостей. По умолчанию: 5000')
+        parser.add_argument('--seed', type=int, default=42, help='Зерно генератора случайных чисел. По умолчанию: 42')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки bulk_create. По умолчанию: 1000')
+
+    def handle(self, *args, **options):
+        if options['specialists'] < 1 or options['cabinets'] < 3 or options['days'] < 1:
+            raise CommandError('Нужны хотя бы 1 специалист, 3 кабинета (по одному на тип) и 1 день')
+        if scale_data_exists():
+            raise CommandError('Данные seed_scale уже есть в базе; используйте пустую базу')
+
+        seeder = ScaleSeeder(
+            specialists=options['specialists'],
+            cabinets=options['cabinets'],
+            days=options['days'],
+            bookings_per_day=options['bookings_per_day'],
+            guests=options['guests'],
+            seed=options['seed'],
+            future_days=options['future_days'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        self.stdout.write(
+            f'Генерация с {seeder.first_day.strftime("%d.%m.%Y")} на {options["days"]} дн. (seed={options["seed"]})'
+        )
+        stats = seeder.run()
+
+        self.stdout.write(self.style.SUCCESS('Готово:'))
+        self.stdout.write(f'  Бронирований: {stats["bookings"]} (из них отмененных сверх вместимости: {stats["canceled_overflow"]})')
+        self.stdout.write(f'  Серий: {stats["series"]}')
+        self.stdout.write(f'  Гостей: {stats["guests"]}')
+        self.stdout.write(f'  Логов: {stats["logs"]}')
+        self.stdout.write(f'  В архиве удаленных: {stats["deleted"]}')
+        self.stdout.write(f'  Закрытий кабинетов: {stats["closures"]}')
+        self.stdout.write(f'  Технических записей: {stats["notes"]}')
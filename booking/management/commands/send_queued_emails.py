@@ -0,0 +1,97 @@
+"""
+Команда-воркер для отправки писем из очереди EmailOutbox.
+
+Использование:
+    python manage.py send_queued_emails
+    python manage.py send_queued_emails --loop --interval 30
+    python manage.py send_queued_emails --workers 8 --batch-size 200
+    python manage.py send_queued_emails --retry-failed
+"""
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from booking.models import EmailOutbox
+from booking.notification_utils import dispatch_pending_emails, get_outbox_setting
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди email-уведомлений (с повторами и backoff)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Количество потоков отправки. По умолчанию: EMAIL_OUTBOX_WORKERS'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=None,
+            help='Сколько писем забирать за один проход. По умолчанию: EMAIL_OUTBOX_BATCH_SIZE'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Работать постоянно, проверяя очередь каждые --interval секунд'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=30,
+            help='Пауза между проходами в режиме --loop (сек). По умолчанию: 30'
+        )
+        parser.add_argument(
+            '--retry-failed',
+            action='store_true',
+            help='Вернуть в очередь письма, исчерпавшие попытки отправки'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or get_outbox_setting('WORKERS', 4)
+        batch_size = options['batch_size'] or get_outbox_setting('BATCH_SIZE', 100)
+
+        if options['retry_failed']:
+            requeued = EmailOutbox.objects.filter(status=EmailOutbox.STATUS_FAILED).update(
+                status=EmailOutbox.STATUS_PENDING,
+                attempts=0,
+                next_attempt_at=timezone.now(),
+            )
+            self.stdout.write(self.style.WARNING(f'Возвращено в очередь писем: {requeued}'))
+
+        if not options['loop']:
+            totals = self._drain(batch_size, workers)
+            self._report(totals)
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Воркер очереди писем запущен (потоков: {workers}, интервал: {options["interval"]} сек)'
+        ))
+        try:
+            while True:
+                close_old_connections()
+                totals = self._drain(batch_size, workers)
+                if totals['claimed']:
+                    self._report(totals)
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write('Воркер остановлен')
+
+    def _drain(self, batch_size, workers):
+        """Отправляет все готовые письма пачками по batch_size."""
+        totals = {'claimed': 0, 'sent': 0, 'failed': 0}
+        while True:
+            result = dispatch_pending_emails(limit=batch_size, workers=workers)
+            for key in totals:
+                totals[key] += result[key]
+            if result['claimed'] < batch_size:
+                return totals
+
+    def _report(self, totals):
+        style = self.style.SUCCESS if not totals['failed'] else self.style.WARNING
+        self.stdout.write(style(
+            f'Обработано писем: {totals["claimed"]}, отправлено: {totals["sent"]}, ошибок: {totals["failed"]}'
+        ))
@@ -0,0 +1,61 @@
+"""
+Команда для локальной проверки реплики: копирует базу SQLite default в replica.
+
+Реплика задается переменной DATABASE_REPLICA_SQLITE (см. settings.py).
+В режиме --loop копия обновляется раз в --interval секунд, что имитирует
+отставание реплики: без read-your-writes перенесенное бронирование
+пропадало бы из ленты календаря до следующей синхронизации.
+
+Использование:
+    DATABASE_REPLICA_SQLITE=replica.sqlite3 python manage.py sync_sqlite_replica
+    DATABASE_REPLICA_SQLITE=replica.sqlite3 python manage.py sync_sqlite_replica --loop --interval 10
+"""
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from booking.db_routers import REPLICA_ALIAS
+
+
+class Command(BaseCommand):
+    help = 'Копирует базу SQLite default в реплику SQLite (локальная проверка маршрутизации чтений)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Копировать постоянно, каждые --interval секунд'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=10,
+            help='Пауза между копированиями в режиме --loop (сек). По умолчанию: 10'
+        )
+
+    def handle(self, *args, **options):
+        if REPLICA_ALIAS not in connections.settings:
+            raise CommandError('Реплика не настроена: задайте DATABASE_REPLICA_SQLITE')
+        primary = connections['default'].settings_dict
+        replica = connections[REPLICA_ALIAS].settings_dict
+        if primary['ENGINE'] != 'django.db.backends.sqlite3' or replica['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('Команда работает только с SQLite; реплику Postgres обновляет репликация')
+
+        while True:
+            # Открытое соединение реплики в этом процессе помешало бы перезаписи файла
+            connections[REPLICA_ALIAS].close()
+            started = time.monotonic()
+            source = sqlite3.connect(str(primary['NAME']))
+            target = sqlite3.connect(str(replica['NAME']))
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+                source.close()
+            self.stdout.write(f'Реплика обновлена за {time.monotonic() - started:.2f} с: {replica["NAME"]}')
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,170 @@
+"""
+Метрики в формате Prometheus для горячих путей бронирования.
+
+Под gunicorn с несколькими воркерами значения хранятся в файлах каталога
+PROMETHEUS_MULTIPROC_DIR (multiprocess-режим prometheus_client) и собираются
+со всех воркеров при каждом запросе к /metrics.
+"""
+import functools
+import os
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily, REGISTRY
+
+# Границы корзин (сек): от быстрых проверок до тяжелых отчетов
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+VIEW_LATENCY = Histogram(
+    'booking_view_latency_seconds',
+    'Время обработки запроса по имени URL',
+    ['view', 'method', 'status'],
+    buckets=LATENCY_BUCKETS,
+)
+OPERATION_DURATION = Histogram(
+    'booking_operation_duration_seconds',
+    'Время выполнения операций: поиск слотов, проверка конфликтов, лента календаря, отчеты',
+    ['operation'],
+    buckets=LATENCY_BUCKETS,
+)
+BOOKING_EVENTS = Counter(
+    'booking_events_total',
+    'События с бронированиями',
+    ['action'],
+)
+CACHE_REQUESTS = Counter(
+    'booking_cache_requests_total',
+    'Обращения к кэшам приложения',
+    ['cache', 'result'],
+)
+
+
+def is_multiprocess():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+@contextmanager
+def observe_duration(operation):
+    """
+    Замеряет время блока и пишет его в booking_operation_duration_seconds.
+
+    Usage:
+        with observe_duration('find_available_slots'):
+            ...
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        OPERATION_DURATION.labels(operation=operation).observe(time.perf_counter() - started)
+
+
+def timed(operation):
+    """Декоратор-вариант observe_duration для функций и view (в том числе async)."""
+    def decorator(func):
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with observe_duration(operation):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with observe_duration(operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_booking_event(action, count=1):
+    """Увеличивает счетчик событий: created, moved, deleted, restored..."""
+    if count:
+        BOOKING_EVENTS.labels(action=action).inc(count)
+
+
+def record_cache_access(cache, hit):
+    """Учитывает попадание (hit=True) или промах в кэш с именем cache."""
+    CACHE_REQUESTS.labels(cache=cache, result='hit' if hit else 'miss').inc()
+
+
+class BookingStateCollector:
+    """
+    Показатели, вычисляемые в момент сбора: глубина очереди писем
+    и доля попаданий в кэши (по уже собранным счетчикам).
+    """
+
+    def __init__(self, source_registry):
+        self.source_registry = source_registry
+
+    def collect(self):
+        from django.db.models import Count
+        from .models import EmailOutbox
+
+        outbox = GaugeMetricFamily(
+            'booking_email_outbox_depth',
+            'Количество писем в очереди по статусам',
+            labels=['status'],
+        )
+        counts = dict(
+            EmailOutbox.objects.exclude(status__in=[EmailOutbox.STATUS_SENT, EmailOutbox.STATUS_SKIPPED])
+            .values_list('status').annotate(total=Count('id')).values_list('status', 'total')
+        )
+        for status in (EmailOutbox.STATUS_PENDING, EmailOutbox.STATUS_SENDING, EmailOutbox.STATUS_FAILED):
+            outbox.add_metric([status], counts.get(status, 0))
+        yield outbox
+
+        totals = {}
+        for family in self.source_registry.collect():
+            if family.name != 'booking_cache_requests':
+                continue
+            for sample in family.samples:
+                if sample.name.endswith('_total'):
+                    cache_name = sample.labels['cache']
+                    totals.setdefault(cache_name, {'hit': 0, 'miss': 0})
+                    totals[cache_name][sample.labels['result']] += sample.value
+
+        ratio = GaugeMetricFamily(
+            'booking_cache_hit_ratio',
+            'Доля попаданий в кэш',
+            labels=['cache'],
+        )
+        for cache_name, values in sorted(totals.items()):
+            requests = values['hit'] + values['miss']
+            ratio.add_metric([cache_name], values['hit'] / requests if requests else 0.0)
+        yield ratio
+
+
+def render_metrics():
+    """
+    Возвращает (тело, content type) в текстовом формате Prometheus.
+    """
+    if is_multiprocess():
+        source = CollectorRegistry()
+        multiprocess.MultiProcessCollector(source)
+    else:
+        source = REGISTRY
+    registry = CollectorRegistry()
+    registry.register(_RegistryProxy(source))
+    registry.register(BookingStateCollector(source))
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class _RegistryProxy:
+    """Позволяет выдать метрики одного реестра через другой."""
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def collect(self):
+        return self.registry.collect()
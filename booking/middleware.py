@@ -1,9 +1,24 @@
 """
 Middleware для централизованного логирования и обработки ошибок
 """
+import hashlib
+import json
 import logging
+import logging.handlers
+import os
+import re
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed, PermissionDenied
+from django.db import connections
 from django.http import JsonResponse
-from django.core.exceptions import PermissionDenied
+from django.utils import timezone
+
+from .db_routers import PIN_COOKIE_NAME, get_sticky_seconds, pinned_to_primary, replica_configured
 
 logger = logging.getLogger(__name__)
 
@@ -12,26 +27,43 @@ class ErrorLoggingMiddleware:
     """
     Middleware для логирования ошибок и HTTP ответов с кодами >= 400
     """
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         response = self.get_response(request)
         
         # Логируем HTTP ответы с кодами >= 400
         if response.status_code >= 400:
-            logger.warning(
-                f"HTTP {response.status_code}: {request.method} {request.path}",
-                extra={
-                    'status_code': response.status_code,
-                    'user': getattr(request.user, 'username', 'anonymous'),
-                    'path': request.path,
-                    'method': request.method,
-                }
-            )
+            self.log_response(request, response, request.user)
         
         return response
 
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if response.status_code >= 400:
+            # В async-контексте ленивый request.user читать нельзя
+            self.log_response(request, response, await request.auser())
+        return response
+
+    def log_response(self, request, response, user):
+        logger.warning(
+            f"HTTP {response.status_code}: {request.method} {request.path}",
+            extra={
+                'status_code': response.status_code,
+                'user': getattr(user, 'username', 'anonymous'),
+                'path': request.path,
+                'method': request.method,
+            }
+        )
+
     def process_exception(self, request, exception):
         """
         Обработка исключений с логированием
@@ -62,3 +94,225 @@ class ErrorLoggingMiddleware:
         return None
 
 
+
+
+# Списки параметров IN (%s, %s, ...) разной длины считаем одним и тем же запросом
+_IN_LIST_RE = re.compile(r'\((?:\s*%s\s*,)*\s*%s\s*\)')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def get_sql_fingerprint(sql):
+    """Нормализует SQL-шаблон для поиска повторяющихся запросов (N+1)."""
+    normalized = _WHITESPACE_RE.sub(' ', _IN_LIST_RE.sub('(...)', sql)).strip()
+    return hashlib.md5(normalized.encode()).hexdigest()[:12], normalized
+
+
+class _QueryRecorder:
+    """Обертка connection.execute_wrapper: считает запросы и время SQL за запрос."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.duration += elapsed
+            fingerprint, normalized = get_sql_fingerprint(sql)
+            stats = self.fingerprints.get(fingerprint)
+            if stats is None:
+                stats = self.fingerprints[fingerprint] = {'sql': normalized[:300], 'count': 0, 'duration': 0.0}
+            stats['count'] += 1
+            stats['duration'] += elapsed
+
+    def duplicates(self, threshold):
+        """Запросы, выполненные не меньше threshold раз, от самых частых."""
+        repeated = [
+            {
+                'fingerprint': fingerprint,
+                'count': stats['count'],
+                'duration_ms': round(stats['duration'] * 1000, 2),
+                'sql': stats['sql'],
+            }
+            for fingerprint, stats in self.fingerprints.items()
+            if stats['count'] >= threshold
+        ]
+        repeated.sort(key=lambda item: item['count'], reverse=True)
+        return repeated
+
+
+class QueryProfilingMiddleware:
+    """
+    Профилирование SQL по запросам (включается QUERY_PROFILER_ENABLED).
+
+    Для каждого запроса считает количество SQL-запросов, суммарное время SQL,
+    повторяющиеся запросы (признак N+1) и общее время. Результат пишется
+    в лог как структурированные поля, отдается в заголовке Server-Timing,
+    а медленные запросы (дольше QUERY_PROFILER_SLOW_MS) дописываются
+    в JSONL-файл QUERY_PROFILER_LOG_FILE с ротацией.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_ms = getattr(settings, 'QUERY_PROFILER_SLOW_MS', 500)
+        self.duplicate_threshold = getattr(settings, 'QUERY_PROFILER_DUPLICATE_THRESHOLD', 3)
+        self.server_timing = getattr(settings, 'QUERY_PROFILER_SERVER_TIMING', True)
+        self.slow_logger = self._get_slow_logger(getattr(settings, 'QUERY_PROFILER_LOG_FILE', None))
+
+    def _get_slow_logger(self, path):
+        if not path:
+            return None
+        slow_logger = logging.getLogger('booking.slow_requests')
+        slow_logger.propagate = False
+        slow_logger.setLevel(logging.INFO)
+        if not slow_logger.handlers:
+            os.makedirs(os.path.dirname(str(path)) or '.', exist_ok=True)
+            handler = logging.handlers.RotatingFileHandler(
+                path,
+                maxBytes=getattr(settings, 'QUERY_PROFILER_LOG_MAX_BYTES', 10 * 1024 * 1024),
+                backupCount=getattr(settings, 'QUERY_PROFILER_LOG_BACKUP_COUNT', 5),
+                encoding='utf-8',
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            slow_logger.addHandler(handler)
+        return slow_logger
+
+    def __call__(self, request):
+        recorder = _QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        wall_ms = (time.perf_counter() - started) * 1000
+        sql_ms = recorder.duration * 1000
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        profile = {
+            'timestamp': timezone.now().isoformat(),
+            'method': request.method,
+            'path': request.path,
+            'view': resolver_match.view_name if resolver_match else None,
+            'status': response.status_code,
+            'user': getattr(getattr(request, 'user', None), 'username', None) or 'anonymous',
+            'wall_ms': round(wall_ms, 2),
+            'sql_ms': round(sql_ms, 2),
+            'query_count': recorder.count,
+            'duplicates': recorder.duplicates(self.duplicate_threshold),
+        }
+
+        logger.info(
+            f"SQL profile {request.method} {request.path}: {recorder.count} queries, "
+            f"{profile['sql_ms']} ms SQL, {profile['wall_ms']} ms total",
+            extra={key: value for key, value in profile.items() if key != 'timestamp'},
+        )
+
+        if self.server_timing:
+            timing = (
+                f'db;dur={sql_ms:.1f};desc="{recorder.count} queries", '
+                f'app;dur={wall_ms:.1f}'
+            )
+            existing = response.get('Server-Timing')
+            response['Server-Timing'] = f'{existing}, {timing}' if existing else timing
+
+        if self.slow_logger and wall_ms >= self.slow_ms:
+            self.slow_logger.info(json.dumps(profile, ensure_ascii=False))
+
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Пишет время обработки каждого запроса в гистограмму booking_view_latency_seconds
+    с меткой по имени URL (включается METRICS_ENABLED, см. booking.metrics).
+
+    Работает и под ASGI без переключения в поток на каждый запрос.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        from .metrics import VIEW_LATENCY
+        self.histogram = VIEW_LATENCY
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, response, started)
+        return response
+
+    def observe(self, request, response, started):
+        resolver_match = getattr(request, 'resolver_match', None)
+        view_name = resolver_match.view_name if resolver_match and resolver_match.view_name else 'unmatched'
+        if view_name != 'metrics':
+            self.histogram.labels(
+                view=view_name,
+                method=request.method,
+                status=f'{response.status_code // 100}xx',
+            ).observe(time.perf_counter() - started)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Read-your-writes для реплики (см. booking.db_routers).
+
+    После успешного изменяющего запроса ставит cookie на REPLICA_STICKY_SECONDS;
+    пока она есть, чтения пользователя идут на default. Без алиаса replica
+    в DATABASES отключается.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_configured():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with pinned_to_primary(self.is_pinned(request)):
+            response = self.get_response(request)
+        return self.pin_after_write(request, response)
+
+    async def __acall__(self, request):
+        with pinned_to_primary(self.is_pinned(request)):
+            response = await self.get_response(request)
+        return self.pin_after_write(request, response)
+
+    def is_pinned(self, request):
+        return PIN_COOKIE_NAME in request.COOKIES
+
+    def pin_after_write(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS', 'TRACE') and response.status_code < 400:
+            response.set_cookie(
+                PIN_COOKIE_NAME,
+                '1',
+                max_age=get_sticky_seconds(),
+                httponly=True,
+                samesite='Lax',
+                secure=request.is_secure(),
+            )
+        return response
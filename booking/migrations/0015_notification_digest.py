@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0014_emailoutbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='changed_booking_ids',
+            field=models.JSONField(blank=True, default=list, help_text='Измененные бронирования, попавшие в сводку', verbose_name='ID измененных бронирований'),
+        ),
+        migrations.AddField(
+            model_name='emailoutbox',
+            name='kind',
+            field=models.CharField(choices=[('booking', 'Новое бронирование'), ('digest', 'Сводка')], default='booking', max_length=20, verbose_name='Тип письма'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='daily_digest_time',
+            field=models.TimeField(default='20:00', help_text='Во сколько отправлять ежедневную сводку', verbose_name='Время ежедневной сводки'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='digest_window_minutes',
+            field=models.PositiveIntegerField(default=2, help_text='Сколько минут собирать изменения в одно письмо (режим сводки за окно)', verbose_name='Окно сводки (мин)'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='notification_mode',
+            field=models.CharField(choices=[('immediate', 'Сразу, письмо на каждое бронирование'), ('digest', 'Сводка за окно (несколько минут)'), ('daily', 'Ежедневная сводка')], default='immediate', help_text='Как группировать email-уведомления специалистам о новых и измененных бронированиях', max_length=20, verbose_name='Режим уведомлений'),
+        ),
+        migrations.AlterField(
+            model_name='emailoutbox',
+            name='body',
+            field=models.TextField(blank=True, verbose_name='Текст письма'),
+        ),
+        migrations.AlterField(
+            model_name='emailoutbox',
+            name='booking_ids',
+            field=models.JSONField(blank=True, default=list, help_text='Бронирования, о которых сообщает письмо (для сводки — новые)', verbose_name='ID бронирований'),
+        ),
+        migrations.AlterField(
+            model_name='emailoutbox',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Ожидает отправки'), ('sending', 'Отправляется'), ('sent', 'Отправлено'), ('failed', 'Ошибка'), ('skipped', 'Пропущено')], default='pending', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AlterField(
+            model_name='emailoutbox',
+            name='subject',
+            field=models.CharField(blank=True, max_length=255, verbose_name='Тема'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:33
+
+import datetime
+
+from django.db import migrations, models, transaction
+from django.utils import timezone
+
+
+TRIGRAM_INDEXES = {
+    'booking_deletedbooking_guest_name_trgm': 'guest_name',
+    'booking_deletedbooking_specialist_name_trgm': 'specialist_name',
+    'booking_deletedbooking_cabinet_name_trgm': 'cabinet_name',
+}
+
+
+def fill_denormalized_fields(apps, schema_editor):
+    """Заполняет новые колонки из booking_data для уже существующих записей"""
+    DeletedBooking = apps.get_model('booking', 'DeletedBooking')
+    batch = []
+    for deleted in DeletedBooking.objects.only('id', 'booking_data').iterator(chunk_size=1000):
+        data = deleted.booking_data or {}
+        deleted.guest_name = (data.get('guest_name') or '')[:200]
+        deleted.specialist_name = (data.get('specialist_name') or '')[:200]
+        deleted.cabinet_name = (data.get('cabinet_name') or '')[:100]
+        deleted.start_time = None
+        if data.get('start_time'):
+            try:
+                start_time = datetime.datetime.fromisoformat(str(data['start_time']).replace('Z', '+00:00'))
+                if timezone.is_naive(start_time):
+                    start_time = timezone.make_aware(start_time)
+                deleted.start_time = start_time
+            except ValueError:
+                pass
+        batch.append(deleted)
+        if len(batch) >= 1000:
+            DeletedBooking.objects.bulk_update(batch, ['guest_name', 'specialist_name', 'cabinet_name', 'start_time'])
+            batch = []
+    if batch:
+        DeletedBooking.objects.bulk_update(batch, ['guest_name', 'specialist_name', 'cabinet_name', 'start_time'])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    На PostgreSQL создает trigram-индексы для поиска по icontains.
+    Если расширение pg_trgm недоступно (нет прав), поиск работает без них.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception:
+        return
+    for index_name, column in TRIGRAM_INDEXES.items():
+        # Выражение совпадает с тем, что Django генерирует для icontains
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} ON booking_deletedbooking '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0015_notification_digest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deletedbooking',
+            name='cabinet_name',
+            field=models.CharField(blank=True, max_length=100, verbose_name='Кабинет'),
+        ),
+        migrations.AddField(
+            model_name='deletedbooking',
+            name='guest_name',
+            field=models.CharField(blank=True, db_index=True, max_length=200, verbose_name='Имя гостя'),
+        ),
+        migrations.AddField(
+            model_name='deletedbooking',
+            name='specialist_name',
+            field=models.CharField(blank=True, db_index=True, max_length=200, verbose_name='Специалист'),
+        ),
+        migrations.AddField(
+            model_name='deletedbooking',
+            name='start_time',
+            field=models.DateTimeField(blank=True, db_index=True, null=True, verbose_name='Время начала'),
+        ),
+        migrations.RunPython(fill_denormalized_fields, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0016_archive_denormalized_fields'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='bookinglog',
+            name='booking_boo_booking_2ae57c_idx',
+        ),
+        migrations.AddIndex(
+            model_name='bookinglog',
+            index=models.Index(fields=['booking', '-created_at', '-id'], name='bookinglog_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='deletedbooking',
+            index=models.Index(fields=['-deleted_at', '-id'], name='deletedbooking_keyset_idx'),
+        ),
+    ]
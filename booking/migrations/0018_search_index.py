@@ -0,0 +1,94 @@
+# Generated by Django 5.2.7 on 2026-10-19 06:36
+
+from django.db import migrations, models
+
+
+def create_search_vector(apps, schema_editor):
+    """На PostgreSQL добавляет генерируемую колонку tsvector с GIN-индексом"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "ALTER TABLE booking_searchentry ADD COLUMN search_vector tsvector "
+        "GENERATED ALWAYS AS (to_tsvector('russian', coalesce(text, ''))) STORED"
+    )
+    schema_editor.execute(
+        'CREATE INDEX booking_searchentry_vector_idx ON booking_searchentry USING gin (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS booking_searchentry_vector_idx')
+    schema_editor.execute('ALTER TABLE booking_searchentry DROP COLUMN IF EXISTS search_vector')
+
+
+def fill_search_index(apps, schema_editor):
+    """Индексирует существующие бронирования и технические записи"""
+    Booking = apps.get_model('booking', 'Booking')
+    CalendarNote = apps.get_model('booking', 'CalendarNote')
+    SearchEntry = apps.get_model('booking', 'SearchEntry')
+
+    entries = []
+    bookings = Booking.objects.select_related('guest', 'specialist', 'cabinet', 'service_variant__service')
+    for booking in bookings.iterator(chunk_size=1000):
+        guest_name = booking.guest.display_name if booking.guest else booking.guest_name
+        service_name = f"{booking.service_variant.service.name} - {booking.service_variant.name_suffix}"
+        parts = [
+            guest_name,
+            booking.guest_name if booking.guest_name != guest_name else '',
+            booking.guest_room_number,
+            booking.comment,
+            booking.specialist.full_name,
+            service_name,
+            booking.cabinet.name,
+        ]
+        entries.append(SearchEntry(
+            kind='booking',
+            object_id=booking.id,
+            title=f"{guest_name} — {service_name}"[:255],
+            text=' '.join(part for part in parts if part),
+            start_time=booking.start_time,
+        ))
+        if len(entries) >= 1000:
+            SearchEntry.objects.bulk_create(entries)
+            entries = []
+    for note in CalendarNote.objects.iterator(chunk_size=1000):
+        entries.append(SearchEntry(
+            kind='note',
+            object_id=note.id,
+            title=(note.comment[:80] + '…') if len(note.comment) > 80 else note.comment,
+            text=note.comment,
+            start_time=note.start_time,
+        ))
+    SearchEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0017_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('booking', 'Бронирование'), ('note', 'Техническая запись')], max_length=20, verbose_name='Тип')),
+                ('object_id', models.BigIntegerField(verbose_name='ID объекта')),
+                ('title', models.CharField(blank=True, max_length=255, verbose_name='Заголовок')),
+                ('text', models.TextField(blank=True, verbose_name='Текст для поиска')),
+                ('start_time', models.DateTimeField(blank=True, null=True, verbose_name='Время начала')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Поисковый индекс',
+                'indexes': [models.Index(fields=['kind', 'start_time'], name='booking_sea_kind_3f9a8d_idx'), models.Index(fields=['start_time'], name='booking_sea_start_t_1ea2f7_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='searchentry_unique_object')],
+            },
+        ),
+        migrations.RunPython(create_search_vector, drop_search_vector),
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0019_booking_start_time_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='specialistprofile',
+            name='calendar_token',
+            field=models.CharField(blank=True, help_text='Секрет в ссылке на подписку .ics; создается при первом открытии графика.', max_length=64, null=True, unique=True, verbose_name='Токен календаря'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0020_specialist_calendar_token'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleRemoval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('booking_id', models.IntegerField(verbose_name='ID бронирования')),
+                ('reason', models.CharField(choices=[('deleted', 'Удалено'), ('reassigned', 'Передано другому специалисту')], default='deleted', max_length=20, verbose_name='Причина')),
+                ('removed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Дата')),
+            ],
+            options={
+                'verbose_name': 'Удаление из расписания',
+                'verbose_name_plural': 'Удаления из расписания',
+                'ordering': ['-removed_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='Для синхронизации расписания специалиста (API, параметр updated_since)', verbose_name='Дата изменения'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['specialist', 'start_time', 'id'], name='booking_specialist_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['specialist', 'updated_at', 'id'], name='booking_specialist_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='scheduleremoval',
+            name='specialist',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_removals', to='booking.specialistprofile', verbose_name='Специалист'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleremoval',
+            index=models.Index(fields=['specialist', 'removed_at'], name='scheduleremoval_sync_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='scheduleremoval',
+            index=models.Index(fields=['removed_at'], name='booking_sch_removed_f32f82_idx'),
+        ),
+    ]
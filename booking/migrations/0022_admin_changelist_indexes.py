@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0021_booking_updated_at_schedule_removal'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bookinglog',
+            index=models.Index(fields=['-created_at', '-id'], name='bookinglog_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['normalized_name'], name='guest_normalized_prefix_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='guest',
+            index=models.Index(fields=['-created_at'], name='guest_created_idx'),
+        ),
+    ]
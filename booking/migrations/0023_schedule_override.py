@@ -0,0 +1,58 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0022_admin_changelist_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleOverride',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_date', models.DateField(verbose_name='С даты')),
+                ('end_date', models.DateField(verbose_name='По дату (включительно)')),
+                ('kind', models.CharField(choices=[('day_off', 'Выходной'), ('custom', 'Свои интервалы')], default='day_off', help_text='Для «Свои интервалы» специалист работает только в указанные интервалы (без интервалов - не работает).', max_length=20, verbose_name='Тип')),
+                ('reason', models.CharField(blank=True, max_length=255, verbose_name='Причина')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Обновлено')),
+                ('specialist', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_overrides', to='booking.specialistprofile', verbose_name='Специалист')),
+            ],
+            options={
+                'verbose_name': 'Исключение из графика',
+                'verbose_name_plural': 'Исключения из графика',
+                'ordering': ['-start_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduleOverrideInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.TimeField(verbose_name='Начало работы')),
+                ('end_time', models.TimeField(verbose_name='Окончание работы')),
+                ('override', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='intervals', to='booking.scheduleoverride', verbose_name='Исключение')),
+            ],
+            options={
+                'verbose_name': 'Интервал работы',
+                'verbose_name_plural': 'Интервалы работы',
+                'ordering': ['start_time'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='scheduleoverride',
+            index=models.Index(fields=['start_date', 'end_date'], name='scheduleoverride_dates_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduleoverride',
+            constraint=models.CheckConstraint(condition=models.Q(('end_date__gte', models.F('start_date'))), name='scheduleoverride_end_after_start'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduleoverrideinterval',
+            constraint=models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='scheduleoverrideinterval_end_after_start'),
+        ),
+    ]
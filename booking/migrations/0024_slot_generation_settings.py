@@ -0,0 +1,24 @@
+# Generated by Django 5.2.7 on 2026-10-19 07:23
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0023_schedule_override'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemsettings',
+            name='slot_alignment',
+            field=models.CharField(choices=[('grid', 'По сетке от начала смены'), ('booking_end', 'Сразу после предыдущей брони')], default='grid', help_text='«Сразу после предыдущей брони» - варианты начинаются с окончания брони (с буфером), чтобы записи шли плотно, без окон до следующего деления сетки.', max_length=20, verbose_name='Выравнивание слотов'),
+        ),
+        migrations.AddField(
+            model_name='systemsettings',
+            name='slot_step_minutes',
+            field=models.PositiveIntegerField(default=15, help_text='Через сколько минут предлагаются варианты начала внутри свободного времени специалиста.', validators=[django.core.validators.MinValueValidator(1)], verbose_name='Шаг слотов (мин)'),
+        ),
+    ]
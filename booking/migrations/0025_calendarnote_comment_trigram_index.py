@@ -0,0 +1,44 @@
+from django.db import migrations, transaction
+
+
+TRIGRAM_INDEXES = {
+    'booking_calendarnote_comment_trgm': ('booking_calendarnote', 'comment'),
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    На PostgreSQL создает trigram-индекс для поиска по комментарию в админке (icontains).
+    Если расширение pg_trgm недоступно (нет прав), поиск работает без него.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception:
+        return
+    for index_name, (table, column) in TRIGRAM_INDEXES.items():
+        # Выражение совпадает с тем, что Django генерирует для icontains
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0024_slot_generation_settings'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
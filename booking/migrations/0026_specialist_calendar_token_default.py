@@ -0,0 +1,30 @@
+import secrets
+
+from django.db import migrations, models
+
+import booking.models
+
+
+def fill_calendar_tokens(apps, schema_editor):
+    """Выдает токены специалистам без них, чтобы страница графика ничего не записывала."""
+    SpecialistProfile = apps.get_model('booking', 'SpecialistProfile')
+    profiles = list(SpecialistProfile.objects.filter(calendar_token__isnull=True).only('id'))
+    for profile in profiles:
+        profile.calendar_token = secrets.token_urlsafe(32)
+    SpecialistProfile.objects.bulk_update(profiles, ['calendar_token'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0025_calendarnote_comment_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='specialistprofile',
+            name='calendar_token',
+            field=models.CharField(blank=True, default=booking.models.generate_calendar_token, help_text='Секрет в ссылке на подписку .ics; новый выдается кнопкой на странице графика.', max_length=64, null=True, unique=True, verbose_name='Токен календаря'),
+        ),
+        migrations.RunPython(fill_calendar_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+from django.db import migrations, transaction
+
+
+TRIGRAM_INDEXES = {
+    'booking_booking_guest_name_trgm': ('booking_booking', 'guest_name'),
+    'booking_bookinglog_message_trgm': ('booking_bookinglog', 'message'),
+    'booking_guest_display_name_trgm': ('booking_guest', 'display_name'),
+    'booking_guest_normalized_name_trgm': ('booking_guest', 'normalized_name'),
+}
+
+
+def create_trigram_indexes(apps, schema_editor):
+    """
+    На PostgreSQL создает trigram-индексы для поиска в админке (icontains):
+    имя гостя в бронированиях, сообщение лога, имена гостей.
+    Если расширение pg_trgm недоступно (нет прав), поиск работает без них.
+    """
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except Exception:
+        return
+    for index_name, (table, column) in TRIGRAM_INDEXES.items():
+        # Выражение совпадает с тем, что Django генерирует для icontains
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {index_name} ON {table} '
+            f'USING gin ((UPPER({column}::text)) gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for index_name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {index_name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0026_specialist_calendar_token_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
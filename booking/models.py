@@ -1,13 +1,33 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.validators import MinValueValidator
 from solo.models import SingletonModel
 from datetime import timedelta
 from django.utils import timezone
 import calendar
+import secrets
 
 
 class SystemSettings(SingletonModel):
     """Глобальные настройки системы"""
+    NOTIFICATION_IMMEDIATE = 'immediate'
+    NOTIFICATION_DIGEST = 'digest'
+    NOTIFICATION_DAILY = 'daily'
+
+    NOTIFICATION_MODE_CHOICES = [
+        (NOTIFICATION_IMMEDIATE, 'Сразу, письмо на каждое бронирование'),
+        (NOTIFICATION_DIGEST, 'Сводка за окно (несколько минут)'),
+        (NOTIFICATION_DAILY, 'Ежедневная сводка'),
+    ]
+
+    SLOT_ALIGN_GRID = 'grid'
+    SLOT_ALIGN_BOOKING_END = 'booking_end'
+
+    SLOT_ALIGNMENT_CHOICES = [
+        (SLOT_ALIGN_GRID, 'По сетке от начала смены'),
+        (SLOT_ALIGN_BOOKING_END, 'Сразу после предыдущей брони'),
+    ]
+
     spa_open_time = models.TimeField(default='09:00', verbose_name='Время открытия')
     spa_close_time = models.TimeField(default='21:00', verbose_name='Время закрытия')
     buffer_time_minutes = models.PositiveIntegerField(
@@ -15,6 +35,20 @@ class SystemSettings(SingletonModel):
         help_text="Время на уборку (в минутах) между бронями.",
         verbose_name='Буферное время (мин)'
     )
+    slot_step_minutes = models.PositiveIntegerField(
+        default=15,
+        validators=[MinValueValidator(1)],
+        help_text="Через сколько минут предлагаются варианты начала внутри свободного времени специалиста.",
+        verbose_name='Шаг слотов (мин)'
+    )
+    slot_alignment = models.CharField(
+        max_length=20,
+        choices=SLOT_ALIGNMENT_CHOICES,
+        default=SLOT_ALIGN_GRID,
+        help_text="«Сразу после предыдущей брони» - варианты начинаются с окончания брони (с буфером), "
+                  "чтобы записи шли плотно, без окон до следующего деления сетки.",
+        verbose_name='Выравнивание слотов'
+    )
     send_email_notifications = models.BooleanField(
         default=True,
         help_text="Отправлять email-уведомления специалистам о новых бронированиях",
@@ -25,6 +59,23 @@ class SystemSettings(SingletonModel):
         help_text="Разрешить копирование/вставку бронирований с помощью горячих клавиш на календаре",
         verbose_name='Горячие клавиши копирования брони'
     )
+    notification_mode = models.CharField(
+        max_length=20,
+        choices=NOTIFICATION_MODE_CHOICES,
+        default=NOTIFICATION_IMMEDIATE,
+        help_text="Как группировать email-уведомления специалистам о новых и измененных бронированиях",
+        verbose_name='Режим уведомлений'
+    )
+    digest_window_minutes = models.PositiveIntegerField(
+        default=2,
+        help_text="Сколько минут собирать изменения в одно письмо (режим сводки за окно)",
+        verbose_name='Окно сводки (мин)'
+    )
+    daily_digest_time = models.TimeField(
+        default='20:00',
+        help_text="Во сколько отправлять ежедневную сводку",
+        verbose_name='Время ежедневной сводки'
+    )
 
     class Meta:
         verbose_name = 'Настройки системы'
@@ -124,6 +175,10 @@ class ServiceVariant(models.Model):
         return f"{self.service.name} - {self.name_suffix}"
 
 
+def generate_calendar_token():
+    return secrets.token_urlsafe(32)
+
+
 class SpecialistProfile(models.Model):
     """Профиль специалиста"""
     user = models.OneToOneField(
@@ -138,6 +193,15 @@ class SpecialistProfile(models.Model):
         help_text="Какие услуги может выполнять этот специалист.",
         verbose_name='Может выполнять услуги'
     )
+    calendar_token = models.CharField(
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        default=generate_calendar_token,
+        verbose_name='Токен календаря',
+        help_text='Секрет в ссылке на подписку .ics; новый выдается кнопкой на странице графика.'
+    )
 
     class Meta:
         verbose_name = 'Профиль специалиста'
@@ -146,6 +210,12 @@ class SpecialistProfile(models.Model):
     def __str__(self):
         return self.full_name
 
+    def reset_calendar_token(self):
+        """Выдает новый токен: старая ссылка на подписку перестает работать."""
+        self.calendar_token = generate_calendar_token()
+        self.save(update_fields=['calendar_token'])
+        return self.calendar_token
+
 
 class SpecialistSchedule(models.Model):
     """График работы специалиста"""
@@ -211,18 +281,14 @@ class ScheduleTemplate(models.Model):
     def apply_to_specialist(self, specialist):
         """
         Применить шаблон к специалисту.
-        Создает или обновляет записи SpecialistSchedule для дней, указанных в шаблоне.
+        Создает или обновляет записи SpecialistSchedule для дней, указанных в шаблоне
+        (многим специалистам сразу - schedule_utils.apply_schedule_template).
         """
-        for template_day in self.days.all():
-            schedule, created = SpecialistSchedule.objects.update_or_create(
-                specialist=specialist,
-                day_of_week=template_day.day_of_week,
-                defaults={
-                    'start_time': template_day.start_time,
-                    'end_time': template_day.end_time,
-                }
-            )
-        return self.days.count()
+        from .schedule_utils import upsert_weekly_schedules
+
+        days = list(self.days.values_list('day_of_week', 'start_time', 'end_time'))
+        upsert_weekly_schedules([specialist.pk], days)
+        return len(days)
 
 
 class ScheduleTemplateDay(models.Model):
@@ -253,6 +319,89 @@ class ScheduleTemplateDay(models.Model):
         return f"{self.template.name} - {day_name} ({self.start_time}-{self.end_time})"
 
 
+class ScheduleOverride(models.Model):
+    """
+    Исключение из недельного графика специалиста на период дат: выходной
+    (отпуск, больничный, праздник) или свои интервалы работы (например, смена с перерывом).
+    """
+    KIND_DAY_OFF = 'day_off'
+    KIND_CUSTOM = 'custom'
+
+    KIND_CHOICES = [
+        (KIND_DAY_OFF, 'Выходной'),
+        (KIND_CUSTOM, 'Свои интервалы'),
+    ]
+
+    specialist = models.ForeignKey(
+        SpecialistProfile,
+        on_delete=models.CASCADE,
+        related_name='schedule_overrides',
+        verbose_name='Специалист'
+    )
+    start_date = models.DateField(verbose_name='С даты')
+    end_date = models.DateField(verbose_name='По дату (включительно)')
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        default=KIND_DAY_OFF,
+        verbose_name='Тип',
+        help_text='Для «Свои интервалы» специалист работает только в указанные интервалы (без интервалов - не работает).'
+    )
+    reason = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Причина'
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        verbose_name = 'Исключение из графика'
+        verbose_name_plural = 'Исключения из графика'
+        ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['start_date', 'end_date'], name='scheduleoverride_dates_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(end_date__gte=models.F('start_date')),
+                name='scheduleoverride_end_after_start'
+            )
+        ]
+
+    def __str__(self):
+        period = self.start_date.strftime('%d.%m.%Y')
+        if self.end_date != self.start_date:
+            period += f" — {self.end_date.strftime('%d.%m.%Y')}"
+        return f"{self.specialist.full_name}: {period} ({self.get_kind_display()})"
+
+
+class ScheduleOverrideInterval(models.Model):
+    """Интервал работы в исключении из графика (тип «Свои интервалы»)"""
+    override = models.ForeignKey(
+        ScheduleOverride,
+        on_delete=models.CASCADE,
+        related_name='intervals',
+        verbose_name='Исключение'
+    )
+    start_time = models.TimeField(verbose_name='Начало работы')
+    end_time = models.TimeField(verbose_name='Окончание работы')
+
+    class Meta:
+        verbose_name = 'Интервал работы'
+        verbose_name_plural = 'Интервалы работы'
+        ordering = ['start_time']
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(end_time__gt=models.F('start_time')),
+                name='scheduleoverrideinterval_end_after_start'
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.start_time}-{self.end_time}"
+
+
 class BookingSeries(models.Model):
     """Правило для повторяющихся бронирований"""
 
@@ -419,7 +568,10 @@ class Guest(models.Model):
         ordering = ['normalized_name']
         indexes = [
             models.Index(fields=['normalized_name']),
+            # Поиск по началу имени в админке (LIKE 'префикс%' при любой локали БД)
+            models.Index(fields=['normalized_name'], name='guest_normalized_prefix_idx', opclasses=['varchar_pattern_ops']),
             models.Index(fields=['display_name']),
+            models.Index(fields=['-created_at'], name='guest_created_idx'),
         ]
 
     def __str__(self):
@@ -507,11 +659,31 @@ class Booking(models.Model):
         default='confirmed',
         verbose_name='Статус'
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+        help_text='Для синхронизации расписания специалиста (API, параметр updated_since)'
+    )
 
     class Meta:
         verbose_name = 'Бронирование'
         verbose_name_plural = 'Бронирования'
         ordering = ['start_time']
+        indexes = [
+            # Диапазоны по времени: лента календаря и агрегаты плотности
+            models.Index(fields=['start_time'], name='booking_start_time_idx'),
+            # Keyset-пагинация расписания специалиста и синхронизация изменений (API)
+            models.Index(fields=['specialist', 'start_time', 'id'], name='booking_specialist_start_idx'),
+            models.Index(fields=['specialist', 'updated_at', 'id'], name='booking_specialist_updated_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Значения до изменения: при переносе сбрасываются кэши прежнего дня и специалиста
+        instance._loaded_start_time = instance.__dict__.get('start_time')
+        instance._loaded_specialist_id = instance.__dict__.get('specialist_id')
+        return instance
 
     def __str__(self):
         guest_display = self.guest.display_name if self.guest else (self.guest_name or 'Без имени')
@@ -602,6 +774,42 @@ class CalendarNote(models.Model):
         return f"{short}: {start}"
 
 
+class SearchEntry(models.Model):
+    """
+    Запись поискового индекса: текст бронирования или технической записи.
+
+    Поддерживается сигналами (см. booking.search_utils). На PostgreSQL у таблицы
+    есть генерируемая колонка search_vector с GIN-индексом (создается миграцией).
+    """
+    KIND_BOOKING = 'booking'
+    KIND_NOTE = 'note'
+    KIND_CHOICES = [
+        (KIND_BOOKING, 'Бронирование'),
+        (KIND_NOTE, 'Техническая запись'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES, verbose_name='Тип')
+    object_id = models.BigIntegerField(verbose_name='ID объекта')
+    title = models.CharField(max_length=255, blank=True, verbose_name='Заголовок')
+    text = models.TextField(blank=True, verbose_name='Текст для поиска')
+    start_time = models.DateTimeField(null=True, blank=True, verbose_name='Время начала')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Обновлено')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Поисковый индекс'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='searchentry_unique_object'),
+        ]
+        indexes = [
+            models.Index(fields=['kind', 'start_time']),
+            models.Index(fields=['start_time']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id}: {self.title}"
+
+
 class DeletedBooking(models.Model):
     """Архив удаленных бронирований для возможности восстановления."""
     
@@ -615,6 +823,30 @@ class DeletedBooking(models.Model):
         verbose_name='Данные бронирования',
         help_text='Полные данные удаленного бронирования в формате JSON'
     )
+    # Денормализованные копии из booking_data для быстрого списка и поиска
+    guest_name = models.CharField(
+        max_length=200,
+        blank=True,
+        db_index=True,
+        verbose_name='Имя гостя'
+    )
+    specialist_name = models.CharField(
+        max_length=200,
+        blank=True,
+        db_index=True,
+        verbose_name='Специалист'
+    )
+    cabinet_name = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Кабинет'
+    )
+    start_time = models.DateTimeField(
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name='Время начала'
+    )
     series_id = models.IntegerField(
         null=True,
         blank=True,
@@ -680,11 +912,16 @@ class DeletedBooking(models.Model):
         indexes = [
             models.Index(fields=['original_id']),
             models.Index(fields=['deleted_at']),
+            models.Index(fields=['-deleted_at', '-id'], name='deletedbooking_keyset_idx'),
             models.Index(fields=['restored']),
             models.Index(fields=['series_id']),
         ]
 
     def __str__(self):
+        # Денормализованные колонки не требуют загрузки JSON (список в админке откладывает booking_data)
+        if self.guest_name and self.start_time:
+            start_time = timezone.localtime(self.start_time).strftime('%d.%m.%Y %H:%M')
+            return f"{self.guest_name} - {start_time} (удалено {timezone.localtime(self.deleted_at).strftime('%d.%m.%Y %H:%M')})"
         booking_data = self.booking_data or {}
         guest_name = booking_data.get('guest_name', 'Неизвестно')
         start_time = booking_data.get('start_time', '')
@@ -699,6 +936,50 @@ class DeletedBooking(models.Model):
         return f"{guest_name} - {start_time} (удалено {timezone.localtime(self.deleted_at).strftime('%d.%m.%Y %H:%M')})"
 
 
+class ScheduleRemoval(models.Model):
+    """
+    Бронирование ушло из расписания специалиста: удалено или передано другому.
+
+    По этим записям API расписания сообщает мобильным клиентам, какие
+    бронирования убрать при синхронизации изменений (updated_since).
+    Старые записи удаляет команда archive_old_records.
+    """
+    REASON_CHOICES = [
+        ('deleted', 'Удалено'),
+        ('reassigned', 'Передано другому специалисту'),
+    ]
+
+    specialist = models.ForeignKey(
+        SpecialistProfile,
+        on_delete=models.CASCADE,
+        related_name='schedule_removals',
+        verbose_name='Специалист'
+    )
+    booking_id = models.IntegerField(verbose_name='ID бронирования')
+    reason = models.CharField(
+        max_length=20,
+        choices=REASON_CHOICES,
+        default='deleted',
+        verbose_name='Причина'
+    )
+    removed_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Дата'
+    )
+
+    class Meta:
+        verbose_name = 'Удаление из расписания'
+        verbose_name_plural = 'Удаления из расписания'
+        ordering = ['-removed_at']
+        indexes = [
+            models.Index(fields=['specialist', 'removed_at'], name='scheduleremoval_sync_idx'),
+            models.Index(fields=['removed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.booking_id} ({self.get_reason_display()}, {self.specialist_id})"
+
+
 class BookingLog(models.Model):
     """История действий с бронированием"""
     
@@ -766,10 +1047,101 @@ class BookingLog(models.Model):
         verbose_name_plural = 'Логи бронирований'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['booking', '-created_at']),
+            models.Index(fields=['booking', '-created_at', '-id'], name='bookinglog_keyset_idx'),
+            # Общая лента логов в админке (сортировка и date_hierarchy)
+            models.Index(fields=['-created_at', '-id'], name='bookinglog_created_idx'),
             models.Index(fields=['action']),
             models.Index(fields=['user']),
         ]
     
     def __str__(self):
         return f"{self.booking.id} - {self.get_action_display()} ({timezone.localtime(self.created_at).strftime('%d.%m.%Y %H:%M')})"
+
+
+class EmailOutbox(models.Model):
+    """Очередь исходящих email-уведомлений (outbox)"""
+
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_SENT = 'sent'
+    STATUS_FAILED = 'failed'
+    STATUS_SKIPPED = 'skipped'
+
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Ожидает отправки'),
+        (STATUS_SENDING, 'Отправляется'),
+        (STATUS_SENT, 'Отправлено'),
+        (STATUS_FAILED, 'Ошибка'),
+        (STATUS_SKIPPED, 'Пропущено'),
+    ]
+
+    KIND_BOOKING = 'booking'
+    KIND_DIGEST = 'digest'
+
+    KIND_CHOICES = [
+        (KIND_BOOKING, 'Новое бронирование'),
+        (KIND_DIGEST, 'Сводка'),
+    ]
+
+    specialist = models.ForeignKey(
+        SpecialistProfile,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outbox_emails',
+        verbose_name='Специалист'
+    )
+    kind = models.CharField(
+        max_length=20,
+        choices=KIND_CHOICES,
+        default=KIND_BOOKING,
+        verbose_name='Тип письма'
+    )
+    booking_ids = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='ID бронирований',
+        help_text='Бронирования, о которых сообщает письмо (для сводки — новые)'
+    )
+    changed_booking_ids = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name='ID измененных бронирований',
+        help_text='Измененные бронирования, попавшие в сводку'
+    )
+    recipient = models.EmailField(verbose_name='Получатель')
+    subject = models.CharField(max_length=255, blank=True, verbose_name='Тема')
+    body = models.TextField(blank=True, verbose_name='Текст письма')
+    html_body = models.TextField(blank=True, verbose_name='HTML версия')
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default=STATUS_PENDING,
+        verbose_name='Статус'
+    )
+    attempts = models.PositiveIntegerField(default=0, verbose_name='Попыток отправки')
+    next_attempt_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Следующая попытка'
+    )
+    claimed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Взято в отправку',
+        help_text='Когда воркер начал отправку (для повторного захвата зависших писем)'
+    )
+    last_error = models.TextField(blank=True, verbose_name='Последняя ошибка')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создано')
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name='Отправлено')
+
+    class Meta:
+        verbose_name = 'Исходящее письмо'
+        verbose_name_plural = 'Очередь email-уведомлений'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['specialist', 'status']),
+        ]
+
+    def __str__(self):
+        return f"{self.recipient}: {self.subject} ({self.get_status_display()})"
@@ -0,0 +1,438 @@
+"""
+Очередь email-уведомлений специалистам (outbox).
+
+Письмо записывается в EmailOutbox в той же транзакции, что и бронирование,
+а отправляется только после коммита (transaction.on_commit) — в фоновом потоке
+или воркером `python manage.py send_queued_emails`. Медленный SMTP-сервер
+больше не задерживает запрос и не держит блокировки строк.
+
+В режиме сводки (SystemSettings.notification_mode) уведомления специалиста
+копятся в одной записи EmailOutbox и отправляются одним письмом по истечении
+окна или раз в день.
+"""
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import threading
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection as db_connection, transaction
+from django.db.models import F, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Booking, EmailOutbox, SystemSettings
+
+logger = logging.getLogger(__name__)
+
+DISPATCH_THREAD = 'thread'
+DISPATCH_SYNC = 'sync'
+DISPATCH_WORKER = 'worker'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_outbox_setting(name, default):
+    """Читает настройку EMAIL_OUTBOX_<name> с значением по умолчанию."""
+    return getattr(settings, f'EMAIL_OUTBOX_{name}', default)
+
+
+def build_booking_notification_context(booking):
+    """Контекст шаблонов new_booking_notification для одного бронирования."""
+    local_start = timezone.localtime(booking.start_time)
+    local_end = timezone.localtime(booking.end_time)
+    return {
+        'specialist_name': booking.specialist.full_name,
+        'guest_name': booking.guest_name,
+        'guest_room': booking.guest_room_number or 'Не указан',
+        'service_name': booking.service_variant.service.name,
+        'service_variant': booking.service_variant.name_suffix,
+        'cabinet_name': booking.cabinet.name,
+        'start_time': local_start.strftime('%d.%m.%Y в %H:%M'),
+        'end_time': local_end.strftime('%H:%M'),
+        'date': local_start.strftime('%d.%m.%Y'),
+        'time_range': f"{local_start.strftime('%H:%M')} - {local_end.strftime('%H:%M')}",
+        'status': dict(Booking.STATUS_CHOICES).get(booking.status, booking.status),
+    }
+
+
+def enqueue_booking_notification(booking):
+    """
+    Ставит в очередь уведомление специалисту о новом бронировании.
+
+    Запись создается в текущей транзакции; отправка планируется на on_commit,
+    поэтому при откате транзакции письмо не уйдет.
+
+    Returns:
+        EmailOutbox или None, если у специалиста нет email
+    """
+    specialist = booking.specialist
+    recipient = specialist.user.email
+    if not recipient:
+        logger.debug(f"Specialist {specialist.full_name} has no email address")
+        return None
+
+    context = build_booking_notification_context(booking)
+    outbox = EmailOutbox.objects.create(
+        specialist=specialist,
+        booking_ids=[booking.id],
+        recipient=recipient,
+        subject=f'Новое бронирование на {context["date"]}',
+        body=render_to_string('booking/emails/new_booking_notification.txt', context),
+        html_body=render_to_string('booking/emails/new_booking_notification.html', context),
+    )
+    schedule_dispatch([outbox.id])
+    logger.info(f"Email notification queued for {recipient}: booking {booking.id}, outbox {outbox.id}")
+    return outbox
+
+
+def get_digest_send_time(system_settings):
+    """Момент отправки новой сводки с учетом режима уведомлений."""
+    now = timezone.now()
+    if system_settings.notification_mode == SystemSettings.NOTIFICATION_DAILY:
+        local_now = timezone.localtime(now)
+        send_time = system_settings.daily_digest_time
+        send_at = local_now.replace(
+            hour=send_time.hour, minute=send_time.minute, second=0, microsecond=0
+        )
+        if send_at <= local_now:
+            send_at += timedelta(days=1)
+        return send_at
+    return now + timedelta(minutes=system_settings.digest_window_minutes)
+
+
+def enqueue_changed_bookings_digest(bookings, system_settings, created=False):
+    """
+    Добавляет бронирования в открытые сводки специалистов (или открывает новые).
+
+    Все новые и измененные бронирования специалиста за окно попадают в одну
+    запись EmailOutbox, поэтому серия из десятков бронирований дает одно письмо.
+    Открытые сводки всех специалистов пакета читаются одним запросом.
+
+    Для пакета бронирования стоит загрузить с specialist__user.
+    created=True - бронирования попадают в сводку как новые, иначе как измененные.
+
+    Returns:
+        list: измененные или созданные EmailOutbox
+    """
+    by_specialist = defaultdict(list)
+    for booking in bookings:
+        if booking.specialist.user.email:
+            by_specialist[booking.specialist_id].append(booking)
+        else:
+            logger.debug(f"Specialist {booking.specialist.full_name} has no email address")
+    if not by_specialist:
+        return []
+
+    digests = []
+    with transaction.atomic():
+        open_digests = {}
+        for digest in EmailOutbox.objects.select_for_update().filter(
+            specialist_id__in=list(by_specialist),
+            kind=EmailOutbox.KIND_DIGEST,
+            status=EmailOutbox.STATUS_PENDING,
+        ).order_by('next_attempt_at'):
+            open_digests.setdefault((digest.specialist_id, digest.recipient), digest)
+
+        for specialist_id, items in by_specialist.items():
+            specialist = items[0].specialist
+            recipient = specialist.user.email
+            digest = open_digests.get((specialist_id, recipient))
+            is_new_digest = digest is None
+            if is_new_digest:
+                digest = EmailOutbox(
+                    specialist=specialist,
+                    recipient=recipient,
+                    kind=EmailOutbox.KIND_DIGEST,
+                    next_attempt_at=get_digest_send_time(system_settings),
+                )
+            known_ids = set(digest.booking_ids) | set(digest.changed_booking_ids)
+            new_ids = [booking.id for booking in items if booking.id not in known_ids]
+            if not new_ids:
+                continue
+            if created:
+                digest.booking_ids.extend(new_ids)
+            else:
+                digest.changed_booking_ids.extend(new_ids)
+            digest.save()
+            digests.append(digest)
+            if is_new_digest:
+                schedule_digest_dispatch(digest)
+                logger.info(f"Email digest opened for {recipient}: outbox {digest.id}, send at {digest.next_attempt_at}")
+    return digests
+
+
+def schedule_digest_dispatch(digest):
+    """
+    Планирует отправку сводки по окончании окна.
+
+    В режиме 'thread' веб-процесс ставит таймер; ежедневные сводки и сводки
+    в остальных режимах отправляет воркер send_queued_emails.
+    """
+    if get_outbox_setting('DISPATCH', DISPATCH_THREAD) != DISPATCH_THREAD:
+        return
+    delay = (digest.next_attempt_at - timezone.now()).total_seconds()
+    if delay > get_outbox_setting('DIGEST_TIMER_MAX_SECONDS', 900):
+        return
+    ids = [digest.id]
+
+    def start_timer():
+        timer = threading.Timer(
+            max(0, delay),
+            lambda: _get_executor().submit(_dispatch_in_background, ids),
+        )
+        timer.daemon = True
+        timer.start()
+
+    transaction.on_commit(start_timer)
+
+
+def render_digest(email):
+    """
+    Заполняет тему и текст сводки по актуальным данным бронирований.
+
+    Бронирования, которые удалены или переназначены другому специалисту,
+    в письмо не попадают.
+
+    Returns:
+        bool: есть ли что отправлять
+    """
+    changed_ids = set(email.changed_booking_ids)
+    bookings = Booking.objects.filter(
+        id__in=set(email.booking_ids) | changed_ids,
+        specialist_id=email.specialist_id,
+    ).select_related(
+        'specialist', 'cabinet', 'service_variant', 'service_variant__service'
+    ).order_by('start_time')
+
+    items = []
+    specialist_name = ''
+    for booking in bookings:
+        context = build_booking_notification_context(booking)
+        context['is_changed'] = booking.id in changed_ids
+        specialist_name = context['specialist_name']
+        items.append(context)
+
+    if not items:
+        return False
+
+    context = {
+        'specialist_name': specialist_name,
+        'bookings': items,
+    }
+    email.subject = f'Сводка бронирований ({len(items)})'
+    email.body = render_to_string('booking/emails/new_booking_notification.txt', context)
+    email.html_body = render_to_string('booking/emails/new_booking_notification.html', context)
+    EmailOutbox.objects.filter(pk=email.pk).update(
+        subject=email.subject,
+        body=email.body,
+        html_body=email.html_body,
+    )
+    return True
+
+
+def schedule_dispatch(outbox_ids):
+    """
+    Планирует отправку писем после коммита текущей транзакции.
+
+    Режим задается настройкой EMAIL_OUTBOX_DISPATCH:
+        'thread' — фоновый поток веб-процесса (по умолчанию);
+        'sync'   — сразу в on_commit (удобно для тестов с locmem backend);
+        'worker' — ничего не делать, письма заберет send_queued_emails.
+    """
+    mode = get_outbox_setting('DISPATCH', DISPATCH_THREAD)
+    if mode == DISPATCH_WORKER:
+        return
+    ids = list(outbox_ids)
+
+    if mode == DISPATCH_SYNC:
+        transaction.on_commit(lambda: dispatch_pending_emails(outbox_ids=ids, workers=1))
+    else:
+        transaction.on_commit(lambda: _get_executor().submit(_dispatch_in_background, ids))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_outbox_setting('WORKERS', 4),
+                thread_name_prefix='email-outbox',
+            )
+    return _executor
+
+
+def _dispatch_in_background(outbox_ids):
+    try:
+        dispatch_pending_emails(outbox_ids=outbox_ids, workers=1)
+    except Exception as e:
+        logger.error(f"Background email dispatch failed: {e}", exc_info=True)
+    finally:
+        db_connection.close()
+
+
+def claim_pending_emails(outbox_ids=None, limit=None):
+    """
+    Забирает письма, готовые к отправке, и помечает их статусом 'sending'.
+
+    Используется SELECT ... FOR UPDATE SKIP LOCKED, поэтому несколько воркеров
+    (и фоновые потоки веб-процессов) не отправят одно письмо дважды.
+    Письма, зависшие в 'sending' дольше EMAIL_OUTBOX_CLAIM_TIMEOUT секунд,
+    захватываются повторно.
+    """
+    now = timezone.now()
+    limit = limit or get_outbox_setting('BATCH_SIZE', 100)
+    stale_before = now - timedelta(seconds=get_outbox_setting('CLAIM_TIMEOUT', 600))
+
+    with transaction.atomic():
+        queryset = EmailOutbox.objects.select_for_update(skip_locked=True).filter(
+            Q(status=EmailOutbox.STATUS_PENDING, next_attempt_at__lte=now) |
+            Q(status=EmailOutbox.STATUS_SENDING, claimed_at__lt=stale_before)
+        )
+        if outbox_ids is not None:
+            queryset = queryset.filter(id__in=outbox_ids)
+        emails = list(queryset.order_by('next_attempt_at', 'id')[:limit])
+        if emails:
+            EmailOutbox.objects.filter(id__in=[email.id for email in emails]).update(
+                status=EmailOutbox.STATUS_SENDING,
+                claimed_at=now,
+            )
+    return emails
+
+
+def get_retry_delay(attempts):
+    """Экспоненциальная задержка перед повторной попыткой (в секундах)."""
+    base = get_outbox_setting('BACKOFF_SECONDS', 60)
+    cap = get_outbox_setting('BACKOFF_MAX_SECONDS', 3600)
+    return min(cap, base * (2 ** max(0, attempts - 1)))
+
+
+def _mark_failed(email, error):
+    attempts = email.attempts + 1
+    max_attempts = get_outbox_setting('MAX_ATTEMPTS', 5)
+    if attempts >= max_attempts:
+        status = EmailOutbox.STATUS_FAILED
+        next_attempt_at = email.next_attempt_at
+    else:
+        status = EmailOutbox.STATUS_PENDING
+        next_attempt_at = timezone.now() + timedelta(seconds=get_retry_delay(attempts))
+
+    EmailOutbox.objects.filter(pk=email.pk).update(
+        status=status,
+        attempts=attempts,
+        next_attempt_at=next_attempt_at,
+        claimed_at=None,
+        last_error=str(error)[:2000],
+    )
+    logger.warning(
+        f"Email {email.pk} to {email.recipient} failed (attempt {attempts}/{max_attempts}): {error}"
+    )
+
+
+def send_email_group(emails):
+    """
+    Отправляет группу писем одного специалиста через одно SMTP-соединение.
+
+    Returns:
+        tuple: (sent_count, failed_count)
+    """
+    if not emails:
+        return 0, 0
+
+    ready = []
+    for email in emails:
+        if email.kind == EmailOutbox.KIND_DIGEST and not render_digest(email):
+            EmailOutbox.objects.filter(pk=email.pk).update(
+                status=EmailOutbox.STATUS_SKIPPED,
+                claimed_at=None,
+            )
+            continue
+        ready.append(email)
+    emails = ready
+    if not emails:
+        return 0, 0
+
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        for email in emails:
+            _mark_failed(email, e)
+        return 0, len(emails)
+
+    sent_ids = []
+    failed = 0
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(
+                subject=email.subject,
+                body=email.body,
+                from_email=settings.DEFAULT_FROM_EMAIL,
+                to=[email.recipient],
+                connection=connection,
+            )
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                message.send()
+            except Exception as e:
+                _mark_failed(email, e)
+                failed += 1
+            else:
+                sent_ids.append(email.pk)
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    if sent_ids:
+        EmailOutbox.objects.filter(pk__in=sent_ids).update(
+            status=EmailOutbox.STATUS_SENT,
+            sent_at=timezone.now(),
+            claimed_at=None,
+            attempts=F('attempts') + 1,
+            last_error='',
+        )
+    return len(sent_ids), failed
+
+
+def _send_group_in_thread(emails):
+    try:
+        return send_email_group(emails)
+    finally:
+        db_connection.close()
+
+
+def dispatch_pending_emails(outbox_ids=None, limit=None, workers=None):
+    """
+    Отправляет готовые письма, группируя их по специалисту.
+
+    Каждая группа отправляется через одно SMTP-соединение; группы разных
+    специалистов обрабатываются параллельно пулом из `workers` потоков.
+
+    Returns:
+        dict: {'claimed': int, 'sent': int, 'failed': int}
+    """
+    emails = claim_pending_emails(outbox_ids=outbox_ids, limit=limit)
+    if not emails:
+        return {'claimed': 0, 'sent': 0, 'failed': 0}
+
+    groups = defaultdict(list)
+    for email in emails:
+        groups[email.specialist_id or email.recipient].append(email)
+
+    workers = workers or get_outbox_setting('WORKERS', 4)
+    if workers <= 1 or len(groups) == 1:
+        results = [send_email_group(group) for group in groups.values()]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='email-outbox') as pool:
+            results = list(pool.map(_send_group_in_thread, groups.values()))
+
+    sent = sum(result[0] for result in results)
+    failed = sum(result[1] for result in results)
+    logger.info(f"Email outbox dispatch: claimed={len(emails)}, sent={sent}, failed={failed}")
+    return {'claimed': len(emails), 'sent': sent, 'failed': failed}
@@ -0,0 +1,143 @@
+"""
+Утилиты для keyset-пагинации (по курсору) и оценки количества записей
+"""
+import base64
+import json
+import logging
+
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(timestamp, pk):
+    """Кодирует позицию (время, id) в строку для URL."""
+    payload = json.dumps([timestamp.isoformat(), pk])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Декодирует курсор из encode_cursor.
+
+    Returns:
+        tuple (datetime, int) или None, если курсор пустой или поврежден
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        timestamp = parse_datetime(timestamp)
+        if timestamp is None:
+            return None
+        return timestamp, int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+
+
+def keyset_paginate(queryset, time_field, per_page=50, after=None, before=None):
+    """
+    Возвращает страницу записей, отсортированных по (time_field, id) от новых к старым.
+
+    Вместо OFFSET используется условие по последней показанной записи, поэтому
+    любая страница стоит столько же, сколько первая (нужен индекс по (time_field, id)).
+
+    Args:
+        queryset: исходный QuerySet (с фильтрами)
+        time_field: имя поля даты, напр. 'deleted_at'
+        per_page: размер страницы
+        after: курсор — показать записи старше этой позиции (следующая страница)
+        before: курсор — показать записи новее этой позиции (предыдущая страница)
+
+    Returns:
+        dict: items, has_next, has_previous, next_cursor, previous_cursor
+    """
+    after = decode_cursor(after)
+    before = decode_cursor(before) if not after else None
+
+    if before:
+        timestamp, pk = before
+        rows = list(
+            queryset.filter(
+                Q(**{f'{time_field}__gt': timestamp}) | Q(**{time_field: timestamp, 'id__gt': pk})
+            ).order_by(time_field, 'id')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        items = list(reversed(rows[:per_page]))
+        has_next = True
+    else:
+        if after:
+            timestamp, pk = after
+            queryset = queryset.filter(
+                Q(**{f'{time_field}__lt': timestamp}) | Q(**{time_field: timestamp, 'id__lt': pk})
+            )
+        rows = list(queryset.order_by(f'-{time_field}', '-id')[:per_page + 1])
+        has_next = len(rows) > per_page
+        items = rows[:per_page]
+        has_previous = after is not None
+
+    def cursor_for(item):
+        return encode_cursor(getattr(item, time_field), item.pk)
+
+    return {
+        'items': items,
+        'has_next': bool(items) and has_next,
+        'has_previous': bool(items) and has_previous,
+        'next_cursor': cursor_for(items[-1]) if items and has_next else None,
+        'previous_cursor': cursor_for(items[0]) if items and has_previous else None,
+    }
+
+
+def keyset_paginate_ascending(queryset, time_field, per_page=50, after=None):
+    """
+    Страница записей по (time_field, id) от ранних к поздним — только вперед
+    (синхронизация в API: клиент дочитывает страницы по next_cursor).
+
+    Args:
+        after: курсор — показать записи после этой позиции
+
+    Returns:
+        dict: items, next_cursor (None на последней странице)
+    """
+    after = decode_cursor(after)
+    if after:
+        timestamp, pk = after
+        queryset = queryset.filter(
+            Q(**{f'{time_field}__gt': timestamp}) | Q(**{time_field: timestamp, 'id__gt': pk})
+        )
+    rows = list(queryset.order_by(time_field, 'id')[:per_page + 1])
+    items = rows[:per_page]
+    has_next = len(rows) > per_page
+    return {
+        'items': items,
+        'next_cursor': encode_cursor(getattr(items[-1], time_field), items[-1].pk) if has_next else None,
+    }
+
+
+def estimate_count(queryset):
+    """
+    Оценка количества записей для подписи под списком.
+
+    На PostgreSQL берется оценка планировщика (EXPLAIN) без полного COUNT(*),
+    на остальных СУБД выполняется обычный count().
+
+    Returns:
+        tuple (count: int, is_estimate: bool)
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), False
+    try:
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return int(plan[0]['Plan']['Plan Rows']), True
+    except Exception as e:
+        logger.warning(f"Count estimate failed, falling back to COUNT(*): {e}")
+        return queryset.count(), False
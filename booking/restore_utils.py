@@ -6,8 +6,9 @@ from django.utils import timezone
 from django.core.exceptions import ValidationError
 import logging
 
-from .models import DeletedBooking, Booking, BookingSeries, ServiceVariant, SpecialistProfile, Cabinet
-from .utils import check_booking_conflicts
+from .models import DeletedBooking, Booking, BookingSeries, ServiceVariant, SpecialistProfile, Cabinet, SystemSettings
+from .utils import check_booking_conflicts, check_booking_conflicts_bulk, detect_occurrence_conflicts
+from .side_effect_utils import apply_booking_side_effects
 
 logger = logging.getLogger(__name__)
 
@@ -96,8 +97,6 @@ def check_restore_conflicts(booking_data, series_data=None):
             
             occurrences = series.generate_datetimes()
             if occurrences:
-                # Импортируем функцию из views
-                from booking.views import detect_occurrence_conflicts
                 series_conflicts = detect_occurrence_conflicts(
                     occurrences,
                     service_variant=service_variant,
@@ -114,6 +113,72 @@ def check_restore_conflicts(booking_data, series_data=None):
         return {'error': f'Ошибка при проверке конфликтов: {str(e)}'}
 
 
+def _describe_conflicts(conflicts):
+    """Текстовое описание конфликтов для сообщения пользователю."""
+    conflict_messages = []
+    if conflicts.get('specialist_busy'):
+        conflict_messages.append('специалист занят')
+    if conflicts.get('cabinet_busy'):
+        conflict_messages.append('кабинет занят')
+    if conflicts.get('specialist_not_available'):
+        conflict_messages.append('специалист не работает')
+    if conflicts.get('cabinet_not_available'):
+        conflict_messages.append('кабинет недоступен')
+    return ", ".join(conflict_messages)
+
+
+def _parse_datetime(value):
+    """Разбирает время из booking_data (ISO-строка) в aware datetime."""
+    from datetime import datetime
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _restore_series_record(series_id, series_data, start_time, restored_by=None):
+    """Возвращает серию с прежним ID, создавая или обновляя ее по series_data."""
+    series, created = BookingSeries.objects.get_or_create(
+        id=series_id,
+        defaults={
+            'start_time': start_time,
+            'frequency': series_data.get('frequency'),
+            'interval': series_data.get('interval'),
+            'occurrence_count': series_data.get('occurrence_count'),
+            'end_date': None,
+            'weekdays': series_data.get('weekdays', []),
+            'excluded_dates': [],
+            'created_by': restored_by,
+        }
+    )
+    if not created:
+        # Серия уже существует, обновляем её
+        series.start_time = start_time
+        series.frequency = series_data.get('frequency')
+        series.interval = series_data.get('interval')
+        series.occurrence_count = series_data.get('occurrence_count')
+        series.end_date = None
+        if series_data.get('end_date'):
+            from datetime import date
+            end_date_str = series_data.get('end_date')
+            if isinstance(end_date_str, str):
+                series.end_date = date.fromisoformat(end_date_str.split('T')[0])
+        series.weekdays = series_data.get('weekdays', [])
+        excluded_dates = series_data.get('excluded_dates', [])
+        if excluded_dates:
+            from datetime import date
+            parsed_excluded = []
+            for d in excluded_dates:
+                if isinstance(d, str):
+                    parsed_excluded.append(date.fromisoformat(d.split('T')[0]))
+                else:
+                    parsed_excluded.append(d)
+            series.excluded_dates = parsed_excluded
+        series.save()
+    return series
+
+
 @transaction.atomic
 def restore_booking(deleted_booking_id, restored_by=None):
     """
@@ -144,16 +209,7 @@ def restore_booking(deleted_booking_id, restored_by=None):
             elif 'series_conflicts' in conflicts:
                 return False, None, 'Обнаружены конфликты при восстановлении серии'
             else:
-                conflict_messages = []
-                if conflicts.get('specialist_busy'):
-                    conflict_messages.append('специалист занят')
-                if conflicts.get('cabinet_busy'):
-                    conflict_messages.append('кабинет занят')
-                if conflicts.get('specialist_not_available'):
-                    conflict_messages.append('специалист не работает')
-                if conflicts.get('cabinet_not_available'):
-                    conflict_messages.append('кабинет недоступен')
-                return False, None, f'Конфликты: {", ".join(conflict_messages)}'
+                return False, None, f'Конфликты: {_describe_conflicts(conflicts)}'
         
         # Восстанавливаем связанные объекты
         service_variant = ServiceVariant.objects.get(id=booking_data['service_variant_id'])
@@ -183,44 +239,12 @@ def restore_booking(deleted_booking_id, restored_by=None):
         # Восстанавливаем серию, если была
         series = None
         if deleted_booking.series_data and deleted_booking.series_id:
-            series_data = deleted_booking.series_data
-            series, created = BookingSeries.objects.get_or_create(
-                id=deleted_booking.series_id,
-                defaults={
-                    'start_time': start_time,
-                    'frequency': series_data.get('frequency'),
-                    'interval': series_data.get('interval'),
-                    'occurrence_count': series_data.get('occurrence_count'),
-                    'end_date': None,
-                    'weekdays': series_data.get('weekdays', []),
-                    'excluded_dates': [],
-                    'created_by': restored_by,
-                }
+            series = _restore_series_record(
+                deleted_booking.series_id,
+                deleted_booking.series_data,
+                start_time,
+                restored_by
             )
-            if not created:
-                # Серия уже существует, обновляем её
-                series.start_time = start_time
-                series.frequency = series_data.get('frequency')
-                series.interval = series_data.get('interval')
-                series.occurrence_count = series_data.get('occurrence_count')
-                series.end_date = None
-                if series_data.get('end_date'):
-                    from datetime import date
-                    end_date_str = series_data.get('end_date')
-                    if isinstance(end_date_str, str):
-                        series.end_date = date.fromisoformat(end_date_str.split('T')[0])
-                series.weekdays = series_data.get('weekdays', [])
-                excluded_dates = series_data.get('excluded_dates', [])
-                if excluded_dates:
-                    from datetime import date
-                    parsed_excluded = []
-                    for d in excluded_dates:
-                        if isinstance(d, str):
-                            parsed_excluded.append(date.fromisoformat(d.split('T')[0]))
-                        else:
-                            parsed_excluded.append(d)
-                    series.excluded_dates = parsed_excluded
-                series.save()
         
         # Создаем бронирование
         created_by_id = booking_data.get('created_by_id')
@@ -269,6 +293,11 @@ def restore_series(deleted_booking_id, restored_by=None):
     """
     Восстанавливает всю серию бронирований.
     
+    Связанные объекты загружаются один раз на всю серию, конфликты всех
+    бронирований проверяются одним пакетным проходом (check_booking_conflicts_bulk),
+    бронирования создаются одним bulk_create, а архив помечается одним update().
+    Бронирования с конфликтами пропускаются и перечисляются в сообщении.
+    
     Args:
         deleted_booking_id: ID записи DeletedBooking (любого из серии)
         restored_by: Пользователь, который восстанавливает
@@ -283,23 +312,116 @@ def restore_series(deleted_booking_id, restored_by=None):
             return False, [], 'Это не серия бронирований'
         
         # Находим все удаленные бронирования этой серии
-        deleted_bookings = DeletedBooking.objects.filter(
+        deleted_bookings = list(DeletedBooking.objects.filter(
             series_id=deleted_booking.series_id,
             restored=False
-        ).order_by('booking_data__sequence')
+        ).order_by('booking_data__sequence'))
         
-        if not deleted_bookings.exists():
+        if not deleted_bookings:
             return False, [], 'Нет невосстановленных бронирований в этой серии'
         
-        restored_bookings = []
-        errors = []
+        # Загружаем связанные объекты один раз на всю серию
+        def collect_ids(key):
+            return {(deleted.booking_data or {}).get(key) for deleted in deleted_bookings} - {None}
         
+        service_variants = ServiceVariant.objects.select_related('service').in_bulk(collect_ids('service_variant_id'))
+        specialists = SpecialistProfile.objects.select_related('user').in_bulk(collect_ids('specialist_id'))
+        cabinets = Cabinet.objects.in_bulk(collect_ids('cabinet_id'))
+        from django.contrib.auth.models import User
+        users = User.objects.in_bulk(collect_ids('created_by_id'))
+        settings = SystemSettings.get_solo()
+        
+        errors = []
+        candidates = []
         for deleted in deleted_bookings:
-            success, booking, message = restore_booking(deleted.id, restored_by)
-            if success:
-                restored_bookings.append(booking)
+            booking_data = deleted.booking_data or {}
+            service_variant = service_variants.get(booking_data.get('service_variant_id'))
+            specialist = specialists.get(booking_data.get('specialist_id'))
+            cabinet = cabinets.get(booking_data.get('cabinet_id'))
+            if not booking_data:
+                error = 'Данные бронирования отсутствуют'
+            elif not service_variant:
+                error = 'Услуга больше не существует'
+            elif not specialist:
+                error = 'Специалист больше не существует'
+            elif not cabinet:
+                error = 'Кабинет больше не существует'
+            elif not booking_data.get('start_time'):
+                error = 'Не указано время начала'
+            else:
+                error = None
+            if error:
+                errors.append(f"Бронирование {deleted.original_id}: {error}")
+                continue
+            
+            candidates.append({
+                'deleted': deleted,
+                'start_time': _parse_datetime(booking_data['start_time']),
+                'service_variant': service_variant,
+                'specialist': specialist,
+                'cabinet': cabinet,
+                'status': booking_data.get('status', 'confirmed'),
+            })
+        
+        # Проверяем конфликты всех бронирований серии одним проходом
+        accepted = []
+        for candidate, conflicts in zip(candidates, check_booking_conflicts_bulk(candidates)):
+            if conflicts:
+                errors.append(
+                    f"Бронирование {candidate['deleted'].original_id}: Конфликты: {_describe_conflicts(conflicts)}"
+                )
             else:
-                errors.append(f"Бронирование {deleted.original_id}: {message}")
+                accepted.append(candidate)
+        
+        restored_bookings = []
+        if accepted:
+            series = None
+            if deleted_booking.series_data:
+                series = _restore_series_record(
+                    deleted_booking.series_id,
+                    deleted_booking.series_data,
+                    min(candidate['start_time'] for candidate in accepted),
+                    restored_by
+                )
+            
+            from datetime import timedelta
+            for candidate in accepted:
+                booking_data = candidate['deleted'].booking_data
+                start_time = candidate['start_time']
+                # Как в Booking.save(): end_time = начало + длительность + буфер
+                total_duration = candidate['service_variant'].duration_minutes + settings.buffer_time_minutes
+                end_time = start_time + timedelta(minutes=total_duration)
+                restored_bookings.append(Booking(
+                    guest_name=booking_data['guest_name'],
+                    guest_room_number=booking_data.get('guest_room_number', ''),
+                    comment=booking_data.get('comment', ''),
+                    service_variant=candidate['service_variant'],
+                    specialist=candidate['specialist'],
+                    cabinet=candidate['cabinet'],
+                    start_time=start_time,
+                    end_time=end_time,
+                    status=candidate['status'],
+                    created_by=users.get(booking_data.get('created_by_id')) or restored_by,
+                    series=series,
+                    sequence=booking_data.get('sequence', 1),
+                ))
+            
+            # bulk_create не вызывает save() и сигналы post_save - их работа выполняется для всей серии сразу
+            Booking.objects.bulk_create(restored_bookings, batch_size=500)
+            apply_booking_side_effects(restored_bookings, created=True, event='restored', system_settings=settings)
+            
+            # Помечаем архив восстановленным одним запросом
+            DeletedBooking.objects.filter(
+                id__in=[candidate['deleted'].id for candidate in accepted]
+            ).update(
+                restored=True,
+                restored_at=timezone.now(),
+                restored_by=restored_by,
+            )
+            
+            logger.info(
+                f"Series {deleted_booking.series_id} restored: {len(restored_bookings)} bookings, {len(errors)} skipped"
+            )
         
         if errors:
             return False, restored_bookings, f'Восстановлено {len(restored_bookings)}, ошибок: {len(errors)}. {"; ".join(errors[:3])}'
@@ -311,4 +433,3 @@ def restore_series(deleted_booking_id, restored_by=None):
     except Exception as e:
         logger.error(f"Error restoring series {deleted_booking_id}: {e}", exc_info=True)
         return False, [], f'Ошибка при восстановлении серии: {str(e)}'
-
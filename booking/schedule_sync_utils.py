@@ -0,0 +1,174 @@
+"""
+Расписание специалиста для API (GET /api/v1/my-schedule/): окно, страницы и синхронизация.
+
+Режимы (выбираются параметрами запроса):
+
+- без параметров — весь список бронирований, как раньше (старые клиенты);
+- окно: from/to (дата или дата-время) — бронирования с началом в [from, to),
+  по страницам limit записей, порядок (start_time, id), следующая страница —
+  по cursor из ответа;
+- изменения: updated_since (значение next_updated_since из прошлого ответа) —
+  бронирования, измененные после этого момента, по страницам в порядке
+  (updated_at, id); на последней странице — deleted, id бронирований, ушедших
+  из расписания (удалены или переданы другому специалисту, см. ScheduleRemoval).
+
+Клиент загружает окно один раз, а дальше получает только изменения — объем
+ответа зависит от числа изменений, а не от истории специалиста.
+Каждый ответ отдается с ETag: повтор без изменений получает 304.
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+
+from .models import Booking, ScheduleRemoval
+from .pagination_utils import decode_cursor, keyset_paginate_ascending
+from .serializers import BookingSerializer
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Параметры, включающие новый формат ответа (объект со страницей вместо списка)
+PAGED_PARAMS = ('from', 'to', 'cursor', 'limit', 'updated_since')
+
+
+def get_schedule_api_setting(name, default):
+    return getattr(settings, f'SCHEDULE_API_{name}', default)
+
+
+def record_schedule_removals(removals, reason='deleted'):
+    """
+    Записывает, что бронирования ушли из расписания специалистов.
+
+    Args:
+        removals: пары (specialist_id, booking_id)
+    """
+    now = timezone.now()
+    ScheduleRemoval.objects.bulk_create([
+        ScheduleRemoval(specialist_id=specialist_id, booking_id=booking_id, reason=reason, removed_at=now)
+        for specialist_id, booking_id in removals
+        if specialist_id and booking_id
+    ], batch_size=500)
+
+
+def _parse_moment(params, name):
+    """Дата или дата-время из параметра; дата означает начало дня в текущей таймзоне."""
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        moment = parse_datetime(value.replace(' ', '+'))
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            moment = datetime.datetime.combine(day, datetime.time.min)
+    except ValueError:
+        raise exceptions.ValidationError({name: 'Ожидается дата (ГГГГ-ММ-ДД) или дата и время в формате ISO 8601.'})
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _parse_limit(params):
+    value = params.get('limit')
+    if not value:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        raise exceptions.ValidationError({'limit': 'Ожидается целое число.'})
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise exceptions.ValidationError({'limit': f'Допустимо от 1 до {MAX_PAGE_SIZE}.'})
+    return limit
+
+
+def _parse_cursor(params):
+    cursor = params.get('cursor')
+    if cursor and decode_cursor(cursor) is None:
+        raise exceptions.ValidationError({'cursor': 'Некорректный курсор.'})
+    return cursor
+
+
+def build_schedule_payload(specialist, params):
+    """
+    Данные ответа API расписания по параметрам запроса (см. описание модуля).
+
+    Raises:
+        ValidationError: некорректные параметры
+
+    Returns:
+        list (без параметров) или dict: results, next_cursor, next_updated_since
+        и в режиме изменений deleted
+    """
+    bookings = Booking.objects.filter(specialist=specialist).select_related(
+        'specialist', 'cabinet', 'service_variant', 'service_variant__service'
+    )
+    if not any(params.get(name) for name in PAGED_PARAMS):
+        return BookingSerializer(bookings.order_by('start_time', 'id'), many=True).data
+
+    limit = _parse_limit(params)
+    cursor = _parse_cursor(params)
+    window_start = _parse_moment(params, 'from')
+    window_end = _parse_moment(params, 'to')
+    updated_since = _parse_moment(params, 'updated_since')
+    # Транзакции, начатые раньше, могут закоммитить изменения с более ранним updated_at,
+    # поэтому следующая синхронизация начинается с запасом (повторы клиенту безвредны)
+    now = timezone.now()
+    next_updated_since = now - datetime.timedelta(seconds=get_schedule_api_setting('SYNC_OVERLAP_SECONDS', 60))
+
+    if updated_since is None:
+        if window_start and window_end and window_start >= window_end:
+            raise exceptions.ValidationError({'to': 'Конец окна должен быть позже начала.'})
+        if window_start:
+            bookings = bookings.filter(start_time__gte=window_start)
+        if window_end:
+            bookings = bookings.filter(start_time__lt=window_end)
+        page = keyset_paginate_ascending(bookings, 'start_time', limit, cursor)
+        return {
+            'results': BookingSerializer(page['items'], many=True).data,
+            'next_cursor': page['next_cursor'],
+            'next_updated_since': next_updated_since.isoformat(),
+        }
+
+    if window_start or window_end:
+        # Бронирование, перенесенное за границу окна, клиент бы не увидел
+        raise exceptions.ValidationError({'updated_since': 'Не сочетается с from/to: изменения отдаются по всему расписанию.'})
+    retention = datetime.timedelta(days=get_schedule_api_setting('SYNC_RETENTION_DAYS', 30))
+    if updated_since < now - retention:
+        # Записи об удалениях старше срока хранения уже очищены
+        raise exceptions.ValidationError(
+            {'updated_since': 'Слишком давняя синхронизация, загрузите расписание заново.'},
+            code='full_sync_required',
+        )
+
+    page = keyset_paginate_ascending(bookings.filter(updated_at__gt=updated_since), 'updated_at', limit, cursor)
+    payload = {
+        'results': BookingSerializer(page['items'], many=True).data,
+        'next_cursor': page['next_cursor'],
+        'next_updated_since': next_updated_since.isoformat(),
+    }
+    if page['next_cursor'] is None:
+        # Удаления - на последней странице: клиент применяет их после всех изменений.
+        # Бронирование, вернувшееся к специалисту, пришло в results и удалять его не нужно.
+        payload['deleted'] = sorted(set(
+            ScheduleRemoval.objects.filter(specialist=specialist, removed_at__gt=updated_since)
+            .exclude(booking_id__in=Booking.objects.filter(specialist=specialist).values('id'))
+            .values_list('booking_id', flat=True)
+        ))
+    return payload
+
+
+def schedule_etag(data):
+    """
+    ETag ответа по его данным.
+
+    next_updated_since меняется при каждом запросе и в ETag не входит: получив 304,
+    клиент продолжает синхронизацию со своего прежнего updated_since.
+    """
+    if isinstance(data, dict):
+        data = {key: value for key, value in data.items() if key != 'next_updated_since'}
+    return f'"{hashlib.md5(JSONRenderer().render(data)).hexdigest()}"'
@@ -0,0 +1,281 @@
+"""
+Рабочее время специалистов по датам с учетом исключений из графика.
+
+Недельный график (SpecialistSchedule) задает один интервал на день недели.
+Исключение (ScheduleOverride) на период дат заменяет его: выходной или свои
+интервалы (смена с перерывом, сокращенный день). Если на дату попадает
+несколько исключений, действует самое короткое по периоду, при равных —
+созданное позже.
+
+Итоговые интервалы считаются сразу для всех специалистов на набор дат
+(два запроса) и кэшируются по дням (Django cache), поэтому поиск слотов
+не обращается к графикам на каждый вызов. Любое изменение графиков и
+исключений сбрасывает кэш целиком через поколение. Проверки конфликтов
+перед записью читают графики из базы: с LocMemCache и несколькими
+воркерами сброс виден только одному процессу (см. booking.W113).
+
+Здесь же — пакетное применение шаблона расписания ко многим специалистам
+(одна вставка с обновлением при конфликте) с отчетом о бронированиях,
+которые не укладываются в новые часы работы.
+"""
+import datetime
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .density_utils import invalidate_all_density
+from .metrics import record_cache_access
+
+CACHE_PREFIX = 'schedule_intervals'
+GENERATION_KEY = f'{CACHE_PREFIX}:generation'
+
+
+def get_cache_seconds():
+    return getattr(settings, 'SCHEDULE_CACHE_SECONDS', 3600)
+
+
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(GENERATION_KEY, generation, None)
+    return generation
+
+
+def _day_key(day, generation):
+    return f'{CACHE_PREFIX}:{generation}:{day.isoformat()}'
+
+
+def _to_datetimes(day, start_time, end_time):
+    return (
+        timezone.make_aware(datetime.datetime.combine(day, start_time)),
+        timezone.make_aware(datetime.datetime.combine(day, end_time)),
+    )
+
+
+def compute_working_intervals(days):
+    """
+    Интервалы работы всех специалистов по датам (без кэша).
+
+    Returns:
+        dict {date: {specialist_id: [(начало, конец), ...]}} — aware datetime
+        по возрастанию; специалиста, который в этот день не работает, в словаре нет
+    """
+    from .models import ScheduleOverride, SpecialistSchedule
+
+    if not days:
+        return {}
+
+    weekly = defaultdict(dict)
+    for specialist_id, day_of_week, start_time, end_time in SpecialistSchedule.objects.values_list(
+        'specialist_id', 'day_of_week', 'start_time', 'end_time'
+    ):
+        weekly[day_of_week][specialist_id] = [(start_time, end_time)]
+
+    # Сначала длинные периоды, затем короткие и более поздние - они перекрывают предыдущие
+    overrides = sorted(
+        ScheduleOverride.objects.filter(start_date__lte=max(days), end_date__gte=min(days)).prefetch_related('intervals'),
+        key=lambda override: (-(override.end_date - override.start_date).days, override.id),
+    )
+
+    result = {}
+    for day in days:
+        intervals = dict(weekly.get(day.weekday(), {}))
+        for override in overrides:
+            if not override.start_date <= day <= override.end_date:
+                continue
+            if override.kind == ScheduleOverride.KIND_DAY_OFF:
+                intervals[override.specialist_id] = []
+            else:
+                intervals[override.specialist_id] = sorted(
+                    (interval.start_time, interval.end_time) for interval in override.intervals.all()
+                )
+        result[day] = {
+            specialist_id: [_to_datetimes(day, start_time, end_time) for start_time, end_time in day_intervals]
+            for specialist_id, day_intervals in intervals.items()
+            if day_intervals
+        }
+    return result
+
+
+def get_working_intervals(days, specialist_ids=None, use_cache=True):
+    """
+    Интервалы работы по датам с кэшем: из базы считаются только дни,
+    которых нет в кэше (одним набором запросов).
+
+    Args:
+        days: даты
+        specialist_ids: оставить только этих специалистов (по умолчанию все)
+        use_cache: False - считать по базе в обход кэша (проверки перед записью)
+
+    Returns:
+        dict {date: {specialist_id: [(начало, конец), ...]}} (см. compute_working_intervals)
+    """
+    days = sorted(set(days))
+    by_day = _cached_working_intervals(days) if use_cache else compute_working_intervals(days)
+    if specialist_ids is None:
+        return by_day
+    return {
+        day: {
+            specialist_id: day_intervals
+            for specialist_id, day_intervals in by_day[day].items()
+            if specialist_id in specialist_ids
+        }
+        for day in days
+    }
+
+
+def _cached_working_intervals(days):
+    generation = _generation()
+    keys = {day: _day_key(day, generation) for day in days}
+    cached = cache.get_many(list(keys.values()))
+    missing = [day for day in days if keys[day] not in cached]
+    record_cache_access('schedule_intervals', not missing)
+
+    if missing:
+        computed = compute_working_intervals(missing)
+        cache.set_many({keys[day]: computed[day] for day in missing}, get_cache_seconds())
+        cached.update({keys[day]: computed[day] for day in missing})
+    return {day: cached[keys[day]] for day in days}
+
+
+def local_date(moment):
+    return timezone.localtime(moment).date()
+
+
+def is_within_working_hours(working_intervals, specialist_id, start_time, end_time):
+    """
+    Укладывается ли [start_time, end_time) целиком в один интервал работы специалиста.
+
+    Args:
+        working_intervals: результат get_working_intervals, содержащий дату start_time
+    """
+    day_intervals = working_intervals.get(local_date(start_time), {}).get(specialist_id, ())
+    return any(work_start <= start_time and end_time <= work_end for work_start, work_end in day_intervals)
+
+
+def invalidate_working_intervals():
+    """Сбрасывает кэш интервалов работы целиком (после коммита транзакции)."""
+    transaction.on_commit(_next_generation)
+
+
+def _next_generation():
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, 2, None)
+
+
+def upsert_weekly_schedules(specialist_ids, days):
+    """
+    Записывает недельный график специалистам одной вставкой с обновлением при конфликте
+    (specialist, day_of_week). Дни недели, которых нет в days, не меняются.
+
+    bulk_create не вызывает сигналы, поэтому кэши интервалов работы и плотности
+    сбрасываются здесь.
+
+    Args:
+        specialist_ids: ID специалистов
+        days: тройки (day_of_week, start_time, end_time)
+
+    Returns:
+        int: число записанных строк графика
+    """
+    from .models import SpecialistSchedule
+
+    schedules = [
+        SpecialistSchedule(specialist_id=specialist_id, day_of_week=day_of_week, start_time=start_time, end_time=end_time)
+        for specialist_id in specialist_ids
+        for day_of_week, start_time, end_time in days
+    ]
+    if not schedules:
+        return 0
+    SpecialistSchedule.objects.bulk_create(
+        schedules,
+        update_conflicts=True,
+        unique_fields=['specialist', 'day_of_week'],
+        update_fields=['start_time', 'end_time'],
+        batch_size=500,
+    )
+    invalidate_working_intervals()
+    invalidate_all_density()
+    return len(schedules)
+
+
+def find_bookings_outside_hours(specialist_ids, weekdays=None, since=None):
+    """
+    Будущие (с since, по умолчанию с текущего момента) неотмененные бронирования
+    специалистов, которые не укладываются в их интервалы работы.
+
+    Интервалы считаются без кэша, поэтому учитывают изменения графиков
+    в текущей транзакции.
+
+    Args:
+        weekdays: проверять только эти дни недели (0 - понедельник)
+
+    Returns:
+        list: словари id, specialist_id, specialist_name, guest_name, start_time, end_time
+    """
+    from .models import Booking
+
+    bookings = list(
+        Booking.objects.filter(specialist_id__in=list(specialist_ids), start_time__gte=since or timezone.now())
+        .exclude(status='canceled')
+        .order_by('start_time', 'id')
+        .values('id', 'specialist_id', 'specialist__full_name', 'guest_name', 'start_time', 'end_time')
+    )
+    if weekdays is not None:
+        bookings = [booking for booking in bookings if local_date(booking['start_time']).weekday() in weekdays]
+    if not bookings:
+        return []
+
+    working_intervals = compute_working_intervals(sorted({local_date(booking['start_time']) for booking in bookings}))
+    return [
+        {
+            'id': booking['id'],
+            'specialist_id': booking['specialist_id'],
+            'specialist_name': booking['specialist__full_name'],
+            'guest_name': booking['guest_name'],
+            'start_time': booking['start_time'],
+            'end_time': booking['end_time'],
+        }
+        for booking in bookings
+        if not is_within_working_hours(
+            working_intervals, booking['specialist_id'], booking['start_time'], booking['end_time']
+        )
+    ]
+
+
+def apply_schedule_template(template, specialists, dry_run=False):
+    """
+    Применяет шаблон расписания ко многим специалистам в одной транзакции.
+
+    Args:
+        template: ScheduleTemplate
+        specialists: специалисты (объекты или ID)
+        dry_run: только отчет, без сохранения (транзакция откатывается)
+
+    Returns:
+        dict: specialists, days (дней в шаблоне), schedules (записано строк графика),
+        outside_hours (бронирования вне новых часов, см. find_bookings_outside_hours)
+    """
+    specialist_ids = sorted({getattr(specialist, 'pk', specialist) for specialist in specialists})
+    days = list(template.days.values_list('day_of_week', 'start_time', 'end_time'))
+
+    with transaction.atomic():
+        schedules = upsert_weekly_schedules(specialist_ids, days)
+        outside_hours = find_bookings_outside_hours(
+            specialist_ids, weekdays={day_of_week for day_of_week, _, _ in days}
+        ) if days else []
+        if dry_run:
+            transaction.set_rollback(True)
+
+    return {
+        'specialists': len(specialist_ids),
+        'days': len(days),
+        'schedules': schedules,
+        'outside_hours': outside_hours,
+    }
@@ -0,0 +1,267 @@
+"""
+Утилиты полнотекстового поиска по бронированиям и техническим записям.
+
+Индекс хранится в модели SearchEntry и обновляется сигналами (см. signals.py)
+и массовыми операциями. Имена гостя, специалиста, услуги и кабинета входят
+в текст записи бронирования, поэтому их переименование переиндексирует
+связанные бронирования (reindex_bookings). На PostgreSQL поиск идет по генерируемой колонке
+search_vector с GIN-индексом и ранжируется ts_rank, на остальных СУБД
+(SQLite в тестах) используется простой инвертированный индекс в памяти процесса.
+"""
+import bisect
+import datetime
+import logging
+import re
+import threading
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Count, FloatField, Max
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .models import Booking, CalendarNote, SearchEntry
+from .metrics import record_cache_access
+
+logger = logging.getLogger(__name__)
+
+# Конфигурация текстового поиска PostgreSQL (должна совпадать с миграцией 0018)
+SEARCH_CONFIG = 'russian'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def build_booking_entry(booking):
+    """Создает (без сохранения) запись индекса для бронирования."""
+    guest_name = booking.guest.display_name if booking.guest_id and booking.guest else booking.guest_name
+    service_name = str(booking.service_variant) if booking.service_variant_id else ''
+    parts = [
+        guest_name,
+        booking.guest_name if booking.guest_name != guest_name else '',
+        booking.guest_room_number,
+        booking.comment,
+        booking.specialist.full_name if booking.specialist_id else '',
+        service_name,
+        booking.cabinet.name if booking.cabinet_id else '',
+    ]
+    return SearchEntry(
+        kind=SearchEntry.KIND_BOOKING,
+        object_id=booking.id,
+        title=f"{guest_name} — {service_name}"[:255],
+        text=' '.join(part for part in parts if part),
+        start_time=booking.start_time,
+    )
+
+
+def build_note_entry(note):
+    """Создает (без сохранения) запись индекса для технической записи."""
+    return SearchEntry(
+        kind=SearchEntry.KIND_NOTE,
+        object_id=note.id,
+        title=(note.comment[:80] + '…') if len(note.comment) > 80 else note.comment,
+        text=note.comment,
+        start_time=note.start_time,
+    )
+
+
+def _save_entries(entries):
+    if not entries:
+        return
+    SearchEntry.objects.bulk_create(
+        entries,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['title', 'text', 'start_time', 'updated_at'],
+    )
+
+
+def index_bookings(bookings):
+    """Добавляет или обновляет бронирования в индексе одним запросом."""
+    _save_entries([build_booking_entry(booking) for booking in bookings])
+
+
+def reindex_bookings(queryset, batch_size=1000):
+    """
+    Переиндексирует бронирования из queryset пачками по batch_size.
+
+    Returns:
+        int: количество проиндексированных бронирований
+    """
+    total = 0
+    batch = []
+    bookings = queryset.select_related('guest', 'specialist', 'cabinet', 'service_variant__service').order_by('id')
+    for booking in bookings.iterator(chunk_size=batch_size):
+        batch.append(build_booking_entry(booking))
+        if len(batch) >= batch_size:
+            _save_entries(batch)
+            total += len(batch)
+            batch = []
+    _save_entries(batch)
+    return total + len(batch)
+
+
+def index_notes(notes):
+    """Добавляет или обновляет технические записи в индексе одним запросом."""
+    _save_entries([build_note_entry(note) for note in notes])
+
+
+def remove_from_index(kind, object_ids):
+    """Удаляет объекты из индекса."""
+    object_ids = list(object_ids)
+    if object_ids:
+        SearchEntry.objects.filter(kind=kind, object_id__in=object_ids).delete()
+
+
+@transaction.atomic
+def rebuild_search_index(batch_size=1000):
+    """
+    Полностью перестраивает индекс (после правок данных напрямую в базе
+    или восстановления из резервной копии).
+
+    Returns:
+        int: количество проиндексированных объектов
+    """
+    SearchEntry.objects.all().delete()
+    total = reindex_bookings(Booking.objects.all(), batch_size=batch_size)
+    notes = [build_note_entry(note) for note in CalendarNote.objects.order_by('id')]
+    _save_entries(notes)
+    return total + len(notes)
+
+
+def tokenize(text):
+    """Разбивает текст на слова в нижнем регистре."""
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+class InvertedIndex:
+    """
+    Простой инвертированный индекс в памяти для СУБД без полнотекстового поиска.
+
+    Слово запроса совпадает со словом документа, если является его префиксом,
+    поэтому «иван» находит «Иванов». Вес — сумма вхождений совпавших слов.
+    """
+
+    def __init__(self, entries):
+        self.postings = defaultdict(dict)  # слово -> {entry_id: число вхождений}
+        for entry_id, text in entries:
+            for token in tokenize(text):
+                postings = self.postings[token]
+                postings[entry_id] = postings.get(entry_id, 0) + 1
+        self.vocabulary = sorted(self.postings)
+
+    def _matching_tokens(self, prefix):
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        for token in self.vocabulary[start:]:
+            if not token.startswith(prefix):
+                break
+            yield token
+
+    def search(self, query):
+        """Возвращает {entry_id: вес} для документов, содержащих все слова запроса."""
+        scores = None
+        for query_token in set(tokenize(query)):
+            token_scores = defaultdict(int)
+            for token in self._matching_tokens(query_token):
+                for entry_id, count in self.postings[token].items():
+                    token_scores[entry_id] += count
+            if scores is None:
+                scores = dict(token_scores)
+            else:
+                scores = {
+                    entry_id: score + token_scores[entry_id]
+                    for entry_id, score in scores.items()
+                    if entry_id in token_scores
+                }
+            if not scores:
+                return {}
+        return scores or {}
+
+
+_fallback_lock = threading.Lock()
+_fallback_cache = {'version': None, 'index': None}
+
+
+def _get_fallback_index():
+    """Инвертированный индекс процесса; перестраивается, когда меняется SearchEntry."""
+    state = SearchEntry.objects.aggregate(count=Count('id'), last=Max('updated_at'))
+    version = (state['count'], state['last'])
+    with _fallback_lock:
+        record_cache_access('search_fallback', _fallback_cache['version'] == version)
+        if _fallback_cache['version'] != version:
+            _fallback_cache['index'] = InvertedIndex(SearchEntry.objects.values_list('id', 'text'))
+            _fallback_cache['version'] = version
+        return _fallback_cache['index']
+
+
+def _filter_entries(queryset, kinds=None, date_from=None, date_to=None):
+    if kinds:
+        queryset = queryset.filter(kind__in=kinds)
+    if date_from:
+        queryset = queryset.filter(start_time__gte=timezone.make_aware(
+            datetime.datetime.combine(date_from, datetime.time.min)
+        ))
+    if date_to:
+        queryset = queryset.filter(start_time__lt=timezone.make_aware(
+            datetime.datetime.combine(date_to + datetime.timedelta(days=1), datetime.time.min)
+        ))
+    return queryset
+
+
+def search(query, kinds=None, date_from=None, date_to=None, limit=50):
+    """
+    Ищет бронирования и технические записи по тексту.
+
+    Args:
+        query: строка запроса (на PostgreSQL — синтаксис websearch_to_tsquery)
+        kinds: список типов SearchEntry.KIND_* (по умолчанию все)
+        date_from, date_to: даты (включительно) для фильтра по времени начала
+        limit: максимальное количество результатов
+
+    Returns:
+        list: записи SearchEntry с атрибутом rank, по убыванию релевантности
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+    entries = _filter_entries(SearchEntry.objects.all(), kinds, date_from, date_to)
+
+    if connection.vendor == 'postgresql':
+        tsquery = f"websearch_to_tsquery('{SEARCH_CONFIG}', %s)"
+        return list(
+            entries.filter(
+                RawSQL(f'search_vector @@ {tsquery}', (query,), output_field=BooleanField())
+            ).annotate(
+                rank=RawSQL(f'ts_rank(search_vector, {tsquery})', (query,), output_field=FloatField())
+            ).order_by('-rank', '-start_time')[:limit]
+        )
+
+    scores = _get_fallback_index().search(query)
+    if not scores:
+        return []
+    results = list(entries.filter(id__in=list(scores)))
+    for entry in results:
+        entry.rank = float(scores[entry.id])
+    epoch = timezone.make_aware(datetime.datetime(1970, 1, 1))
+    results.sort(key=lambda entry: (-entry.rank, -((entry.start_time or epoch) - epoch).total_seconds()))
+    return results[:limit]
+
+
+def search_object_ids(query, kind):
+    """
+    ID всех объектов указанного типа, найденных по запросу (для фильтров в админке),
+    без ранжирования и ограничения количества. На PostgreSQL — подзапрос
+    (queryset.filter(id__in=...) выполняется одним запросом), иначе — список.
+    """
+    query = (query or '').strip()
+    if not query:
+        return []
+    entries = SearchEntry.objects.filter(kind=kind)
+    if connection.vendor == 'postgresql':
+        return entries.filter(
+            RawSQL(f"search_vector @@ websearch_to_tsquery('{SEARCH_CONFIG}', %s)", (query,), output_field=BooleanField())
+        ).values('object_id')
+    scores = _get_fallback_index().search(query)
+    if not scores:
+        return []
+    return list(entries.filter(id__in=list(scores)).values_list('object_id', flat=True))
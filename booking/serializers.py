@@ -30,8 +30,9 @@ class BookingSerializer(serializers.ModelSerializer):
             'end_time',
             'status',
             'created_by',
+            'updated_at',
         ]
-        read_only_fields = ['end_time', 'created_by']
+        read_only_fields = ['end_time', 'created_by', 'updated_at']
     
     def validate_guest_name(self, value):
         """Валидация имени гостя"""
@@ -0,0 +1,105 @@
+"""
+Последствия изменения бронирований: поисковый индекс, метрики, живое
+обновление календаря, кэши плотности и .ics, синхронизация расписаний
+для API и письма специалистам.
+
+Одиночные сохранение и удаление вызывают apply_booking_side_effects из сигналов,
+пакетные пути (bulk_create, bulk_update, удаление без сигналов) — напрямую для
+всего пакета. Новое последствие добавляется только здесь, и его получают все пути.
+"""
+import logging
+
+from .density_utils import invalidate_density_days
+from .ical_utils import invalidate_specialist_feeds
+from .live_utils import notify_bookings_changed
+from .metrics import record_booking_event
+from .models import SearchEntry, SystemSettings
+from .notification_utils import enqueue_booking_notification, enqueue_changed_bookings_digest
+from .schedule_sync_utils import record_schedule_removals
+from .search_utils import index_bookings, remove_from_index
+
+logger = logging.getLogger(__name__)
+
+
+def apply_booking_side_effects(bookings, originals=None, created=False, deleted=False,
+                               event=None, notify=True, system_settings=None):
+    """
+    Выполняет все, что должно последовать за сохранением или удалением бронирований.
+
+    Args:
+        bookings: сохраненные бронирования (для писем - с specialist__user)
+            или удаленные (с прежними id)
+        originals: {booking_id: (start_time, specialist_id)} - значения до изменения:
+            прежний день и прежний специалист тоже теряют бронирование
+        created: бронирования только что созданы
+        deleted: бронирования удалены
+        event: событие метрики вместо created/deleted (например, 'restored')
+        notify: ставить ли письма специалистам (удаление писем не порождает)
+        system_settings: SystemSettings, если уже загружены
+    """
+    bookings = list(bookings)
+    if not bookings:
+        return
+    originals = originals or {}
+    booking_ids = [booking.id for booking in bookings]
+
+    if deleted:
+        remove_from_index(SearchEntry.KIND_BOOKING, booking_ids)
+    else:
+        try:
+            index_bookings(bookings)
+        except Exception as e:
+            logger.error(f"Error indexing bookings {booking_ids[:10]}: {e}", exc_info=True)
+
+    event = event or ('deleted' if deleted else 'created' if created else None)
+    if event:
+        record_booking_event(event, len(bookings))
+    record_booking_event('moved', sum(
+        1 for booking in bookings
+        if booking.id in originals and originals[booking.id][0] not in (None, booking.start_time)
+    ))
+
+    notify_bookings_changed(booking_ids)
+    invalidate_density_days(
+        [booking.start_time for booking in bookings] + [start_time for start_time, _ in originals.values()]
+    )
+    invalidate_specialist_feeds(
+        {booking.specialist_id for booking in bookings} | {specialist_id for _, specialist_id in originals.values()}
+    )
+
+    if deleted:
+        record_schedule_removals([(booking.specialist_id, booking.id) for booking in bookings], reason='deleted')
+    else:
+        record_schedule_removals(
+            [
+                (originals[booking.id][1], booking.id)
+                for booking in bookings
+                if booking.id in originals and originals[booking.id][1] not in (None, booking.specialist_id)
+            ],
+            reason='reassigned',
+        )
+
+    if notify and not deleted:
+        _enqueue_notifications(bookings, created, system_settings)
+
+
+def _enqueue_notifications(bookings, created, system_settings):
+    """
+    Письма специалистам: в режиме 'immediate' - отдельное письмо на каждое новое
+    бронирование, в режимах сводки новые и измененные бронирования копятся в одно письмо.
+    Само письмо отправляется после коммита транзакции (см. notification_utils).
+    """
+    try:
+        system_settings = system_settings or SystemSettings.get_solo()
+        if not system_settings.send_email_notifications:
+            logger.debug("Email notifications are disabled in system settings")
+            return
+        if system_settings.notification_mode != SystemSettings.NOTIFICATION_IMMEDIATE:
+            enqueue_changed_bookings_digest(bookings, system_settings, created=created)
+        elif created:
+            for booking in bookings:
+                enqueue_booking_notification(booking)
+    except Exception as e:
+        # Не прерываем сохранение, если письмо не удалось поставить в очередь
+        booking_ids = [booking.id for booking in bookings]
+        logger.error(f"Error queueing email notifications for bookings {booking_ids[:10]}: {e}", exc_info=True)
@@ -1,87 +1,64 @@
 """
 Сигналы Django для обработки событий моделей
 """
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
-from django.utils import timezone
-from django.conf import settings
+from django.contrib.auth.models import User
 import logging
-import json
 
-from .models import Booking, SystemSettings, DeletedBooking, BookingSeries
+from .models import (
+    Booking, SystemSettings, CalendarNote, CabinetClosure, SearchEntry, Guest,
+    Cabinet, Service, ServiceVariant, SpecialistProfile, SpecialistSchedule, ScheduleOverride, ScheduleOverrideInterval,
+)
+from .archive_utils import build_deleted_booking
+from .search_utils import index_notes, reindex_bookings, remove_from_index
+from .live_utils import notify_notes_changed, notify_closures_changed
+from .density_utils import invalidate_density_range, invalidate_all_density
+from .ical_utils import invalidate_all_feeds, invalidate_specialist_feeds
+from .schedule_utils import invalidate_working_intervals
+from .side_effect_utils import apply_booking_side_effects
 
 logger = logging.getLogger(__name__)
 
 
+# Связь бронирования с моделью и поля модели, которые входят в текст поискового индекса
+INDEXED_RELATIONS = {
+    Guest: ('guest', {'display_name'}),
+    SpecialistProfile: ('specialist', {'full_name'}),
+    Service: ('service_variant__service', {'name'}),
+    ServiceVariant: ('service_variant', {'name_suffix', 'service', 'service_id'}),
+    Cabinet: ('cabinet', {'name'}),
+}
+
+# Поля, изменение которых стоит сообщить специалисту в сводке
+NOTIFIABLE_BOOKING_FIELDS = {
+    'start_time', 'end_time', 'specialist', 'specialist_id', 'cabinet', 'cabinet_id',
+    'service_variant', 'service_variant_id', 'status', 'guest_name', 'guest_room_number', 'comment',
+}
+
+
 @receiver(post_save, sender=Booking)
-def send_booking_notification(sender, instance, created, **kwargs):
+def apply_saved_booking_effects(sender, instance, created, update_fields=None, **kwargs):
     """
-    Отправляет email-уведомление специалисту при создании нового бронирования
+    Индекс, метрики, календари, кэши и письма после сохранения бронирования
+    (см. side_effect_utils). При переносе учитываются прежние день и специалист.
     """
-    # Отправляем уведомление только при создании нового бронирования
+    originals = None
     if not created:
-        return
-    
-    # Проверяем настройки системы
-    try:
-        system_settings = SystemSettings.get_solo()
-        if not system_settings.send_email_notifications:
-            logger.debug("Email notifications are disabled in system settings")
-            return
-    except Exception as e:
-        logger.error(f"Error getting system settings: {e}")
-        return
-    
-    # Проверяем, есть ли email у специалиста
-    specialist = instance.specialist
-    user = specialist.user
-    
-    if not user.email:
-        logger.debug(f"Specialist {specialist.full_name} has no email address")
-        return
-    
-    try:
-        # Форматируем дату и время для письма
-        local_start = timezone.localtime(instance.start_time)
-        local_end = timezone.localtime(instance.end_time)
-        
-        # Подготовка контекста для шаблона
-        context = {
-            'specialist_name': specialist.full_name,
-            'guest_name': instance.guest_name,
-            'guest_room': instance.guest_room_number or 'Не указан',
-            'service_name': instance.service_variant.service.name,
-            'service_variant': instance.service_variant.name_suffix,
-            'cabinet_name': instance.cabinet.name,
-            'start_time': local_start.strftime('%d.%m.%Y в %H:%M'),
-            'end_time': local_end.strftime('%H:%M'),
-            'date': local_start.strftime('%d.%m.%Y'),
-            'time_range': f"{local_start.strftime('%H:%M')} - {local_end.strftime('%H:%M')}",
-            'status': dict(Booking.STATUS_CHOICES).get(instance.status, instance.status),
-        }
-        
-        # Рендерим текст письма
-        email_subject = f'Новое бронирование на {context["date"]}'
-        email_body = render_to_string('booking/emails/new_booking_notification.txt', context)
-        email_html = render_to_string('booking/emails/new_booking_notification.html', context)
-        
-        # Отправляем email
-        send_mail(
-            subject=email_subject,
-            message=email_body,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[user.email],
-            html_message=email_html,
-            fail_silently=False,
-        )
-        
-        logger.info(f"Email notification sent to {user.email} for booking {instance.id}")
-        
-    except Exception as e:
-        logger.error(f"Error sending email notification for booking {instance.id}: {e}", exc_info=True)
-        # Не прерываем выполнение, если email не отправился
+        originals = {instance.id: (
+            getattr(instance, '_loaded_start_time', None),
+            getattr(instance, '_loaded_specialist_id', None),
+        )}
+    # Об изменении только служебных полей специалисту не пишем
+    notify = created or update_fields is None or bool(set(update_fields) & NOTIFIABLE_BOOKING_FIELDS)
+    apply_booking_side_effects([instance], originals=originals, created=created, notify=notify)
+    instance._loaded_start_time = instance.start_time
+    instance._loaded_specialist_id = instance.specialist_id
+
+
+@receiver(post_delete, sender=Booking)
+def apply_deleted_booking_effects(sender, instance, **kwargs):
+    apply_booking_side_effects([instance], deleted=True)
 
 
 # Thread-local storage для хранения текущего пользователя и причины удаления
@@ -127,56 +104,13 @@ def log_deleted_booking(sender, instance, **kwargs):
     Логирует удаленное бронирование перед его удалением из базы данных.
     """
     try:
-        # Получаем данные бронирования
-        booking_data = {
-            'guest_name': instance.guest_name,
-            'guest_room_number': instance.guest_room_number,
-            'service_variant_id': instance.service_variant_id,
-            'service_variant_name': str(instance.service_variant),
-            'specialist_id': instance.specialist_id,
-            'specialist_name': instance.specialist.full_name if instance.specialist else None,
-            'cabinet_id': instance.cabinet_id,
-            'cabinet_name': instance.cabinet.name if instance.cabinet else None,
-            'start_time': instance.start_time.isoformat() if instance.start_time else None,
-            'end_time': instance.end_time.isoformat() if instance.end_time else None,
-            'status': instance.status,
-            'created_by_id': instance.created_by_id,
-            'created_by_username': instance.created_by.username if instance.created_by else None,
-            'series_id': instance.series_id,
-            'sequence': instance.sequence,
-        }
-
-        # Получаем данные серии, если есть
-        series_data = None
-        if instance.series:
-            series = instance.series
-            series_data = {
-                'id': series.id,
-                'start_time': series.start_time.isoformat() if series.start_time else None,
-                'frequency': series.frequency,
-                'interval': series.interval,
-                'occurrence_count': series.occurrence_count,
-                'end_date': series.end_date.isoformat() if series.end_date else None,
-                'weekdays': series.weekdays,
-                'excluded_dates': [d.isoformat() if isinstance(d, type(timezone.now().date())) else str(d) for d in (series.excluded_dates or [])],
-                'created_by_id': series.created_by_id,
-            }
-
         # Получаем пользователя и причину удаления из thread-local storage
-        deleted_by = get_current_user()
-        deletion_reason = get_deletion_reason()
-        deletion_scope = get_deletion_scope()
-
-        # Создаем запись в архиве удаленных бронирований
-        DeletedBooking.objects.create(
-            original_id=instance.id,
-            booking_data=booking_data,
-            series_id=instance.series_id if instance.series else None,
-            series_data=series_data,
-            deleted_by=deleted_by,
-            deletion_reason=deletion_reason,
-            deletion_scope=deletion_scope,
-        )
+        build_deleted_booking(
+            instance,
+            deleted_by=get_current_user(),
+            deletion_reason=get_deletion_reason(),
+            deletion_scope=get_deletion_scope(),
+        ).save()
 
         logger.info(f"Booking {instance.id} logged to DeletedBooking archive before deletion")
 
@@ -184,3 +118,100 @@ def log_deleted_booking(sender, instance, **kwargs):
         logger.error(f"Error logging deleted booking {instance.id}: {e}", exc_info=True)
         # Не прерываем удаление, если логирование не удалось
 
+
+@receiver(post_save, sender=CalendarNote)
+def update_note_search_entry(sender, instance, **kwargs):
+    """Обновляет поисковый индекс при сохранении технической записи."""
+    try:
+        index_notes([instance])
+    except Exception as e:
+        logger.error(f"Error indexing calendar note {instance.id}: {e}", exc_info=True)
+
+
+@receiver(post_save, sender=Guest)
+@receiver(post_save, sender=SpecialistProfile)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=ServiceVariant)
+@receiver(post_save, sender=Cabinet)
+def reindex_related_bookings(sender, instance, created=False, update_fields=None, **kwargs):
+    """Переименование гостя, специалиста, услуги или кабинета меняет текст записей индекса его бронирований."""
+    lookup, indexed_fields = INDEXED_RELATIONS[sender]
+    if created or (update_fields is not None and not set(update_fields) & indexed_fields):
+        return
+    try:
+        reindex_bookings(Booking.objects.filter(**{lookup: instance}))
+    except Exception as e:
+        logger.error(f"Error reindexing bookings of {sender.__name__} {instance.pk}: {e}", exc_info=True)
+
+
+@receiver(post_delete, sender=CalendarNote)
+def remove_note_search_entry(sender, instance, **kwargs):
+    remove_from_index(SearchEntry.KIND_NOTE, [instance.id])
+
+
+@receiver(post_save, sender=CalendarNote)
+@receiver(post_delete, sender=CalendarNote)
+def publish_note_change(sender, instance, **kwargs):
+    notify_notes_changed([instance.id])
+
+
+@receiver(post_save, sender=CabinetClosure)
+@receiver(post_delete, sender=CabinetClosure)
+def publish_closure_change(sender, instance, **kwargs):
+    notify_closures_changed([instance.id])
+
+
+@receiver(post_save, sender=Cabinet)
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=ServiceVariant)
+def invalidate_all_ical_feeds(sender, **kwargs):
+    """Названия кабинетов и услуг входят в LOCATION и SUMMARY событий всех лент .ics."""
+    invalidate_all_feeds()
+
+
+@receiver(post_save, sender=SpecialistProfile)
+def invalidate_specialist_ical_feed(sender, instance, **kwargs):
+    """Имя специалиста - название календаря в его ленте .ics; смена токена тоже сбрасывает ленту."""
+    invalidate_specialist_feeds([instance.id])
+
+
+@receiver(post_save, sender=User)
+def invalidate_inactive_user_ical_feed(sender, instance, **kwargs):
+    """Лента отключенного пользователя не должна оставаться в кэше (см. get_specialist_id_for_token)."""
+    if not instance.is_active:
+        invalidate_specialist_feeds(SpecialistProfile.objects.filter(user=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=CabinetClosure)
+@receiver(post_delete, sender=CabinetClosure)
+def invalidate_closure_density(sender, instance, created=False, **kwargs):
+    if kwargs.get('signal') is post_save and not created:
+        # Период закрытия могли сдвинуть - прежние дни неизвестны
+        invalidate_all_density()
+    else:
+        invalidate_density_range(instance.start_time, instance.end_time)
+
+
+@receiver(post_save, sender=SpecialistSchedule)
+@receiver(post_delete, sender=SpecialistSchedule)
+@receiver(post_save, sender=ScheduleOverride)
+@receiver(post_delete, sender=ScheduleOverride)
+@receiver(post_save, sender=ScheduleOverrideInterval)
+@receiver(post_delete, sender=ScheduleOverrideInterval)
+@receiver(post_save, sender=SystemSettings)
+@receiver(post_save, sender=Cabinet)
+@receiver(post_save, sender=ServiceVariant)
+def invalidate_all_density_on_change(sender, **kwargs):
+    """Графики, часы работы SPA, кабинеты и длительности влияют на плотность всех дней."""
+    invalidate_all_density()
+
+
+@receiver(post_save, sender=SpecialistSchedule)
+@receiver(post_delete, sender=SpecialistSchedule)
+@receiver(post_save, sender=ScheduleOverride)
+@receiver(post_delete, sender=ScheduleOverride)
+@receiver(post_save, sender=ScheduleOverrideInterval)
+@receiver(post_delete, sender=ScheduleOverrideInterval)
+def invalidate_working_intervals_on_change(sender, **kwargs):
+    """Графики и исключения из них определяют интервалы работы (schedule_utils)."""
+    invalidate_working_intervals()
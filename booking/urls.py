@@ -1,6 +1,7 @@
 """
 URL configuration for booking app
 """
+from django.conf import settings
 from django.urls import path
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
@@ -12,20 +13,32 @@ from . import views, api_views
 
 logger = logging.getLogger(__name__)
 
+# Под ASGI read-only JSON-эндпоинты обслуживают async-версии (см. async_views.py)
+if getattr(settings, 'ASYNC_VIEWS_ENABLED', False):
+    from . import async_views
+    feed_views = async_views
+    schedule_api_view = async_views.my_schedule_view
+    guest_autocomplete_view = async_views.guest_autocomplete_view
+else:
+    feed_views = views
+    schedule_api_view = api_views.MyScheduleAPI.as_view()
+    guest_autocomplete_view = api_views.guest_autocomplete_view
+
 urlpatterns = [
     path('', views.index_view, name='index'),
     path('register/specialist/', views.specialist_register_view, name='specialist_register'),
     path('calendar/', views.calendar_view, name='calendar'),
     path('calendar/specialists/', views.specialists_overview_view, name='specialists_overview'),
-    path('calendar/feed/', views.calendar_feed_view, name='calendar_feed'),
-    path('calendar/closures/', views.cabinet_closure_feed_view, name='calendar_closure_feed'),
+    path('calendar/feed/', feed_views.calendar_feed_view, name='calendar_feed'),
+    path('calendar/density/', feed_views.calendar_density_view, name='calendar_density'),
+    path('calendar/closures/', feed_views.cabinet_closure_feed_view, name='calendar_closure_feed'),
     path('calendar/closures/create/', views.create_cabinet_closure_view, name='create_cabinet_closure'),
     path('calendar/closures/<int:pk>/delete/', views.delete_cabinet_closure_view, name='delete_cabinet_closure'),
     path('calendar/notes/create/', views.create_calendar_note_view, name='create_calendar_note'),
     path('calendar/notes/<int:pk>/edit/', views.edit_calendar_note_view, name='edit_calendar_note'),
     path('calendar/notes/<int:pk>/delete/', views.delete_calendar_note_view, name='delete_calendar_note'),
-    path('calendar/resources/specialists/', views.specialist_resources_view, name='specialist_resources'),
-    path('calendar/resources/cabinets/', views.cabinet_resources_view, name='cabinet_resources'),
+    path('calendar/resources/specialists/', feed_views.specialist_resources_view, name='specialist_resources'),
+    path('calendar/resources/cabinets/', feed_views.cabinet_resources_view, name='cabinet_resources'),
     path('api/specialists-for-service/', views.get_specialists_for_service_view, name='specialists_for_service'),
     path('api/available-cabinets/', views.get_available_cabinets_view, name='available_cabinets'),
     path('select-service/', views.select_service_view, name='select_service'),
@@ -34,10 +47,12 @@ urlpatterns = [
     path('booking/quick-create/', views.quick_create_booking_view, name='quick_create_booking'),
     path('booking/duplicate/', views.duplicate_booking_view, name='duplicate_booking'),
     path('booking/update-time/', views.update_booking_time_view, name='update_booking_time'),
+    path('booking/bulk/', views.bulk_booking_operations_view, name='bulk_booking_operations'),
     path('booking/<int:pk>/', views.booking_detail_view, name='booking_detail'),
     path('booking/<int:pk>/validate/', views.validate_booking_edit_view, name='validate_booking_edit'),
     path('booking/<int:pk>/logs/', views.booking_logs_view, name='booking_logs'),
     path('booking/<int:pk>/delete/', views.BookingDeleteView.as_view(), name='booking_delete'),
+    path('search/', views.search_view, name='search'),
     path('manage-schedules/', views.manage_schedules_view, name='manage_schedules'),
     path('schedules/copy/', views.copy_schedule_view, name='copy_schedule'),
     path('schedules/apply-template/', views.apply_template_view, name='apply_template'),
@@ -46,6 +61,8 @@ urlpatterns = [
     path('reports/download-guest/', views.download_guest_report_view, name='download_guest_report'),
     path('reports/merge-guests-db/', views.merge_guests_in_db_view, name='merge_guests_in_db'),
     path('my-schedule/', views.my_schedule_view, name='my_schedule'),
+    path('my-schedule/calendar/reset/', views.reset_calendar_token_view, name='reset_calendar_token'),
+    path('ics/<str:token>/schedule.ics', views.specialist_calendar_ics_view, name='specialist_calendar_ics'),
     
     # Deleted bookings
     path('deleted-bookings/', views.deleted_bookings_view, name='deleted_bookings'),
@@ -54,9 +71,13 @@ urlpatterns = [
     path('deleted-bookings/<int:pk>/delete/', views.permanently_delete_view, name='permanently_delete'),
     
     # API endpoints
-    path('api/v1/my-schedule/', api_views.MyScheduleAPI.as_view(), name='api_my_schedule'),
-    path('api/v1/guests/autocomplete/', api_views.guest_autocomplete_view, name='api_guest_autocomplete'),
+    path('api/v1/my-schedule/', schedule_api_view, name='api_my_schedule'),
+    path('api/v1/guests/autocomplete/', guest_autocomplete_view, name='api_guest_autocomplete'),
     path('api/v1/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/v1/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
 ]
 
+
+# Живое обновление календаря (SSE) держит соединение открытым - только под ASGI
+if getattr(settings, 'LIVE_UPDATES_ENABLED', False):
+    urlpatterns.append(path('calendar/stream/', async_views.calendar_stream_view, name='calendar_stream'))
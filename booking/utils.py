@@ -3,18 +3,56 @@
 """
 from django.db.models import Q
 from django.utils import timezone
+import bisect
 import datetime
 from .models import (
     ServiceVariant,
-    SpecialistSchedule,
     Booking,
     SystemSettings,
     Cabinet,
     SpecialistProfile,
     CabinetClosure,
 )
+from .metrics import timed
+from .schedule_utils import get_working_intervals, is_within_working_hours, local_date
 
 
+def _merge_intervals(intervals):
+    """Сливает пересекающиеся и смежные интервалы; результат отсортирован."""
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def _free_gaps(window_start, window_end, busy):
+    """Свободные промежутки окна [window_start, window_end) между слитыми интервалами busy."""
+    gaps = []
+    cursor = window_start
+    for busy_start, busy_end in busy:
+        if busy_end <= cursor:
+            continue
+        if busy_start >= window_end:
+            break
+        if busy_start > cursor:
+            gaps.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if cursor < window_end:
+        gaps.append((cursor, window_end))
+    return gaps
+
+
+def _is_free(busy, busy_ends, start, end):
+    """Не пересекается ли [start, end) со слитыми интервалами busy (busy_ends - их концы)."""
+    index = bisect.bisect_right(busy_ends, start)
+    return index == len(busy) or busy[index][0] >= end
+
+
+@timed('find_available_slots')
 def find_available_slots(date: datetime.date, service_variant: ServiceVariant) -> list:
     """
     Возвращает список словарей со свободными слотами.
@@ -23,6 +61,12 @@ def find_available_slots(date: datetime.date, service_variant: ServiceVariant) -
     Старый формат (для обратной совместимости): [{'start_time': datetime, 'specialist': Specialist, 'cabinet': Cabinet}, ...]
     
     Для обратной совместимости, если в слоте есть 'available_cabinets', то 'cabinet' будет равен первому доступному кабинету.
+
+    Варианты начала берутся только внутри свободных промежутков между бронями
+    специалиста в его интервалах работы: с шагом SystemSettings.slot_step_minutes
+    по сетке от начала интервала работы или, в режиме «сразу после предыдущей
+    брони», от начала каждого промежутка. Объем работы зависит от числа
+    промежутков и найденных слотов, а не от длины рабочего дня.
     
     Args:
         date: Дата для поиска слотов
@@ -36,119 +80,90 @@ def find_available_slots(date: datetime.date, service_variant: ServiceVariant) -
     settings = SystemSettings.get_solo()
     duration = service_variant.duration_minutes
     buffer = settings.buffer_time_minutes
-    total_slot_duration = duration + buffer
+    slot_length = datetime.timedelta(minutes=duration + buffer)
+    step = datetime.timedelta(minutes=max(1, settings.slot_step_minutes))
+    align_to_booking_end = settings.slot_alignment == SystemSettings.SLOT_ALIGN_BOOKING_END
     
     # 2. Находим валидных специалистов и кабинеты
     service = service_variant.service
     required_cabinet_types = service.required_cabinet_types.all()
     
-    valid_specialists = SpecialistProfile.objects.filter(services_can_perform=service)
-    valid_cabinets = Cabinet.objects.filter(
+    valid_specialists = {
+        specialist.id: specialist
+        for specialist in SpecialistProfile.objects.filter(services_can_perform=service)
+    }
+    valid_cabinets = list(Cabinet.objects.filter(
         cabinet_type__in=required_cabinet_types, 
         is_active=True
-    )
+    ).order_by('id'))
+    if not valid_specialists or not valid_cabinets:
+        return []
     
-    # 3. Находим графики работы на этот день
-    day_of_week = date.weekday()
-    schedules = SpecialistSchedule.objects.filter(
-        specialist__in=valid_specialists,
-        day_of_week=day_of_week
-    )
+    # 3. Находим интервалы работы на этот день (недельный график с учетом исключений, из кэша)
+    working_intervals = get_working_intervals([date], specialist_ids=set(valid_specialists))[date]
+    if not working_intervals:
+        return []
     
-    # 4. Получаем ВСЕ бронирования на этот день (для проверки конфликтов)
+    # 4. Занятость специалистов и кабинетов за день - одним запросом, дальше в памяти
     day_start = timezone.make_aware(datetime.datetime.combine(date, datetime.time.min))
-    day_end = timezone.make_aware(datetime.datetime.combine(date, datetime.time.max))
+    day_end = day_start + datetime.timedelta(days=1)
     
-    existing_bookings = Booking.objects.filter(
-        start_time__range=(day_start, day_end),
-        status='confirmed'
-    ).select_related('specialist', 'cabinet')
-
-    closures = CabinetClosure.objects.filter(
-        cabinet__in=valid_cabinets,
+    busy_by_specialist = {}
+    busy_by_cabinet = {cabinet.id: [] for cabinet in valid_cabinets}
+    for specialist_id, cabinet_id, start_time, end_time in Booking.objects.filter(
         start_time__lt=day_end,
         end_time__gt=day_start,
-    ).select_related('cabinet')
-    closures_by_cabinet = {}
-    for closure in closures:
-        closures_by_cabinet.setdefault(closure.cabinet_id, []).append(closure)
+        status='confirmed'
+    ).values_list('specialist_id', 'cabinet_id', 'start_time', 'end_time'):
+        busy_by_specialist.setdefault(specialist_id, []).append((start_time, end_time))
+        if cabinet_id in busy_by_cabinet:
+            busy_by_cabinet[cabinet_id].append((start_time, end_time))
     
-    # 5. Генерируем "сетку" времени (напр., с шагом 15 мин)
-    time_increment = 15  # Шаг проверки
-    available_slots = []
+    for cabinet_id, start_time, end_time in CabinetClosure.objects.filter(
+        cabinet_id__in=list(busy_by_cabinet),
+        start_time__lt=day_end,
+        end_time__gt=day_start,
+    ).values_list('cabinet_id', 'start_time', 'end_time'):
+        busy_by_cabinet[cabinet_id].append((start_time, end_time))
     
-    # Используем словарь для группировки слотов по времени и специалисту
-    slots_dict = {}
+    cabinet_busy = []
+    for cabinet in valid_cabinets:
+        busy = _merge_intervals(busy_by_cabinet[cabinet.id])
+        cabinet_busy.append((cabinet, busy, [end for _, end in busy]))
     
-    for schedule in schedules:
-        specialist = schedule.specialist
-        current_time = schedule.start_time
-        
-        # Создаем начальное время для итерации
-        slot_datetime_start = timezone.make_aware(
-            datetime.datetime.combine(date, current_time)
-        )
-        slot_datetime_end = slot_datetime_start + datetime.timedelta(minutes=total_slot_duration)
+    # 5. Варианты начала - только в свободных промежутках специалиста
+    available_slots = []
+    for specialist_id, intervals in sorted(working_intervals.items()):
+        specialist = valid_specialists[specialist_id]
+        specialist_busy = _merge_intervals(busy_by_specialist.get(specialist_id, ()))
         
-        while slot_datetime_end.time() <= schedule.end_time:
-            
-            # 6. Проверка: Свободен ли специалист?
-            is_specialist_busy = existing_bookings.filter(
-                specialist=specialist,
-                start_time__lt=slot_datetime_end,
-                end_time__gt=slot_datetime_start
-            ).exists()
-            
-            if not is_specialist_busy:
-                # 7. Находим все доступные кабинеты для этого слота
-                # Находим кабинеты, занятые в этот слот КЕМ УГОДНО
-                busy_cabinets_ids = set(existing_bookings.filter(
-                    start_time__lt=slot_datetime_end,
-                    end_time__gt=slot_datetime_start
-                ).values_list('cabinet_id', flat=True))
-
-                for cabinet_id, cabinet_closures in closures_by_cabinet.items():
-                    for closure in cabinet_closures:
-                        if closure.start_time < slot_datetime_end and closure.end_time > slot_datetime_start:
-                            busy_cabinets_ids.add(cabinet_id)
-                            break
-
-                # Находим все свободные кабинеты нужного типа
-                available_cabinets = list(valid_cabinets.exclude(id__in=list(busy_cabinets_ids)))
+        for work_start, work_end in _merge_intervals(intervals):
+            for gap_start, gap_end in _free_gaps(work_start, work_end, specialist_busy):
+                if gap_end - gap_start < slot_length:
+                    continue
+                if align_to_booking_end:
+                    slot_start = gap_start
+                else:
+                    # Ближайшее деление сетки (от начала интервала работы) не раньше начала промежутка
+                    steps = -((work_start - gap_start) // step)
+                    slot_start = work_start + steps * step
                 
-                if available_cabinets:
-                    # Создаем ключ для группировки: время + специалист
-                    slot_key = (slot_datetime_start, specialist.id)
-                    
-                    # Если слот с таким временем и специалистом уже есть, объединяем кабинеты
-                    if slot_key in slots_dict:
-                        # Объединяем списки кабинетов, убирая дубликаты
-                        existing_cabinets = slots_dict[slot_key]['available_cabinets']
-                        all_cabinets = existing_cabinets + available_cabinets
-                        # Убираем дубликаты, сохраняя порядок
-                        unique_cabinets = []
-                        seen_ids = set()
-                        for cab in all_cabinets:
-                            if cab.id not in seen_ids:
-                                unique_cabinets.append(cab)
-                                seen_ids.add(cab.id)
-                        slots_dict[slot_key]['available_cabinets'] = unique_cabinets
-                    else:
-                        # Создаем новый слот
-                        slots_dict[slot_key] = {
-                            'start_time': slot_datetime_start,
+                while slot_start + slot_length <= gap_end:
+                    slot_end = slot_start + slot_length
+                    # 6. Свободные кабинеты нужного типа (брони и закрытия)
+                    available_cabinets = [
+                        cabinet for cabinet, busy, busy_ends in cabinet_busy
+                        if _is_free(busy, busy_ends, slot_start, slot_end)
+                    ]
+                    if available_cabinets:
+                        available_slots.append({
+                            'start_time': slot_start,
                             'specialist': specialist,
                             'available_cabinets': available_cabinets,
                             # Для обратной совместимости добавляем первый кабинет
-                            'cabinet': available_cabinets[0] if available_cabinets else None
-                        }
-            
-            # Двигаемся к следующему слоту
-            slot_datetime_start += datetime.timedelta(minutes=time_increment)
-            slot_datetime_end = slot_datetime_start + datetime.timedelta(minutes=total_slot_duration)
-    
-    # Конвертируем словарь в список
-    available_slots = list(slots_dict.values())
+                            'cabinet': available_cabinets[0],
+                        })
+                    slot_start += step
     
     # Сортируем по времени начала
     available_slots.sort(key=lambda x: x['start_time'])
@@ -156,6 +171,7 @@ def find_available_slots(date: datetime.date, service_variant: ServiceVariant) -
     return available_slots
 
 
+@timed('check_booking_conflicts')
 def check_booking_conflicts(start_time, service_variant, specialist, cabinet, exclude_booking_id=None):
     """
     Проверяет конфликты для указанного времени, специалиста, кабинета и услуги.
@@ -195,27 +211,13 @@ def check_booking_conflicts(start_time, service_variant, specialist, cabinet, ex
         # Это не конфликт, но может быть проблемой - не обрабатываем здесь
         pass
     
-    # Проверяем график работы специалиста
-    date = timezone.localtime(start_time).date()
-    day_of_week = date.weekday()
-    local_start_time = timezone.localtime(start_time).time()
-    
-    schedule = SpecialistSchedule.objects.filter(
-        specialist=specialist,
-        day_of_week=day_of_week
-    ).first()
-    
-    if not schedule:
+    # Проверяем график работы специалиста: бронирование целиком внутри одного интервала работы.
+    # Графики читаем из базы, а не из кэша: сброс кэша может не дойти до этого воркера
+    working_intervals = get_working_intervals(
+        [local_date(start_time)], specialist_ids={specialist.id}, use_cache=False
+    )
+    if not is_within_working_hours(working_intervals, specialist.id, start_time, end_time):
         conflicts['specialist_not_available'] = True
-    else:
-        # Проверяем что время начала входит в рабочие часы
-        if local_start_time < schedule.start_time:
-            conflicts['specialist_not_available'] = True
-        else:
-            # Проверяем что время окончания не выходит за рабочие часы
-            local_end_time = timezone.localtime(end_time).time()
-            if local_end_time > schedule.end_time:
-                conflicts['specialist_not_available'] = True
     
     # Проверяем что кабинет активен
     if not cabinet.is_active:
@@ -258,3 +260,136 @@ def check_booking_conflicts(start_time, service_variant, specialist, cabinet, ex
     else:
         return None
 
+
+
+@timed('check_booking_conflicts_bulk')
+def check_booking_conflicts_bulk(candidates, exclude_booking_ids=None):
+    """
+    Пакетная версия check_booking_conflicts для списка бронирований.
+
+    Интервалы работы специалистов (schedule_utils), закрытия кабинетов и пересекающиеся
+    бронирования загружаются на весь список сразу (постоянное число запросов), дальше
+    проверка идет в памяти по тем же правилам, что и check_booking_conflicts.
+    Подтвержденные кандидаты без конфликтов занимают время для следующих,
+    как если бы их сохраняли по одному.
+
+    Args:
+        candidates: список словарей с ключами start_time, service_variant,
+            specialist, cabinet и необязательным status (по умолчанию 'confirmed')
+        exclude_booking_ids: ID бронирований, которые не учитываются при проверке
+
+    Returns:
+        list: для каждого кандидата словарь конфликтов (формат check_booking_conflicts) или None
+    """
+    if not candidates:
+        return []
+
+    settings = SystemSettings.get_solo()
+    buffer = settings.buffer_time_minutes
+
+    intervals = []
+    for candidate in candidates:
+        start_time = candidate['start_time']
+        total_duration = candidate['service_variant'].duration_minutes + buffer
+        intervals.append((start_time, start_time + datetime.timedelta(minutes=total_duration)))
+
+    range_start = min(start for start, _ in intervals)
+    range_end = max(end for _, end in intervals)
+    specialist_ids = {candidate['specialist'].id for candidate in candidates}
+    cabinet_ids = {candidate['cabinet'].id for candidate in candidates}
+
+    # Как и в check_booking_conflicts, графики читаем из базы в обход кэша
+    working_intervals = get_working_intervals(
+        {local_date(start_time) for start_time, _ in intervals}, specialist_ids=specialist_ids, use_cache=False
+    )
+
+    overlapping_bookings = Booking.objects.filter(
+        Q(specialist_id__in=specialist_ids) | Q(cabinet_id__in=cabinet_ids),
+        start_time__lt=range_end,
+        end_time__gt=range_start,
+        status='confirmed',
+    )
+    if exclude_booking_ids:
+        overlapping_bookings = overlapping_bookings.exclude(id__in=list(exclude_booking_ids))
+
+    busy_by_specialist = {}
+    busy_by_cabinet = {}
+    for specialist_id, cabinet_id, start_time, end_time in overlapping_bookings.values_list(
+        'specialist_id', 'cabinet_id', 'start_time', 'end_time'
+    ):
+        busy_by_specialist.setdefault(specialist_id, []).append((start_time, end_time))
+        busy_by_cabinet.setdefault(cabinet_id, []).append((start_time, end_time))
+
+    closures_by_cabinet = {}
+    for cabinet_id, start_time, end_time in CabinetClosure.objects.filter(
+        cabinet_id__in=cabinet_ids,
+        start_time__lt=range_end,
+        end_time__gt=range_start,
+    ).values_list('cabinet_id', 'start_time', 'end_time'):
+        closures_by_cabinet.setdefault(cabinet_id, []).append((start_time, end_time))
+
+    def overlaps(busy_intervals, start_time, end_time):
+        return any(busy_start < end_time and busy_end > start_time for busy_start, busy_end in busy_intervals)
+
+    results = []
+    for candidate, (start_time, end_time) in zip(candidates, intervals):
+        specialist = candidate['specialist']
+        cabinet = candidate['cabinet']
+        conflicts = {
+            'specialist_busy': False,
+            'cabinet_busy': False,
+            'specialist_not_available': False,
+            'cabinet_not_available': False
+        }
+
+        if not is_within_working_hours(working_intervals, specialist.id, start_time, end_time):
+            conflicts['specialist_not_available'] = True
+
+        if not cabinet.is_active:
+            conflicts['cabinet_not_available'] = True
+
+        if overlaps(busy_by_specialist.get(specialist.id, ()), start_time, end_time):
+            conflicts['specialist_busy'] = True
+        if overlaps(busy_by_cabinet.get(cabinet.id, ()), start_time, end_time):
+            conflicts['cabinet_busy'] = True
+
+        if not conflicts['cabinet_not_available']:
+            if overlaps(closures_by_cabinet.get(cabinet.id, ()), start_time, end_time):
+                conflicts['cabinet_not_available'] = True
+
+        if any(conflicts.values()):
+            results.append(conflicts)
+            continue
+
+        results.append(None)
+        if candidate.get('status', 'confirmed') == 'confirmed':
+            busy_by_specialist.setdefault(specialist.id, []).append((start_time, end_time))
+            busy_by_cabinet.setdefault(cabinet.id, []).append((start_time, end_time))
+
+    return results
+
+
+def detect_occurrence_conflicts(occurrences, service_variant, specialist, cabinet, exclude_ids=None):
+    """
+    Проверяет конфликты для списка дат одним пакетным проходом (check_booking_conflicts_bulk).
+
+    exclude_ids - бронирования, которые заменяются повторениями (редактирование серии):
+    они не учитываются ни для одного повторения.
+    """
+    results = check_booking_conflicts_bulk(
+        [
+            {
+                'start_time': start_dt,
+                'service_variant': service_variant,
+                'specialist': specialist,
+                'cabinet': cabinet,
+            }
+            for start_dt in occurrences
+        ],
+        exclude_booking_ids=exclude_ids,
+    )
+    return [
+        (index, start_dt, conflicts)
+        for index, (start_dt, conflicts) in enumerate(zip(occurrences, results), start=1)
+        if conflicts
+    ]
@@ -1,7 +1,9 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.http import HttpResponse, JsonResponse
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_POST, require_safe
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views.generic import DeleteView
 from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
@@ -12,6 +14,7 @@ from django.utils import timezone
 from django.contrib import messages
 from django.template.loader import render_to_string
 import datetime
+import json
 import logging
 import csv
 from decimal import Decimal
@@ -30,13 +33,27 @@ from .models import (
     SystemSettings,
     DeletedBooking,
     BookingLog,
+    SearchEntry,
     Guest,
 )
 from .decorators import admin_required, specialist_required, staff_required
-from .utils import find_available_slots, check_booking_conflicts
+from .utils import (
+    find_available_slots, check_booking_conflicts, check_booking_conflicts_bulk, detect_occurrence_conflicts,
+)
+from .schedule_utils import apply_schedule_template, upsert_weekly_schedules
+from .cabinet_utils import assign_cabinets, assign_cabinets_or_least_busy, get_valid_cabinets
+from .bulk_utils import BulkOperationError, apply_bulk_operations, parse_operations
+from .ical_utils import get_specialist_feed, get_specialist_id_for_token
 from .restore_utils import restore_booking, restore_series, check_restore_conflicts
 from .signals import set_current_user, clear_thread_locals
-from .log_utils import log_booking_action, get_booking_changes
+from .archive_utils import archive_and_delete_series
+from .log_utils import log_booking_action, get_booking_changes, buffered_booking_logs
+from .pagination_utils import keyset_paginate, estimate_count
+from .search_utils import search as search_index
+from .metrics import timed, render_metrics
+from .db_routers import use_replica
+from .live_utils import live_updates_enabled, notify_bookings_changed
+from .density_utils import MAX_DAYS as DENSITY_MAX_DAYS, days_in_window, get_density
 from .forms import (
     QuickBookingForm,
     SelectServiceForm,
@@ -78,25 +95,18 @@ def build_series_from_payload(start_time, recurrence_payload, *, created_by=None
     return target_series
 
 
-def detect_occurrence_conflicts(occurrences, service_variant, specialist, cabinet, exclude_ids=None):
+def pick_cabinets(occurrences, service_variant, cabinet, valid_cabinets):
     """
-    Проверяет конфликты для списка дат.
+    Кабинет для каждого повторения: выбранный вручную или подобранный по занятости.
+
+    Returns:
+        list: пары (кабинет, свободен ли он). Если свободного кабинета нет, берется
+        наименее конфликтующий: бронирование создается, а в предупреждении
+        указывается «нет свободного кабинета».
     """
-    issues = []
-    for index, start_dt in enumerate(occurrences, start=1):
-        exclude_id = None
-        if exclude_ids and index - 1 < len(exclude_ids):
-            exclude_id = exclude_ids[index - 1]
-        conflicts = check_booking_conflicts(
-            start_time=start_dt,
-            service_variant=service_variant,
-            specialist=specialist,
-            cabinet=cabinet,
-            exclude_booking_id=exclude_id
-        )
-        if conflicts:
-            issues.append((index, start_dt, conflicts))
-    return issues
+    if cabinet:
+        return [(cabinet, True)] * len(occurrences)
+    return assign_cabinets_or_least_busy(occurrences, service_variant, cabinets=valid_cabinets)
 
 
 def format_conflict_message(conflicts):
@@ -109,6 +119,8 @@ def format_conflict_message(conflicts):
         parts.append('специалист не работает')
     if conflicts.get('cabinet_not_available'):
         parts.append('кабинет недоступен')
+    if conflicts.get('no_free_cabinet'):
+        parts.append('нет свободного кабинета')
     return ', '.join(parts)
 
 
@@ -141,6 +153,13 @@ def handle_single_booking_update(booking, updated_booking, recurrence_enabled, u
     return 'Бронирование обновлено'
 
 
+def detach_series_bookings(series, before):
+    """Отвязывает от серии бронирования до before (update() без сигналов, поэтому сообщаем календарям сами)."""
+    past_qs = series.bookings.filter(start_time__lt=before)
+    notify_bookings_changed(list(past_qs.values_list('id', flat=True)))
+    past_qs.update(series=None, sequence=1)
+
+
 def handle_series_booking_update(booking, updated_booking, recurrence_payload, user):
     existing_series = booking.series
 
@@ -158,7 +177,7 @@ def handle_series_booking_update(booking, updated_booking, recurrence_payload, u
             removed_count = future_qs.count()
             future_qs.delete()
             # Отвязываем прошлые бронирования
-            existing_series.bookings.filter(start_time__lt=booking.start_time).update(series=None, sequence=1)
+            detach_series_bookings(existing_series, booking.start_time)
             existing_series.delete()
             updated_booking.series = None
             updated_booking.sequence = 1
@@ -212,7 +231,7 @@ def handle_series_booking_update(booking, updated_booking, recurrence_payload, u
 
         # Отвязываем прошлые бронирования, которые не должны входить в обновленную серию
         if existing_series:
-            existing_series.bookings.filter(start_time__lt=booking.start_time).update(series=None, sequence=1)
+            detach_series_bookings(existing_series, booking.start_time)
             existing_series.bookings.filter(start_time__gte=booking.start_time).exclude(pk=booking.pk).delete()
 
         # Обновляем текущее бронирование как первый элемент серии
@@ -317,6 +336,7 @@ def calendar_view(request):
         'note_form': note_form,
         'can_manage_notes': can_manage_notes,
         'copy_shortcuts_enabled': copy_shortcuts_enabled,
+        'live_updates_url': reverse('calendar_stream') if live_updates_enabled() else '',
     })
 
 
@@ -410,25 +430,195 @@ def my_schedule_view(request):
         'week_end': week_end,
         'total_bookings': total_bookings,
         'specialist': specialist,
-        'services': services
+        'services': services,
+        'calendar_feed_url': request.build_absolute_uri(
+            reverse('specialist_calendar_ics', args=[specialist.calendar_token])
+        ) if specialist.calendar_token else None,
     })
 
 
+@specialist_required
+@require_POST
+def reset_calendar_token_view(request):
+    """
+    Выдает специалисту новую ссылку на подписку .ics (старая перестает работать).
+    """
+    specialist = get_object_or_404(SpecialistProfile, user=request.user)
+    specialist.reset_calendar_token()
+    messages.success(request, 'Ссылка на календарь обновлена. Подпишитесь заново в календарном приложении.')
+    return redirect('my_schedule')
+
+
+@require_safe
+def specialist_calendar_ics_view(request, token):
+    """
+    Лента .ics графика специалиста по секретной ссылке (без входа в систему).
+
+    Отдается из кэша (см. ical_utils) с ETag и Last-Modified; повторный опрос
+    без изменений получает 304.
+    """
+    specialist_id = get_specialist_id_for_token(token)
+    feed = get_specialist_feed(specialist_id) if specialist_id else None
+    if feed is None:
+        return HttpResponse('Календарь не найден', status=404, content_type='text/plain; charset=utf-8')
+
+    etag = f'"{feed["etag"]}"'
+    last_modified = feed['last_modified'].timestamp()
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(feed['body'], content_type='text/calendar; charset=utf-8')
+        response['Content-Disposition'] = 'inline; filename="schedule.ics"'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Клиент каждый раз переспрашивает сервер, но с If-None-Match получает 304
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 # Calendar feed and resources
+def parse_feed_window(request):
+    """
+    Границы видимого периода из параметров start/end FullCalendar.
+
+    Returns:
+        tuple (start, end) или None, если параметры отсутствуют или некорректны
+    """
+    try:
+        start_date = timezone.datetime.fromisoformat(request.GET.get('start').replace('Z', '+00:00'))
+        end_date = timezone.datetime.fromisoformat(request.GET.get('end').replace('Z', '+00:00'))
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Invalid date format in calendar feed ({request.path}): {e}")
+        return None
+    return start_date, end_date
+
+
+def build_booking_event(b, cabinet_colors):
+    """Событие FullCalendar для бронирования (нужны service_variant, specialist, cabinet)."""
+    # Показываем клиенту "чистое" время без буфера
+    end_time = b.start_time + datetime.timedelta(minutes=b.service_variant.duration_minutes)
+
+    # Получаем цвета для кабинета
+    colors = cabinet_colors.get(b.cabinet.id, {'bg': '#3788d8', 'border': '#2e6da4', 'text': '#ffffff'})
+
+    # Формируем название с индикатором статуса, именем гостя, специалистом и услугой
+    status_icons = {
+        'unconfirmed': '? ',
+        'confirmed': '',
+        'paid': '$ ',
+        'completed': '✓ ',
+        'canceled': '✗ '
+    }
+    status_icon = status_icons.get(b.status, '')
+    # Формат: [статус] Гость - Специалист (услуга); комментарий отдаём в extendedProps и выводим в календаре отдельно
+    specialist_short = b.specialist.full_name.split()[0]  # Только имя
+    title = f"{status_icon}{b.guest_name} - {specialist_short} ({b.service_variant.name_suffix})"
+    comment_text = (b.comment or '').strip()
+
+    return {
+        'id': b.id,
+        'title': title.strip(),
+        'start': b.start_time.isoformat(),
+        'end': end_time.isoformat(),
+        'resourceId': b.specialist.id,  # Для вида "по специалистам"
+        'extendedProps': {
+            'eventType': 'booking',
+            'cabinetId': b.cabinet.id,  # Для вида "по кабинетам"
+            'status': b.status,
+            'specialist': b.specialist.full_name,
+            'cabinet': b.cabinet.name,
+            'guest_name': b.guest_name,
+            'guest_room': b.guest_room_number,
+            'comment': comment_text,
+            'seriesId': b.series_id or None
+        },
+        'backgroundColor': colors['bg'],
+        'borderColor': colors['border'],
+        'textColor': colors['text']
+    }
+
+
+def build_note_event(note):
+    """Событие FullCalendar для технической записи."""
+    raw_comment = (note.comment or '').strip()
+    title = (raw_comment[:50] + '…') if len(raw_comment) > 50 else (raw_comment or 'Техническая запись')
+    return {
+        'id': f'note-{note.pk}',
+        'title': title,
+        'start': note.start_time.isoformat(),
+        'end': note.end_time.isoformat(),
+        'extendedProps': {
+            'eventType': 'technical_note',
+            'noteId': note.pk,
+            'comment': note.comment,
+        },
+        'className': 'technical-note-event',
+        'backgroundColor': '#6c757d',
+        'borderColor': '#495057',
+        'textColor': '#ffffff'
+    }
+
+
+def build_closure_event(closure, can_delete):
+    """Событие FullCalendar для закрытия кабинета (нужен cabinet)."""
+    return {
+        'id': closure.id,
+        'title': f"Кабинет {closure.cabinet.name} закрыт",
+        'start': closure.start_time.isoformat(),
+        'end': closure.end_time.isoformat(),
+        'allDay': False,
+        'editable': False,
+        'backgroundColor': '#adb5bd',
+        'borderColor': '#6c757d',
+        'textColor': '#212529',
+        'classNames': ['cabinet-closure-event'],
+        'extendedProps': {
+            'eventType': 'closure',
+            'cabinet': closure.cabinet.name,
+            'reason': closure.reason or '',
+            'canDelete': can_delete,
+        }
+    }
+
+
+def build_density_payload(days):
+    """Ответ ленты плотности: агрегаты дней и имена ресурсов для подписей."""
+    return {
+        'days': get_density(days),
+        'specialists': {str(pk): name for pk, name in SpecialistProfile.objects.values_list('id', 'full_name')},
+        'cabinets': {str(pk): name for pk, name in Cabinet.objects.values_list('id', 'name')},
+    }
+
+
 @admin_required
+@timed('calendar_density')
+@use_replica
+def calendar_density_view(request):
+    """
+    Агрегаты по дням и ресурсам для месячного вида календаря (см. density_utils).
+    """
+    window = parse_feed_window(request)
+    if window is None:
+        return JsonResponse({'error': 'Invalid date format'}, status=400)
+    days = days_in_window(*window)
+    if not days or len(days) > DENSITY_MAX_DAYS:
+        return JsonResponse({'error': f'Период должен быть от 1 до {DENSITY_MAX_DAYS} дней'}, status=400)
+
+    response = JsonResponse(build_density_payload(days))
+    response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
+    return response
+
+
+@admin_required
+@timed('calendar_feed')
+@use_replica
 def calendar_feed_view(request):
     """
     Возвращает события для FullCalendar в формате JSON.
     """
-    start = request.GET.get('start')
-    end = request.GET.get('end')
-    
-    try:
-        start_date = timezone.datetime.fromisoformat(start.replace('Z', '+00:00'))
-        end_date = timezone.datetime.fromisoformat(end.replace('Z', '+00:00'))
-    except (ValueError, AttributeError) as e:
-        logger.error(f"Invalid date format in calendar_feed_view: {e}")
+    window = parse_feed_window(request)
+    if window is None:
         return JsonResponse({'error': 'Invalid date format'}, status=400)
+    start_date, end_date = window
     
     bookings = Booking.objects.filter(
         start_time__range=[start_date, end_date]
@@ -438,73 +628,14 @@ def calendar_feed_view(request):
     cabinets = Cabinet.objects.filter(is_active=True).order_by('id')
     cabinet_colors = generate_cabinet_colors(cabinets)
     
-    events = []
-    for b in bookings:
-        # Показываем клиенту "чистое" время без буфера
-        end_time = b.start_time + datetime.timedelta(minutes=b.service_variant.duration_minutes)
-        
-        # Получаем цвета для кабинета
-        colors = cabinet_colors.get(b.cabinet.id, {'bg': '#3788d8', 'border': '#2e6da4', 'text': '#ffffff'})
-        
-        # Формируем название с индикатором статуса, именем гостя, специалистом и услугой
-        status_icons = {
-            'unconfirmed': '? ',
-            'confirmed': '',
-            'paid': '$ ',
-            'completed': '✓ ',
-            'canceled': '✗ '
-        }
-        status_icon = status_icons.get(b.status, '')
-        # Формат: [статус] Гость - Специалист (услуга); комментарий отдаём в extendedProps и выводим в календаре отдельно
-        specialist_short = b.specialist.full_name.split()[0]  # Только имя
-        title = f"{status_icon}{b.guest_name} - {specialist_short} ({b.service_variant.name_suffix})"
-        comment_text = (b.comment or '').strip()
-        
-        events.append({
-            'id': b.id,
-            'title': title.strip(),
-            'start': b.start_time.isoformat(),
-            'end': end_time.isoformat(),
-            'resourceId': b.specialist.id,  # Для вида "по специалистам"
-            'extendedProps': {
-                'eventType': 'booking',
-                'cabinetId': b.cabinet.id,  # Для вида "по кабинетам"
-                'status': b.status,
-                'specialist': b.specialist.full_name,
-                'cabinet': b.cabinet.name,
-                'guest_name': b.guest_name,
-                'guest_room': b.guest_room_number,
-                'comment': comment_text,
-                'seriesId': b.series_id or None
-            },
-            'backgroundColor': colors['bg'],
-            'borderColor': colors['border'],
-            'textColor': colors['text']
-        })
+    events = [build_booking_event(b, cabinet_colors) for b in bookings]
 
     # Технические записи (информационные заметки)
     notes = CalendarNote.objects.filter(
         start_time__lt=end_date,
         end_time__gt=start_date
     ).order_by('start_time')
-    for note in notes:
-        raw_comment = (note.comment or '').strip()
-        title = (raw_comment[:50] + '…') if len(raw_comment) > 50 else (raw_comment or 'Техническая запись')
-        events.append({
-            'id': f'note-{note.pk}',
-            'title': title,
-            'start': note.start_time.isoformat(),
-            'end': note.end_time.isoformat(),
-            'extendedProps': {
-                'eventType': 'technical_note',
-                'noteId': note.pk,
-                'comment': note.comment,
-            },
-            'className': 'technical-note-event',
-            'backgroundColor': '#6c757d',
-            'borderColor': '#495057',
-            'textColor': '#ffffff'
-        })
+    events.extend(build_note_event(note) for note in notes)
 
     response = JsonResponse(events, safe=False)
     response['Cache-Control'] = 'no-store, no-cache, must-revalidate, max-age=0'
@@ -517,15 +648,10 @@ def cabinet_closure_feed_view(request):
     """
     Возвращает события-закрытия кабинетов для FullCalendar.
     """
-    start = request.GET.get('start')
-    end = request.GET.get('end')
-
-    try:
-        start_date = timezone.datetime.fromisoformat(start.replace('Z', '+00:00'))
-        end_date = timezone.datetime.fromisoformat(end.replace('Z', '+00:00'))
-    except (ValueError, AttributeError) as e:
-        logger.error(f"Invalid date format in cabinet_closure_feed_view: {e}")
+    window = parse_feed_window(request)
+    if window is None:
         return JsonResponse({'error': 'Invalid date format'}, status=400)
+    start_date, end_date = window
 
     closures = CabinetClosure.objects.filter(
         start_time__lt=end_date,
@@ -533,27 +659,7 @@ def cabinet_closure_feed_view(request):
     ).select_related('cabinet').order_by('start_time')
 
     can_delete = request.user.is_staff or request.user.is_superuser
-    events = []
-    for closure in closures:
-        events.append({
-            'id': closure.id,
-            'title': f"Кабинет {closure.cabinet.name} закрыт",
-            'start': closure.start_time.isoformat(),
-            'end': closure.end_time.isoformat(),
-            'allDay': False,
-            'editable': False,
-            'backgroundColor': '#adb5bd',
-            'borderColor': '#6c757d',
-            'textColor': '#212529',
-            'classNames': ['cabinet-closure-event'],
-            'extendedProps': {
-                'eventType': 'closure',
-                'cabinet': closure.cabinet.name,
-                'reason': closure.reason or '',
-                'canDelete': can_delete,
-            }
-        })
-
+    events = [build_closure_event(closure, can_delete) for closure in closures]
     return JsonResponse(events, safe=False)
 
 
@@ -684,8 +790,18 @@ def get_available_cabinets_view(request):
             logger.warning(f"No suitable cabinets for service {service_variant_id}")
             return JsonResponse({'error': 'Нет подходящих кабинетов для данной услуги'}, status=404)
         
+        # Кабинет, который будет выбран автоматически, если оставить поле пустым
+        suggested = assign_cabinets(
+            [start_datetime],
+            service_variant,
+            exclude_booking_ids=[exclude_booking_id] if exclude_booking_id and exclude_booking_id.isdigit() else None,
+        )[0]
+        
         logger.debug(f"Returning {len(cabinets_data)} suitable cabinets for service")
-        return JsonResponse({'cabinets': cabinets_data}, safe=False)
+        return JsonResponse({
+            'cabinets': cabinets_data,
+            'suggested_cabinet_id': suggested.id if suggested else None,
+        }, safe=False)
         
     except (ValueError, ServiceVariant.DoesNotExist, SpecialistProfile.DoesNotExist) as e:
         logger.error(f"Error getting available cabinets: {e}", exc_info=True)
@@ -1250,10 +1366,20 @@ def booking_logs_view(request, pk):
     booking = get_object_or_404(Booking, pk=pk)
     
     from .models import BookingLog
-    logs = BookingLog.objects.filter(booking=booking).select_related('user').order_by('-created_at')[:50]
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+    except ValueError:
+        limit = 50
+    # Пагинация по курсору (created_at, id): следующая порция - параметр after
+    page = keyset_paginate(
+        BookingLog.objects.filter(booking=booking).select_related('user'),
+        'created_at',
+        per_page=limit,
+        after=request.GET.get('after'),
+    )
     
     logs_data = []
-    for log in logs:
+    for log in page['items']:
         logs_data.append({
             'id': log.id,
             'action': log.action,
@@ -1270,7 +1396,74 @@ def booking_logs_view(request, pk):
     return JsonResponse({
         'success': True,
         'logs': logs_data,
-        'count': len(logs_data)
+        'count': len(logs_data),
+        'has_more': page['has_next'],
+        'next_cursor': page['next_cursor'],
+    })
+
+
+def metrics_view(request):
+    """
+    Метрики в текстовом формате Prometheus.
+
+    Доступ: по заголовку Authorization: Bearer <METRICS_TOKEN> или для staff.
+    """
+    from django.conf import settings as django_settings
+    token = getattr(django_settings, 'METRICS_TOKEN', '')
+    authorized = bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+    if not authorized and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponse('Forbidden', status=403, content_type='text/plain')
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+@admin_required
+def search_view(request):
+    """
+    API endpoint полнотекстового поиска по бронированиям и техническим записям.
+
+    Параметры: q - запрос, kind - booking|note (необязательно),
+    date_from / date_to - YYYY-MM-DD (по времени начала), limit - до 200.
+    """
+    query = request.GET.get('q', '').strip()
+    kind = request.GET.get('kind')
+    kinds = [kind] if kind in dict(SearchEntry.KIND_CHOICES) else None
+
+    try:
+        date_from = datetime.date.fromisoformat(request.GET['date_from']) if request.GET.get('date_from') else None
+        date_to = datetime.date.fromisoformat(request.GET['date_to']) if request.GET.get('date_to') else None
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Некорректный формат даты (нужен YYYY-MM-DD)'}, status=400)
+
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+    except ValueError:
+        limit = 50
+
+    if len(query) < 2:
+        return JsonResponse({'success': True, 'query': query, 'results': [], 'count': 0})
+
+    results = []
+    for entry in search_index(query, kinds=kinds, date_from=date_from, date_to=date_to, limit=limit):
+        if entry.kind == SearchEntry.KIND_BOOKING:
+            url = reverse('booking_detail', args=[entry.object_id])
+        else:
+            url = reverse('edit_calendar_note', args=[entry.object_id])
+        results.append({
+            'kind': entry.kind,
+            'kind_display': entry.get_kind_display(),
+            'id': entry.object_id,
+            'title': entry.title,
+            'start_time': timezone.localtime(entry.start_time).strftime('%d.%m.%Y %H:%M') if entry.start_time else None,
+            'rank': round(entry.rank, 4),
+            'url': url,
+        })
+
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'results': results,
+        'count': len(results),
     })
 
 
@@ -1312,14 +1505,13 @@ def quick_create_booking_view(request):
                             'error': 'Выбранный кабинет не подходит для данной услуги'
                         }, status=400)
                     cabinet = selected_cabinet
+                    valid_cabinets = [selected_cabinet]
                 else:
-                    # Если кабинет не выбран, берем первый подходящий кабинет для услуги
-                    cabinet = Cabinet.objects.filter(
-                        cabinet_type__in=required_cabinet_types,
-                        is_active=True
-                    ).first()
+                    # Кабинет подбирается для каждого повторения по занятости (см. cabinet_utils)
+                    cabinet = None
+                    valid_cabinets = get_valid_cabinets(service_variant)
                     
-                    if not cabinet:
+                    if not valid_cabinets:
                         return JsonResponse({
                             'error': 'Нет доступных кабинетов для данной услуги'
                         }, status=400)
@@ -1339,12 +1531,24 @@ def quick_create_booking_view(request):
                                 'error': 'Не удалось построить расписание повторов'
                             }, status=400)
 
-                        conflicts = detect_occurrence_conflicts(
-                            occurrences,
-                            service_variant=service_variant,
-                            specialist=specialist,
-                            cabinet=cabinet
-                        )
+                        occurrence_cabinets = pick_cabinets(occurrences, service_variant, cabinet, valid_cabinets)
+                        conflict_results = check_booking_conflicts_bulk([
+                            {
+                                'start_time': start_dt,
+                                'service_variant': service_variant,
+                                'specialist': specialist,
+                                'cabinet': occurrence_cabinet,
+                            }
+                            for start_dt, (occurrence_cabinet, _) in zip(occurrences, occurrence_cabinets)
+                        ])
+                        conflicts = []
+                        for index, (start_dt, (_, free), conflict_data) in enumerate(
+                            zip(occurrences, occurrence_cabinets, conflict_results), start=1
+                        ):
+                            if not free:
+                                conflict_data = {**(conflict_data or {}), 'no_free_cabinet': True}
+                            if conflict_data:
+                                conflicts.append((index, start_dt, conflict_data))
                         # Формируем предупреждение о конфликтах, но не блокируем создание
                         conflict_warning = None
                         if conflicts:
@@ -1361,14 +1565,14 @@ def quick_create_booking_view(request):
 
                         series.save()
                         created_bookings = []
-                        for index, start_dt in enumerate(occurrences, start=1):
+                        for index, (start_dt, (occurrence_cabinet, _)) in enumerate(zip(occurrences, occurrence_cabinets), start=1):
                             booking = Booking.objects.create(
                                 guest_name=guest_name,
                                 guest_room_number=guest_room_number,
                                 comment=comment,
                                 service_variant=service_variant,
                                 specialist=specialist,
-                                cabinet=cabinet,
+                                cabinet=occurrence_cabinet,
                                 start_time=start_dt,
                                 created_by=request.user,
                                 status='confirmed',
@@ -1380,15 +1584,16 @@ def quick_create_booking_view(request):
                         created_count = len(created_bookings)
                         logger.info(f"Created booking series #{series.id} with {created_count} items by {request.user.username}")
                         
-                        # Логируем создание серии
-                        for booking in created_bookings:
-                            log_booking_action(
-                                booking=booking,
-                                action='series_created',
-                                user=request.user,
-                                message=f'Создано бронирование в серии ({index} из {created_count})',
-                                request=request
-                            )
+                        # Логируем создание серии (одним INSERT после коммита)
+                        with buffered_booking_logs():
+                            for index, booking in enumerate(created_bookings, start=1):
+                                log_booking_action(
+                                    booking=booking,
+                                    action='series_created',
+                                    user=request.user,
+                                    message=f'Создано бронирование в серии ({index} из {created_count})',
+                                    request=request
+                                )
                         
                         response_data = {
                             'success': True,
@@ -1401,13 +1606,14 @@ def quick_create_booking_view(request):
                             response_data['warning'] = conflict_warning
                         return JsonResponse(response_data)
                     else:
+                        booking_cabinet, free = pick_cabinets([final_start_time], service_variant, cabinet, valid_cabinets)[0]
                         booking = Booking.objects.create(
                             guest_name=guest_name,
                             guest_room_number=guest_room_number,
                             comment=comment,
                             service_variant=service_variant,
                             specialist=specialist,
-                            cabinet=cabinet,
+                            cabinet=booking_cabinet,
                             start_time=final_start_time,
                             created_by=request.user,
                             status='confirmed'
@@ -1423,11 +1629,14 @@ def quick_create_booking_view(request):
                         )
                         
                         logger.info(f"Quick booking created: {booking.id} by {request.user.username}")
-                        return JsonResponse({
+                        response_data = {
                             'success': True,
                             'message': 'Бронирование успешно создано',
                             'booking_id': booking.id
-                        })
+                        }
+                        if not free:
+                            response_data['warning'] = f'Нет свободного кабинета, выбран наименее занятый: {booking_cabinet.name}'
+                        return JsonResponse(response_data)
                 
             except Exception as e:
                 logger.error(f"Error creating quick booking: {e}", exc_info=True)
@@ -1663,6 +1872,36 @@ def update_booking_time_view(request):
         return JsonResponse({'error': 'Ошибка при обновлении времени'}, status=500)
 
 
+@admin_required
+@require_POST
+def bulk_booking_operations_view(request):
+    """
+    Массовые операции с бронированиями через AJAX (JSON, формат - bulk_utils.parse_operations).
+
+    Все изменения применяются одной транзакцией; в ответе - результат
+    по каждому бронированию (success, changed, warning или error).
+    """
+    try:
+        payload = json.loads(request.body)
+        operations, on_conflict = parse_operations(payload)
+    except (ValueError, UnicodeDecodeError) as e:
+        message = str(e) if isinstance(e, BulkOperationError) else 'Ожидается JSON'
+        return JsonResponse({'error': message}, status=400)
+
+    try:
+        results = apply_bulk_operations(operations, request.user, on_conflict=on_conflict, request=request)
+    except Exception as e:
+        logger.error(f"Error applying bulk booking operations: {e}", exc_info=True)
+        return JsonResponse({'error': 'Ошибка при выполнении операций'}, status=500)
+
+    changed = sum(1 for result in results if result['success'] and result.get('changed'))
+    return JsonResponse({
+        'success': all(result['success'] for result in results),
+        'message': f'Изменено бронирований: {changed} из {len(results)}',
+        'results': results,
+    })
+
+
 # Delete booking view
 @method_decorator(admin_required, name='dispatch')
 class BookingDeleteView(DeleteView):
@@ -1683,6 +1922,10 @@ class BookingDeleteView(DeleteView):
             context['series_count'] = 0
         return context
 
+    def form_valid(self, form):
+        # DeleteView обрабатывает POST через form_valid, минуя delete()
+        return self.delete(self.request, *self.args, **self.kwargs)
+
     def delete(self, request, *args, **kwargs):
         self.object = self.get_object()
         booking = self.object
@@ -1701,20 +1944,12 @@ class BookingDeleteView(DeleteView):
 
         try:
             if scope == 'series' and series:
-                with transaction.atomic():
-                    count = series.bookings.count()
-                    # Логируем удаление каждого бронирования в серии
-                    for b in series.bookings.all():
-                        log_booking_action(
-                            booking=b,
-                            action='deleted',
-                            user=request.user,
-                            message=f'Удалено из серии (удалена вся серия из {count} бронирований)',
-                            request=request
-                        )
-                    # Удаляем все бронирования серии (сигнал сработает для каждого)
-                    series.bookings.all().delete()
-                    series.delete()
+                # Архив пишется одним bulk_create, бронирования удаляются без сигналов
+                count = archive_and_delete_series(
+                    series,
+                    deleted_by=request.user,
+                    deletion_reason=deletion_reason,
+                )
                 messages.success(request, f'Удалена серия из {count} бронирований')
                 return redirect(success_url)
 
@@ -1821,21 +2056,18 @@ def copy_schedule_view(request):
         target_specialist = get_object_or_404(SpecialistProfile, id=target_specialist_id)
         
         # Получаем все расписания исходного специалиста
-        source_schedules = SpecialistSchedule.objects.filter(specialist=source_specialist)
-        
-        copied_count = 0
-        for source_schedule in source_schedules:
-            # Создаем или обновляем расписание целевого специалиста
-            schedule, created = SpecialistSchedule.objects.update_or_create(
-                specialist=target_specialist,
-                day_of_week=source_schedule.day_of_week,
-                defaults={
-                    'start_time': source_schedule.start_time,
-                    'end_time': source_schedule.end_time,
-                }
-            )
-            if created or schedule.start_time != source_schedule.start_time or schedule.end_time != source_schedule.end_time:
-                copied_count += 1
+        source_days = list(
+            SpecialistSchedule.objects.filter(specialist=source_specialist)
+            .values_list('day_of_week', 'start_time', 'end_time')
+        )
+        target_days = set(
+            SpecialistSchedule.objects.filter(specialist=target_specialist)
+            .values_list('day_of_week', 'start_time', 'end_time')
+        )
+        copied_count = len(set(source_days) - target_days)
+        
+        # Создаем или обновляем расписание целевого специалиста одним запросом
+        upsert_weekly_schedules([target_specialist.id], source_days)
         
         logger.info(f"Schedule copied from {source_specialist.full_name} to {target_specialist.full_name}, {copied_count} days copied")
         
@@ -1852,29 +2084,40 @@ def copy_schedule_view(request):
 @admin_required
 def apply_template_view(request):
     """
-    Применение шаблона расписания к специалисту.
+    Применение шаблона расписания к специалисту (или нескольким: specialist_id повторяется).
+    В ответе - бронирования, которые не укладываются в новые часы работы.
     """
     if request.method != 'POST':
         return JsonResponse({'error': 'Только POST запросы'}, status=405)
     
-    specialist_id = request.POST.get('specialist_id')
+    specialist_ids = set(request.POST.getlist('specialist_id'))
     template_id = request.POST.get('template_id')
     
-    if not specialist_id or not template_id:
+    if not specialist_ids or not template_id:
         return JsonResponse({'error': 'Не указаны специалист или шаблон'}, status=400)
     
     try:
-        specialist = get_object_or_404(SpecialistProfile, id=specialist_id)
+        specialists = list(SpecialistProfile.objects.filter(id__in=specialist_ids))
+        if len(specialists) != len(specialist_ids):
+            return JsonResponse({'error': 'Специалист не найден'}, status=404)
         template = get_object_or_404(ScheduleTemplate, id=template_id)
         
-        # Применяем шаблон к специалисту
-        applied_count = template.apply_to_specialist(specialist)
+        # Применяем шаблон ко всем специалистам одной транзакцией
+        report = apply_schedule_template(template, specialists)
+        outside_hours = report['outside_hours']
         
-        logger.info(f"Template '{template.name}' applied to {specialist.full_name}, {applied_count} days applied")
+        logger.info(
+            f"Template '{template.name}' applied to {report['specialists']} specialists, "
+            f"{report['days']} days applied, {len(outside_hours)} bookings outside new hours"
+        )
         
+        message = f'Шаблон "{template.name}" успешно применен ({report["days"]} дней)'
+        if outside_hours:
+            message += f'. Вне новых часов работы: {len(outside_hours)} бронирований'
         return JsonResponse({
             'success': True,
-            'message': f'Шаблон "{template.name}" успешно применен ({applied_count} дней)'
+            'message': message,
+            'outside_hours': [booking['id'] for booking in outside_hours],
         })
         
     except Exception as e:
@@ -1884,6 +2127,8 @@ def apply_template_view(request):
 
 # Reports view
 @admin_required
+@timed('reports')
+@use_replica
 def reports_view(request):
     """
     Страница отчетов.
@@ -2148,6 +2393,8 @@ def reports_view(request):
 
 
 @admin_required
+@timed('report_csv')
+@use_replica
 def download_report_view(request):
     """
     Скачивание отчета по бронированиям в формате CSV
@@ -2239,6 +2486,8 @@ def download_report_view(request):
 
 
 @admin_required
+@timed('guest_report_csv')
+@use_replica
 def download_guest_report_view(request):
     """
     Скачивание отчета по конкретному гостю (или объединённым гостям) в формате CSV
@@ -2548,6 +2797,7 @@ def format_iso_datetime_str(iso_str):
 
 
 @admin_required
+@use_replica
 def deleted_bookings_view(request):
     """
     Список удаленных бронирований.
@@ -2569,26 +2819,71 @@ def deleted_bookings_view(request):
     search_query = request.GET.get('search', '')
     if search_query:
         deleted_bookings = deleted_bookings.filter(
-            models.Q(booking_data__guest_name__icontains=search_query) |
-            models.Q(booking_data__specialist_name__icontains=search_query) |
-            models.Q(booking_data__cabinet_name__icontains=search_query)
+            models.Q(guest_name__icontains=search_query) |
+            models.Q(specialist_name__icontains=search_query) |
+            models.Q(cabinet_name__icontains=search_query)
         )
     
-    # Пагинация
-    from django.core.paginator import Paginator
-    paginator = Paginator(deleted_bookings, 50)
-    page_number = request.GET.get('page', 1)
-    page_obj = paginator.get_page(page_number)
+    # Пагинация по курсору (deleted_at, id): глубокие страницы не дороже первой
+    page = keyset_paginate(
+        deleted_bookings,
+        'deleted_at',
+        per_page=50,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
     
     # Форматируем даты для каждого бронирования на текущей странице
-    for deleted in page_obj:
+    for deleted in page['items']:
         if deleted.booking_data and deleted.booking_data.get('start_time'):
             deleted.booking_data['start_time_formatted'] = format_iso_datetime_str(
                 deleted.booking_data['start_time']
             )
     
+    # JSON-вариант для бесконечной прокрутки
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'success': True,
+            'items': [
+                {
+                    'id': deleted.id,
+                    'original_id': deleted.original_id,
+                    'guest_name': deleted.guest_name,
+                    'guest_room_number': (deleted.booking_data or {}).get('guest_room_number', ''),
+                    'service_variant_name': (deleted.booking_data or {}).get('service_variant_name'),
+                    'specialist_name': deleted.specialist_name,
+                    'cabinet_name': deleted.cabinet_name,
+                    'start_time': (deleted.booking_data or {}).get('start_time_formatted'),
+                    'deleted_at': timezone.localtime(deleted.deleted_at).strftime('%d.%m.%Y %H:%M'),
+                    'deleted_by': deleted.deleted_by.username if deleted.deleted_by else None,
+                    'deletion_scope': deleted.deletion_scope,
+                    'restored': deleted.restored,
+                    'url': reverse('deleted_booking_detail', args=[deleted.pk]),
+                }
+                for deleted in page['items']
+            ],
+            'has_next': page['has_next'],
+            'next_cursor': page['next_cursor'],
+        })
+    
+    # Оценка общего количества для подписи (без COUNT(*) на PostgreSQL)
+    total_count, total_is_estimate = estimate_count(deleted_bookings)
+    
+    filter_params = {}
+    if search_query:
+        filter_params['search'] = search_query
+    if restored_filter:
+        filter_params['restored'] = restored_filter
+    if scope_filter:
+        filter_params['scope'] = scope_filter
+    
+    from urllib.parse import urlencode
     return render(request, 'booking/deleted_bookings_list.html', {
-        'page_obj': page_obj,
+        'page_obj': page['items'],
+        'page': page,
+        'total_count': total_count,
+        'total_is_estimate': total_is_estimate,
+        'filter_query': urlencode(filter_params),
         'restored_filter': restored_filter,
         'scope_filter': scope_filter,
         'search_query': search_query,
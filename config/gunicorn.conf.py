@@ -0,0 +1,23 @@
+"""
+Настройки gunicorn, дополняющие аргументы командной строки (см. Dockerfile).
+
+SERVER_MODE=asgi запускает те же воркеры как uvicorn (config.asgi), и
+read-only JSON-эндпоинты обслуживаются async-версиями (booking/async_views.py).
+"""
+import os
+
+# Каждый воркер держит свой пул соединений с БД (см. DATABASE_POOL_* в settings_production)
+workers = int(os.environ.get('WEB_CONCURRENCY', '3'))
+
+if os.environ.get('SERVER_MODE', 'wsgi').lower() == 'asgi':
+    wsgi_app = 'config.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'config.wsgi:application'
+
+
+def child_exit(server, worker):
+    """Убирает gauge-файлы завершившегося воркера из каталога метрик Prometheus."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
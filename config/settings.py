@@ -51,9 +51,12 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'booking.middleware.ReplicaPinningMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'booking.middleware.ErrorLoggingMiddleware',
+    'booking.middleware.QueryProfilingMiddleware',
+    'booking.middleware.MetricsMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -91,6 +94,42 @@ DATABASES = {
 }
 
 
+def replica_database_settings(primary):
+    """
+    Алиас replica для тяжелых чтений (booking.db_routers) из переменных окружения.
+
+    DATABASE_REPLICA_HOST - вторая копия Postgres (потоковая репликация);
+    DATABASE_REPLICA_SQLITE - путь к копии SQLite для локальной проверки
+    (обновляется командой sync_sqlite_replica). В тестах реплика - зеркало default.
+    """
+    if os.environ.get('DATABASE_REPLICA_HOST'):
+        return {
+            **primary,
+            'HOST': os.environ['DATABASE_REPLICA_HOST'],
+            'PORT': os.environ.get('DATABASE_REPLICA_PORT', primary.get('PORT', '5432')),
+            'NAME': os.environ.get('DATABASE_REPLICA_NAME', primary.get('NAME')),
+            'USER': os.environ.get('DATABASE_REPLICA_USER', primary.get('USER')),
+            'PASSWORD': os.environ.get('DATABASE_REPLICA_PASSWORD', primary.get('PASSWORD')),
+            'TEST': {'MIRROR': 'default'},
+        }
+    if os.environ.get('DATABASE_REPLICA_SQLITE'):
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ['DATABASE_REPLICA_SQLITE'],
+            'TEST': {'MIRROR': 'default'},
+        }
+    return None
+
+
+_replica = replica_database_settings(DATABASES['default'])
+if _replica:
+    DATABASES['replica'] = _replica
+
+DATABASE_ROUTERS = ['booking.db_routers.ReplicaRouter']
+# Сколько секунд после изменения пользователь читает с default (read-your-writes)
+REPLICA_STICKY_SECONDS = int(os.environ.get('REPLICA_STICKY_SECONDS', '5'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -146,7 +185,7 @@ LOGOUT_REDIRECT_URL = 'login'
 LOGIN_URL = 'login'
 
 # Email settings
-EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+EMAIL_BACKEND = os.environ.get('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True').lower() == 'true'
@@ -157,7 +196,78 @@ DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', EMAIL_HOST_USER)
 SERVER_EMAIL = DEFAULT_FROM_EMAIL
 
 # Для разработки - можно использовать консольный backend для тестирования
-# EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+# EMAIL_BACKEND=django.core.mail.backends.console.EmailBackend
+# (в тестах Django автоматически подменяет backend на locmem)
+
+# Очередь email-уведомлений (booking.notification_utils)
+# EMAIL_OUTBOX_DISPATCH: thread - отправка в фоновом потоке после коммита,
+# sync - сразу после коммита в том же потоке, worker - только через send_queued_emails
+EMAIL_OUTBOX_DISPATCH = os.environ.get('EMAIL_OUTBOX_DISPATCH', 'thread')
+EMAIL_OUTBOX_WORKERS = int(os.environ.get('EMAIL_OUTBOX_WORKERS', '4'))
+EMAIL_OUTBOX_BATCH_SIZE = 100
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_BACKOFF_SECONDS = 60  # 60, 120, 240... сек между попытками
+EMAIL_OUTBOX_BACKOFF_MAX_SECONDS = 3600
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 600  # письма в статусе 'sending' дольше этого времени забираются повторно
+EMAIL_OUTBOX_DIGEST_TIMER_MAX_SECONDS = 900  # более поздние сводки (ежедневные) отправляет только воркер
+
+# Хранение архива удаленных бронирований и логов (команда archive_old_records)
+ARCHIVE_RETENTION_MONTHS = int(os.environ.get('ARCHIVE_RETENTION_MONTHS', '12'))
+ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', str(BASE_DIR / 'archive'))
+
+# Профилирование SQL по запросам (booking.middleware.QueryProfilingMiddleware)
+QUERY_PROFILER_ENABLED = os.environ.get('QUERY_PROFILER_ENABLED', 'False').lower() == 'true'
+QUERY_PROFILER_SLOW_MS = int(os.environ.get('QUERY_PROFILER_SLOW_MS', '500'))
+QUERY_PROFILER_DUPLICATE_THRESHOLD = 3  # столько одинаковых запросов считаем N+1
+QUERY_PROFILER_SERVER_TIMING = True
+QUERY_PROFILER_LOG_FILE = os.environ.get('QUERY_PROFILER_LOG_FILE', str(BASE_DIR / 'logs' / 'slow_requests.jsonl'))
+QUERY_PROFILER_LOG_MAX_BYTES = 1024 * 1024 * 10  # 10MB
+QUERY_PROFILER_LOG_BACKUP_COUNT = 5
+
+# Метрики Prometheus на /metrics (booking.metrics). Под gunicorn задайте
+# PROMETHEUS_MULTIPROC_DIR, чтобы значения собирались со всех воркеров.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')  # Bearer-токен для сборщика; без него - только staff
+
+# Режим сервера: wsgi (sync-воркеры gunicorn) или asgi (uvicorn-воркеры, см. config/gunicorn.conf.py).
+# Под ASGI read-only JSON-эндпоинты обслуживают async-версии из booking/async_views.py
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi').lower()
+ASYNC_VIEWS_ENABLED = os.environ.get('ASYNC_VIEWS_ENABLED', str(SERVER_MODE == 'asgi')).lower() == 'true'
+
+# Живое обновление календаря через SSE (booking/live_utils.py). Поток держит соединение открытым,
+# поэтому включается только под ASGI; под WSGI календарь перечитывает ленту после действий.
+LIVE_UPDATES_ENABLED = ASYNC_VIEWS_ENABLED and os.environ.get('LIVE_UPDATES_ENABLED', 'True').lower() == 'true'
+LIVE_UPDATES_BUS = os.environ.get('LIVE_UPDATES_BUS', 'auto')  # auto | postgres | inprocess
+LIVE_UPDATES_MAX_PATCHES = int(os.environ.get('LIVE_UPDATES_MAX_PATCHES', '100'))
+LIVE_UPDATES_STREAM_SECONDS = int(os.environ.get('LIVE_UPDATES_STREAM_SECONDS', '600'))
+
+# Кэш приложения (агрегаты плотности календаря). При нескольких воркерах нужен общий
+# бэкенд (файловый, Redis), иначе сброс после изменения виден только одному процессу (booking.W113)
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'booking-default'),
+    }
+}
+CALENDAR_DENSITY_CACHE_SECONDS = int(os.environ.get('CALENDAR_DENSITY_CACHE_SECONDS', '600'))
+
+# Подписка специалистов на график (.ics, booking/ical_utils.py): окно ленты в днях и время жизни кэша
+ICAL_PAST_DAYS = int(os.environ.get('ICAL_PAST_DAYS', '30'))
+ICAL_FUTURE_DAYS = int(os.environ.get('ICAL_FUTURE_DAYS', '180'))
+ICAL_CACHE_SECONDS = int(os.environ.get('ICAL_CACHE_SECONDS', '86400'))
+
+# Синхронизация расписания в API (booking/schedule_sync_utils.py): сколько дней хранятся
+# записи об удалениях для updated_since и запас при переходе к следующей синхронизации
+SCHEDULE_API_SYNC_RETENTION_DAYS = int(os.environ.get('SCHEDULE_API_SYNC_RETENTION_DAYS', '30'))
+SCHEDULE_API_SYNC_OVERLAP_SECONDS = int(os.environ.get('SCHEDULE_API_SYNC_OVERLAP_SECONDS', '60'))
+
+# Интервалы работы специалистов по датам (booking/schedule_utils.py): недельный график
+# с исключениями; кэш сбрасывается сигналами при изменении графиков
+SCHEDULE_CACHE_SECONDS = int(os.environ.get('SCHEDULE_CACHE_SECONDS', '3600'))
+
+# Списки админки на больших таблицах (booking/admin_utils.py): до этого числа записей
+# по оценке PostgreSQL количество пересчитывается точно
+ADMIN_EXACT_COUNT_LIMIT = int(os.environ.get('ADMIN_EXACT_COUNT_LIMIT', '10000'))
 
 # Logging for development
 LOGGING = {
@@ -39,6 +39,16 @@ SECURE_HSTS_PRELOAD = SECURE_SSL_REDIRECT
 
 # Database
 # Поддержка работы в Docker (DATABASE_HOST может быть именем сервиса)
+#
+# По умолчанию соединения берутся из пула psycopg3, который есть в каждом
+# воркере gunicorn: всего до DATABASE_POOL_MAX_SIZE * WEB_CONCURRENCY соединений.
+# Без пула (DATABASE_POOL=False) соединение живет DATABASE_CONN_MAX_AGE секунд.
+# DATABASE_PGBOUNCER=True — для pgbouncer в режиме transaction: без server-side
+# курсоров и prepared statements.
+# Некорректные сочетания выводятся предупреждениями при старте (booking/checks.py).
+DATABASE_POOL = os.environ.get('DATABASE_POOL', 'True').lower() == 'true'
+DATABASE_PGBOUNCER = os.environ.get('DATABASE_PGBOUNCER', 'False').lower() == 'true'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.postgresql',
@@ -47,9 +57,33 @@ DATABASES = {
         'PASSWORD': os.environ.get('DATABASE_PASSWORD'),
         'HOST': os.environ.get('DATABASE_HOST', 'db'),  # 'db' - имя сервиса в docker-compose
         'PORT': os.environ.get('DATABASE_PORT', '5432'),
+        # Пул несовместим с постоянными соединениями Django
+        'CONN_MAX_AGE': 0 if DATABASE_POOL else int(os.environ.get('DATABASE_CONN_MAX_AGE', '60')),
+        # Проверка соединения перед использованием; для пула - при выдаче из пула
+        'CONN_HEALTH_CHECKS': True,
+        'DISABLE_SERVER_SIDE_CURSORS': DATABASE_PGBOUNCER,
+        'OPTIONS': {},
     }
 }
 
+if DATABASE_POOL:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.environ.get('DATABASE_POOL_MIN_SIZE', '2')),
+        'max_size': int(os.environ.get('DATABASE_POOL_MAX_SIZE', '4')),
+        'timeout': float(os.environ.get('DATABASE_POOL_TIMEOUT', '10')),  # ожидание свободного соединения, с
+        'max_idle': float(os.environ.get('DATABASE_POOL_MAX_IDLE', '300')),
+        'max_lifetime': float(os.environ.get('DATABASE_POOL_MAX_LIFETIME', '1800')),
+    }
+
+if DATABASE_PGBOUNCER:
+    # pgbouncer в режиме transaction не сохраняет prepared statements между транзакциями
+    DATABASES['default']['OPTIONS']['prepare_threshold'] = None
+
+# Реплика для отчетов и лент (DATABASE_REPLICA_HOST, см. booking/db_routers.py)
+_replica = replica_database_settings(DATABASES['default'])
+if _replica:
+    DATABASES['replica'] = _replica
+
 # Static files для Docker
 STATIC_URL = '/static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
@@ -7,6 +7,7 @@ while ! nc -z db 5432; do
 done
 echo "Database is ready!"
 
+# migrate также выполняет system checks: предупреждения о пуле соединений (booking.W1xx) видны в логе
 echo "Running migrations..."
 echo "Note: Migration 0011_add_guest_model may take several minutes on large databases"
 python manage.py migrate --noinput
@@ -17,6 +18,12 @@ python manage.py collectstatic --noinput --clear
 echo "Creating log directory..."
 mkdir -p logs
 
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+  echo "Resetting Prometheus multiprocess directory..."
+  rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+  mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
 echo "Starting Gunicorn..."
 exec "$@"
 
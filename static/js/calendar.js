@@ -15,6 +15,13 @@
     let closureCreateUrl = '';
     const closureDeleteBaseUrl = "/calendar/closures/";
     let duplicateBookingUrl = '';
+    let liveUpdatesUrl = '';
+    let densityFeedUrl = '';
+    let densityRefetchTimer = null;
+    // Виды, где вместо событий показываются агрегаты по дням (ленту плотности)
+    const DENSITY_VIEWS = ['dayGridMonth'];
+    let liveUpdatesSource = null;
+    let liveUpdatesConnected = false;
     const quickBookingFormEl = document.getElementById('quickBookingForm');
     const quickRecurrenceToggle = document.getElementById('quick_recurrence_enabled');
     const quickRecurrenceSettings = document.querySelector('[data-role="quick-recurrence-settings"]');
@@ -89,6 +96,8 @@
             noteEditUrlTemplate = calendarPage.dataset.noteEditUrl || '';
             noteDeleteUrlTemplate = calendarPage.dataset.noteDeleteUrl || '';
             duplicateBookingUrl = calendarPage.dataset.duplicateBookingUrl || '';
+            liveUpdatesUrl = calendarPage.dataset.liveUrl || '';
+            densityFeedUrl = calendarPage.dataset.densityFeedUrl || '';
         }
         
         restoreWidthMode();
@@ -107,6 +116,7 @@
         }
         attachNavigationControls();
         updateCalendarTitle();
+        initLiveUpdates();
     });
 
     function initCalendar() {
@@ -114,11 +124,13 @@
 
         const eventSources = [
             {
-                url: '/calendar/feed/',
+                id: 'bookings',
+                events: fetchBookingEvents,
             }
         ];
         if (canManageClosures) {
             eventSources.push({
+                id: 'closures',
                 url: closureFeedUrl,
                 className: 'cabinet-closure-event',
             });
@@ -186,6 +198,10 @@
             eventClick: function(info) {
                 info.jsEvent.preventDefault();
                 const eventType = info.event.extendedProps ? info.event.extendedProps.eventType : 'booking';
+                if (eventType === 'density') {
+                    calendar.changeView('timeGridDay', info.event.startStr);
+                    return;
+                }
                 if (eventType === 'closure') {
                     if (canManageClosures && info.event.extendedProps.canDelete) {
                         promptClosureDelete(info.event);
@@ -230,6 +246,10 @@
             },
             eventDidMount: function(info) {
                 const eventType = info.event.extendedProps ? info.event.extendedProps.eventType : 'booking';
+                if (eventType === 'density') {
+                    info.el.title = info.event.extendedProps.tooltip || '';
+                    return;
+                }
                 if (eventType === 'closure') {
                     info.el.classList.add('cabinet-closure-event');
                     info.el.style.right = '';
@@ -271,6 +291,79 @@
         setTimeout(() => calendar.updateSize(), 100);
     }
 
+    function isDensityView() {
+        const viewType = calendar && calendar.view ? calendar.view.type : currentView;
+        return Boolean(densityFeedUrl) && DENSITY_VIEWS.includes(viewType);
+    }
+
+    // Бронирования и заметки для дня/недели или агрегаты по дням для месячного вида
+    function fetchBookingEvents(info, successCallback, failureCallback) {
+        const densityMode = isDensityView();
+        const params = new URLSearchParams({ start: info.startStr, end: info.endStr });
+        fetch(`${densityMode ? densityFeedUrl : '/calendar/feed/'}?${params.toString()}`, {
+            credentials: 'same-origin',
+            headers: { 'X-Requested-With': 'XMLHttpRequest' }
+        })
+            .then(function(response) {
+                if (!response.ok) {
+                    throw new Error(`HTTP ${response.status}`);
+                }
+                return response.json();
+            })
+            .then(function(data) {
+                successCallback(densityMode ? buildDensityEvents(data) : data);
+            })
+            .catch(function(error) {
+                console.error('Error loading calendar events:', error);
+                failureCallback(error);
+            });
+    }
+
+    function densityColor(utilization) {
+        if (utilization == null) return '#6c757d';
+        if (utilization < 0.5) return '#198754';
+        if (utilization < 0.85) return '#fd7e14';
+        return '#dc3545';
+    }
+
+    function formatUtilization(utilization) {
+        return utilization == null ? '—' : `${Math.round(utilization * 100)}%`;
+    }
+
+    function buildDensityEvents(data) {
+        const specialistNames = data.specialists || {};
+        const cabinetNames = data.cabinets || {};
+        const events = [];
+        (data.days || []).forEach(function(day) {
+            if (!day.bookings && !day.closures.length) {
+                return;
+            }
+            const lines = [`Бронирований: ${day.bookings}, ${day.booked_minutes} мин, загрузка ${formatUtilization(day.utilization)}`];
+            Object.keys(day.specialists).forEach(function(id) {
+                const item = day.specialists[id];
+                if (item.bookings || item.available_minutes) {
+                    lines.push(`${specialistNames[id] || id}: ${item.bookings} (${formatUtilization(item.utilization)})`);
+                }
+            });
+            day.closures.forEach(function(closure) {
+                lines.push(`Закрыт кабинет ${cabinetNames[closure.cabinet_id] || closure.cabinet_id}${closure.reason ? ': ' + closure.reason : ''}`);
+            });
+            events.push({
+                id: `density-${day.date}`,
+                start: day.date,
+                allDay: true,
+                editable: false,
+                title: day.bookings
+                    ? `${day.bookings} брон. · ${formatUtilization(day.utilization)}`
+                    : `Закрытий: ${day.closures.length}`,
+                backgroundColor: densityColor(day.utilization),
+                borderColor: densityColor(day.utilization),
+                extendedProps: { eventType: 'density', tooltip: lines.join('\n') }
+            });
+        });
+        return events;
+    }
+
     function handleEventMouseEnter(info) {
         if (!copyShortcutsEnabled) {
             return;
@@ -297,6 +390,74 @@
         }
     }
 
+    // Живое обновление: сервер присылает патчи событий (SSE), календарь применяет их на месте
+    function initLiveUpdates() {
+        if (!liveUpdatesUrl || !calendar || typeof EventSource === 'undefined') {
+            return;
+        }
+        liveUpdatesSource = new EventSource(liveUpdatesUrl);
+        liveUpdatesSource.addEventListener('open', function() {
+            liveUpdatesConnected = true;
+        });
+        liveUpdatesSource.addEventListener('error', function() {
+            // EventSource переподключится сам; пока потока нет, обновляемся перечитыванием ленты
+            liveUpdatesConnected = false;
+        });
+        liveUpdatesSource.addEventListener('patch', function(event) {
+            let patches;
+            try {
+                patches = JSON.parse(event.data);
+            } catch (error) {
+                console.error('Invalid calendar patch:', error);
+                return;
+            }
+            calendar.batchRendering(function() {
+                patches.forEach(applyLivePatch);
+            });
+        });
+    }
+
+    function findLiveEvents(kind, id) {
+        const eventId = kind === 'technical_note' ? `note-${id}` : String(id);
+        return calendar.getEvents().filter(function(event) {
+            return event.id === eventId && event.extendedProps.eventType === kind;
+        });
+    }
+
+    function applyLivePatch(patch) {
+        if (patch.op === 'refetch') {
+            calendar.refetchEvents();
+            return;
+        }
+        if (patch.kind === 'closure' && !canManageClosures) {
+            return;
+        }
+        if (patch.kind !== 'closure' && isDensityView()) {
+            // В месячном виде событий нет - пересчитываем агрегаты (одним запросом на пачку патчей)
+            clearTimeout(densityRefetchTimer);
+            densityRefetchTimer = setTimeout(function() {
+                const source = calendar.getEventSourceById('bookings');
+                if (source) source.refetch();
+            }, 300);
+            return;
+        }
+        findLiveEvents(patch.kind, patch.id).forEach(function(event) {
+            event.remove();
+        });
+        if (patch.op === 'upsert') {
+            const sourceId = patch.kind === 'closure' ? 'closures' : 'bookings';
+            calendar.addEvent(patch.event, calendar.getEventSourceById(sourceId) || true);
+        }
+    }
+
+    function refreshCalendarEvents() {
+        // Изменение придет патчем из потока, перечитывать ленту не нужно
+        if (liveUpdatesConnected) {
+            return;
+        }
+        calendar.refetchEvents();
+    }
+
     function initCopyPasteShortcuts() {
         if (copyPasteHandlerAttached) {
             return;
@@ -416,7 +577,7 @@
                         showResultModal('Готово', message, true);
                     }
                     if (calendar) {
-                        calendar.refetchEvents();
+                        refreshCalendarEvents();
                     }
                 } else {
                     const errorMessage = (data && (data.error || data.message)) || 'Не удалось скопировать бронирование';
@@ -793,7 +954,7 @@
                     }
                     
                     bookingEditModal.hide();
-                    calendar.refetchEvents();
+                    refreshCalendarEvents();
                     // Показываем предупреждение если есть конфликты
                     let message = data.message || 'Бронирование успешно обновлено';
                     if (data.warning) {
@@ -1200,7 +1361,7 @@
                     }
                     showResultModal('Успех', data.message || 'Закрытие кабинета создано', true);
                     if (calendar) {
-                        calendar.refetchEvents();
+                        refreshCalendarEvents();
                     }
                 } else {
                     showClosureErrors(data.errors);
@@ -1264,7 +1425,7 @@
                     closureDeleteModal.hide();
                     showResultModal('Успех', data.message || 'Закрытие кабинета удалено', true);
                     if (calendar) {
-                        calendar.refetchEvents();
+                        refreshCalendarEvents();
                     }
                 } else {
                     const message = data.error || 'Не удалось удалить закрытие кабинета';
@@ -1423,7 +1584,7 @@
                     if (quickBookingModal) quickBookingModal.hide();
                     showResultModal('Успех', result.data.message || 'Заметка создана', true);
                     if (calendar) {
-                        setTimeout(function() { calendar.refetchEvents(); }, 150);
+                        setTimeout(refreshCalendarEvents, 150);
                     }
                 } else {
                     showResultModal('Ошибка', result.data.errors ? Object.values(result.data.errors).flat().join(' ') : 'Не удалось создать заметку', false);
@@ -1463,7 +1624,7 @@
                     calendarNoteEditModal.hide();
                     currentEditNoteId = null;
                     showResultModal('Успех', result.data.message || 'Заметка сохранена', true);
-                    if (calendar) calendar.refetchEvents();
+                    if (calendar) refreshCalendarEvents();
                 } else {
                     showResultModal('Ошибка', result.data.errors ? Object.values(result.data.errors).flat().join(' ') : 'Не удалось сохранить', false);
                 }
@@ -1499,7 +1660,7 @@
                     currentEditNoteId = null;
                     pendingNoteDeleteId = null;
                     showResultModal('Успех', result.data.message || 'Заметка удалена', true);
-                    if (calendar) calendar.refetchEvents();
+                    if (calendar) refreshCalendarEvents();
                 } else {
                     showResultModal('Ошибка', result.data.error || 'Не удалось удалить заметку', false);
                 }
@@ -1688,7 +1849,10 @@
                     data.cabinets.forEach(cabinet => {
                         const option = document.createElement('option');
                         option.value = cabinet.id;
-                        option.textContent = cabinet.name;
+                        // Пустое поле - кабинет подберет сервер; подсказываем, какой именно
+                        option.textContent = cabinet.id === data.suggested_cabinet_id
+                            ? `${cabinet.name} (будет выбран автоматически)`
+                            : cabinet.name;
                         cabinetSelect.appendChild(option);
                     });
                 } else {
@@ -1791,7 +1955,7 @@
             resultModal.show();
 
             // Обновляем календарь
-            calendar.refetchEvents();
+            refreshCalendarEvents();
 
             // Закрываем модальное окно результата через 2 секунды
             setTimeout(() => {